@@ -1,14 +1,25 @@
 import sys
 import time
 import os
-import shutil
 import importlib
 import argparse
+import logging
 
 import transform_to_brat_format
 import vectorize_data
+import word2vec_subset
+import word2vec_clustering
+import logging_setup
+import instrumentation
+import profiling
 import classify_and_select
 import default_settings
+import feature_cache
+import stable_vocabulary
+import unlabelled_pool
+import compiled_corpus
+
+logger = logging.getLogger(__name__)
 
 
 def check_frequency_of_labels(labelled_label_vector, classes):
@@ -27,7 +38,7 @@ def check_frequency_of_labels(labelled_label_vector, classes):
 
     for label, freq in freq_dict.items():
         if freq == 0:
-            print("There are no occurrences of the label " + label + \
+            logger.error("There are no occurrences of the label " + label + \
                       " in the labelled data. Remove this category from the settings file.")
             exit(1)
 
@@ -45,10 +56,9 @@ def select_new_data(properties, project_path, word2vecwrapper):
     :param word2vecwrapper: an instance of the vectorize_data.Word2vecWrapper class (to use for incorporating additional features)
     """
 
-    print()
-    print("**************************************************************")
-    print("* Start selection and pre-annotation of new training samples *")
-    print("**************************************************************")
+    logger.info("**************************************************************")
+    logger.info("* Start selection and pre-annotation of new training samples *")
+    logger.info("**************************************************************")
 
     unlabelled_data_dir_for_project = os.path.join(project_path, properties.unlabelled_data_dir)
     unlabelled_data_path = os.path.join(unlabelled_data_dir_for_project, properties.unlabelled_data_file)
@@ -56,48 +66,125 @@ def select_new_data(properties, project_path, word2vecwrapper):
     # Classes
     classes = properties.minority_classes[:]
     classes.append(properties.outside_class)
-    print("Classes to use:\t" + str(classes))
-    
-    labelled_data_dir_for_project = os.path.join(project_path, properties.labelled_data_dir)
-    labelled_text_vector, labelled_label_vector, label_dict =  \
-        vectorize_data.read_file_labelled_data(labelled_data_dir_for_project, properties.data_file_extension, \
-                                                   properties.minority_classes, properties.outside_class)
-
-    check_frequency_of_labels(labelled_label_vector, classes)
-
-    unlabelled_text_vector = vectorize_data.read_file_unlabelled_data(unlabelled_data_path)
-    print("Read unlabelled data from:\t" + unlabelled_data_path)
+    logger.info("Classes to use:\t" + str(classes))
     
-    X_labelled_np, X_unlabelled_np, y_labelled_np, text_vector_labelled_np, text_vector_unlabelled_np, \
-        current_word_vectorizer, context_word_vectorizer = \
-        vectorize_data.vectorize_data(labelled_text_vector, unlabelled_text_vector, labelled_label_vector, \
-                                          label_dict, use_word2vec = properties.whether_to_use_word2vec, \
-                                          number_of_previous_words = properties.number_of_previous_words, \
-                                          number_of_following_words = properties.number_of_following_words, \
-                                          use_current_word_as_feature = properties.use_current_word_as_feature, \
-                                          min_df_current = properties.min_df_current,  \
-                                          min_df_context = properties.min_df_context, \
-                                          word2vecwrapper = word2vecwrapper, \
-                                          current_word_vocabulary = properties.current_word_vocabulary, \
-                                          context_word_vocabulary = properties.context_word_vocabulary, \
-                                          use_clustering = properties.whether_to_use_clustering)    
-
-    to_select_X, new_unlabelled_x, to_select_text, new_sentences_unlabelled, predicted_for_selected = \
-        classify_and_select.get_new_data(X_labelled_np, X_unlabelled_np, y_labelled_np, text_vector_labelled_np, \
-                                             text_vector_unlabelled_np, label_dict, properties.minority_classes, \
-                                             properties.nr_of_samples, properties.maximum_samples_to_search_among, \
-                                             properties.outside_class, properties.beginning_prefix, \
-                                             properties.inside_prefix, properties.inactive_learning, \
-                                             properties.max_iterations, properties.prefer_predicted_chunks, \
-                                             properties.model_type, properties.use_cross_validation, \
-                                             properties.nr_of_cross_validation_splits, \
-                                             properties.c_value)
+    instrumentation.start_run("select_new_data", instrumentation.get_run_report_file(properties, project_path))
+    try:
+        with instrumentation.phase("read_labelled") as measurement:
+            labelled_data_dir_for_project = os.path.join(project_path, properties.labelled_data_dir)
+            labelled_text_vector, labelled_label_vector, label_dict =  \
+                compiled_corpus.read_labelled_data(labelled_data_dir_for_project, properties.data_file_extension, \
+                                                       properties.minority_classes, properties.outside_class, \
+                                                       compiled_corpus.get_labelled_corpus_dir(properties, project_path), \
+                                                       properties.n_jobs, vectorize_data.get_parse_cache_file(properties, project_path))
+            measurement.count("labelled_samples", len(labelled_text_vector))
+
+        check_frequency_of_labels(labelled_label_vector, classes)
+
+        unlabelled_feature_cache = None
+        if properties.use_feature_cache:
+            unlabelled_feature_cache = feature_cache.FeatureCache(os.path.join(project_path, properties.feature_cache_dir))
+
+        unlabelled_corpus_dir = compiled_corpus.get_unlabelled_corpus_dir(properties, project_path)
+
+        model_state_path = None
+        if properties.warm_start_model:
+            model_state_path = os.path.join(project_path, properties.model_state_file)
+
+        vocabulary = None
+        if properties.use_stable_vocabulary:
+            vocabulary = stable_vocabulary.StableVocabulary(os.path.join(project_path, properties.stable_vocabulary_file))
+
+        if properties.unlabelled_chunk_size:
+            with instrumentation.phase("read_unlabelled") as measurement:
+                # The samples that have been selected in earlier rounds are recorded in the journal of the pool, and are not read
+                consumed_ids = unlabelled_pool.read_consumed_ids(unlabelled_data_path)
+                if vocabulary is not None:
+                    for text_vector_chunk in vectorize_data.read_file_unlabelled_data_in_chunks(unlabelled_data_path, properties.unlabelled_chunk_size, \
+                                                                                                    consumed_ids, unlabelled_corpus_dir):
+                        vocabulary.add_tokens([token for text in text_vector_chunk for token in text])
+                measurement.count("consumed_samples", len(consumed_ids))
+
+            with instrumentation.phase("select") as measurement:
+                to_select_text, predicted_for_selected, selected_indeces = \
+                    select_new_data_in_chunks(properties, unlabelled_data_path, labelled_text_vector, labelled_label_vector, label_dict, word2vecwrapper, \
+                                                  unlabelled_feature_cache, vocabulary, model_state_path, consumed_ids, unlabelled_corpus_dir)
+                measurement.count("selected_samples", len(selected_indeces))
+            selected_ids = unlabelled_pool.get_ids_for_positions(selected_indeces, consumed_ids)
+        else:
+            with instrumentation.phase("read_unlabelled") as measurement:
+                pool = unlabelled_pool.read_unlabelled_pool(unlabelled_data_path, unlabelled_corpus_dir)
+                logger.info("Read unlabelled data from:\t" + unlabelled_data_path)
+                unlabelled_ids = pool.get_unlabelled_ids()
+                unlabelled_text_vector = pool.get_sentences(unlabelled_ids)
+                if vocabulary is not None:
+                    vocabulary.add_tokens([token for text in unlabelled_text_vector for token in text])
+                measurement.count("unlabelled_samples", len(unlabelled_text_vector))
+
+            with instrumentation.phase("vectorize") as measurement:
+                X_labelled_np, X_unlabelled_np, y_labelled_np, text_vector_labelled_np, text_vector_unlabelled_np, \
+                    current_word_vectorizer, context_word_vectorizer = \
+                    vectorize_data.vectorize_data(labelled_text_vector, unlabelled_text_vector, labelled_label_vector, \
+                                                      label_dict, use_word2vec = properties.whether_to_use_word2vec, \
+                                                      number_of_previous_words = properties.number_of_previous_words, \
+                                                      number_of_following_words = properties.number_of_following_words, \
+                                                      use_current_word_as_feature = properties.use_current_word_as_feature, \
+                                                      min_df_current = properties.min_df_current,  \
+                                                      min_df_context = properties.min_df_context, \
+                                                      word2vecwrapper = word2vecwrapper, \
+                                                      current_word_vocabulary = properties.current_word_vocabulary, \
+                                                      context_word_vocabulary = properties.context_word_vocabulary, \
+                                                      use_clustering = properties.whether_to_use_clustering, \
+                                                      use_sparse_features = properties.use_sparse_features, \
+                                                      feature_cache = unlabelled_feature_cache, \
+                                                      stable_vocabulary = vocabulary)
+                measurement.count("samples", len(labelled_text_vector) + len(unlabelled_text_vector))
+
+            with instrumentation.phase("select") as measurement:
+                to_select_X, to_select_text, predicted_for_selected, selected_indeces = \
+                    classify_and_select.get_new_data(X_labelled_np, X_unlabelled_np, y_labelled_np, text_vector_labelled_np, \
+                                                         text_vector_unlabelled_np, label_dict, properties.minority_classes, \
+                                                         properties.nr_of_samples, properties.maximum_samples_to_search_among, \
+                                                         properties.outside_class, properties.beginning_prefix, \
+                                                         properties.inside_prefix, properties.inactive_learning, \
+                                                         properties.max_iterations, properties.prefer_predicted_chunks, \
+                                                         properties.model_type, properties.use_cross_validation, \
+                                                         properties.nr_of_cross_validation_splits, \
+                                                         properties.c_value, model_state_path, properties.ssvm_margin_method, \
+                                                         properties.n_jobs, \
+                                                         get_feature_fingerprint(properties, current_word_vectorizer, \
+                                                                                     context_word_vectorizer, word2vecwrapper))
+                measurement.count("selected_samples", len(selected_indeces))
+            selected_ids = unlabelled_ids[selected_indeces]
+
+        with instrumentation.phase("write") as measurement:
+            write_selected_data(properties, project_path, to_select_text, predicted_for_selected, label_dict, selected_ids, \
+                                    unlabelled_data_path, unlabelled_feature_cache)
+            measurement.count("selected_samples", len(to_select_text))
+    finally:
+        instrumentation.end_run()
+
+
+def write_selected_data(properties, project_path, to_select_text, predicted_for_selected, label_dict, selected_ids, \
+                            unlabelled_data_path, unlabelled_feature_cache = None):
+    """
+    write_selected_data writes the selected and pre-annotated samples to a new file in the tolabel directory of the project
+    (in csv and brat format), and records in the journal of the pool of unlabelled data that the samples are no longer in the pool.
+    The samples are also evicted from unlabelled_feature_cache (a feature_cache.FeatureCache), if it is not None.
 
+    :param selected_ids: the ids in the pool of unlabelled data (see unlabelled_pool) of the selected samples
+    :returns to_annotate_file_path: the path of the file with the selected samples
+    """
     tolabel_data_dir_for_project = os.path.join(project_path, properties.tolabel_data_dir)
     if not os.path.exists(tolabel_data_dir_for_project):
         os.mkdir(tolabel_data_dir_for_project)
 
-    to_annotate_file_path = os.path.join(tolabel_data_dir_for_project, time.strftime("tolabel_%Y%m%d_%H%M%S.csv"))
+    to_annotate_file_name = time.strftime("tolabel_%Y%m%d_%H%M%S")
+    to_annotate_file_path = os.path.join(tolabel_data_dir_for_project, to_annotate_file_name + ".csv")
+    file_nr = 1
+    while os.path.exists(to_annotate_file_path): # if more than one selection is made within a second (see selection_server)
+        to_annotate_file_path = os.path.join(tolabel_data_dir_for_project, to_annotate_file_name + "_" + str(file_nr) + ".csv")
+        file_nr = file_nr + 1
     to_annotate_file = open(to_annotate_file_path, "w")
 
     label_dict_inv = {v: k for k, v in label_dict.items()}
@@ -107,36 +194,101 @@ def select_new_data(properties, project_path, word2vecwrapper):
         try:
             assert(len(texts) == len(labels))
         except AssertionError:
-            print("different length on labels and text")
+            logger.error("different length on labels and text")
             exit(1)
         for text, label in zip(texts, labels):
             to_annotate_file.write("\t".join([text, label_dict_inv[label]]) + "\n")
         to_annotate_file.write("\n")
     to_annotate_file.close()
 
-    # Rewrite the file with unlabelled data
-    old_unlabelled_data_path = os.path.join(unlabelled_data_dir_for_project, \
-                                                time.strftime("unlabelled_%Y%m%d_%H%M%S.csv"))
-    shutil.move(unlabelled_data_path,  old_unlabelled_data_path)
-    unlabelled_data_path_file = open(unlabelled_data_path, "w")
+    # The selected samples are no longer in the pool of unlabelled data
+    if unlabelled_feature_cache is not None:
+        unlabelled_feature_cache.evict([feature_cache.get_key(texts) for texts in to_select_text])
 
-    # Create the file for annotation data
-    for texts in new_sentences_unlabelled:
-        for text in texts:
-            unlabelled_data_path_file.write(text + "\n")
-        unlabelled_data_path_file.write("\n")
-    unlabelled_data_path_file.close()
+    # The file with unlabelled data is not rewritten, the selected samples are instead recorded in its journal
+    # (use compact_unlabelled_pool.py to remove them from the file)
+    unlabelled_pool.write_to_journal(unlabelled_data_path, selected_ids, os.path.basename(to_annotate_file_path))
 
     interesting_tags = []
     for tag in properties.minority_classes:
         if tag.startswith(properties.beginning_prefix):
             interesting_tags.append(tag[len(properties.beginning_prefix):])
-    print("interesting_tags", interesting_tags)
+    logger.info("interesting_tags " + str(interesting_tags))
 
     transform_to_brat_format.transform(to_annotate_file_path, tolabel_data_dir_for_project, \
                                            interesting_tags, properties.outside_class, \
                                            properties.beginning_prefix)
 
+    return to_annotate_file_path
+
+
+def select_new_data_in_chunks(properties, unlabelled_data_path, labelled_text_vector, labelled_label_vector, label_dict, word2vecwrapper, \
+                                  unlabelled_feature_cache = None, vocabulary = None, model_state_path = None, consumed_ids = None, \
+                                  unlabelled_corpus_dir = None):
+    """
+    select_new_data_in_chunks performs the vectorization, active learning and pre-annotation for select_new_data
+    when the unlabelled data is to be read in chunks of properties.unlabelled_chunk_size sentences.
+    unlabelled_feature_cache is a feature_cache.FeatureCache for the features of the unlabelled data, or None.
+    vocabulary is a stable_vocabulary.StableVocabulary, or None.
+    model_state_path is the path where the model is saved for warm-starting, or None.
+    consumed_ids are the positions in the file of the samples that are no longer in the pool (see unlabelled_pool.read_consumed_ids), or None.
+    unlabelled_corpus_dir is the directory of the compiled unlabelled data (see compiled_corpus), or None.
+
+    :returns to_select_text, predicted_for_selected, selected_indeces: see classify_and_select.get_new_data_from_chunks
+    (selected_indeces are the positions among the samples that are not consumed)
+    """
+    with instrumentation.phase("vectorize") as measurement:
+        X_labelled_np, y_labelled_np, text_vector_labelled_np, current_word_vectorizer, context_word_vectorizer = \
+            vectorize_data.vectorize_labelled_data(labelled_text_vector, labelled_label_vector, label_dict, \
+                                                       use_word2vec = properties.whether_to_use_word2vec, \
+                                                       number_of_previous_words = properties.number_of_previous_words, \
+                                                       number_of_following_words = properties.number_of_following_words, \
+                                                       use_current_word_as_feature = properties.use_current_word_as_feature, \
+                                                       min_df_current = properties.min_df_current,  \
+                                                       min_df_context = properties.min_df_context, \
+                                                       word2vecwrapper = word2vecwrapper, \
+                                                       current_word_vocabulary = properties.current_word_vocabulary, \
+                                                       context_word_vocabulary = properties.context_word_vocabulary, \
+                                                       use_clustering = properties.whether_to_use_clustering, \
+                                                       use_sparse_features = properties.use_sparse_features, \
+                                                       stable_vocabulary = vocabulary)
+        measurement.count("labelled_samples", len(labelled_text_vector))
+
+    logger.info("Will read unlabelled data from:\t" + unlabelled_data_path + " in chunks of " + str(properties.unlabelled_chunk_size) + " samples")
+    unlabelled_chunks = vectorize_data.vectorize_unlabelled_in_chunks(unlabelled_data_path, properties.unlabelled_chunk_size, \
+                                                                          current_word_vectorizer, context_word_vectorizer, \
+                                                                          properties.whether_to_use_word2vec, properties.number_of_previous_words, \
+                                                                          properties.number_of_following_words, properties.use_current_word_as_feature, \
+                                                                          word2vecwrapper, properties.whether_to_use_clustering, \
+                                                                          properties.use_sparse_features, unlabelled_feature_cache, consumed_ids, \
+                                                                          unlabelled_corpus_dir)
+
+    return classify_and_select.get_new_data_from_chunks(X_labelled_np, y_labelled_np, unlabelled_chunks, label_dict, \
+                                                            properties.minority_classes, properties.nr_of_samples, \
+                                                            properties.nr_of_candidates_to_keep, properties.outside_class, \
+                                                            properties.beginning_prefix, properties.inside_prefix, \
+                                                            properties.inactive_learning, properties.max_iterations, \
+                                                            properties.prefer_predicted_chunks, properties.model_type, \
+                                                            properties.use_cross_validation, properties.nr_of_cross_validation_splits, \
+                                                            properties.c_value, model_state_path, properties.ssvm_margin_method, \
+                                                            properties.n_jobs, \
+                                                            get_feature_fingerprint(properties, current_word_vectorizer, \
+                                                                                        context_word_vectorizer, word2vecwrapper))
+
+
+def get_feature_fingerprint(properties, current_word_vectorizer, context_word_vectorizer, word2vecwrapper):
+    """
+    get_feature_fingerprint
+
+    :returns what identifies the columns of the features (see feature_cache.get_fingerprint), so that the model is only
+    warm-started from a model that was fitted on the same features, or None if warm_start_model is False
+    """
+    if not properties.warm_start_model:
+        return None
+    return feature_cache.get_fingerprint(current_word_vectorizer, context_word_vectorizer, properties.whether_to_use_word2vec, \
+                                             word2vecwrapper, properties.number_of_previous_words, properties.number_of_following_words, \
+                                             properties.use_current_word_as_feature, properties.whether_to_use_clustering)
+
 
 def load_properties(parser):
     """
@@ -150,13 +302,16 @@ def load_properties(parser):
 
     parser.add_argument('--project', action='store', dest='project_path', \
                             help='The path, separated by dots, to where the project i located. For instance: data.example_project')
+    profiling.add_profile_arguments(parser)
     args = parser.parse_args()
     if not args.project_path:
         print("The argument '--project' with the path to the data needs to be given")
         exit(1)
 
     print(args.project_path)
-    return load_properties_from_parameters(args.project_path)
+    properties_container, path_slash_format, project_path = load_properties_from_parameters(args.project_path)
+    profiling.start_profiling_from_arguments(args, path_slash_format)
+    return properties_container, path_slash_format, project_path
 
 
 def load_properties_from_parameters(project_path, start_dir = "."):
@@ -180,6 +335,7 @@ def load_properties_from_parameters(project_path, start_dir = "."):
     properties = importlib.import_module(project_path + "." + SETTINGS)
 
     properties_container = PropertiesContainer(properties)
+    logging_setup.set_up_logging(properties_container.verbosity)
     return properties_container, path_slash_format, project_path
 
 
@@ -340,6 +496,96 @@ class PropertiesContainer:
         # If cross validation is chosen, this c_value is not used
         if self.use_cross_validation and hasattr(properties, 'c_value'):
             raise ValueError("If cross_validation is chosen, the c-value is not decided by the user 'no c_value attribute should be given'")
+        try:
+            self.use_sparse_features = properties.use_sparse_features
+        except AttributeError:
+            self.use_sparse_features = default_settings.use_sparse_features
+
+        try:
+            self.unlabelled_chunk_size = properties.unlabelled_chunk_size
+        except AttributeError:
+            self.unlabelled_chunk_size = default_settings.unlabelled_chunk_size
+
+        try:
+            self.nr_of_candidates_to_keep = properties.nr_of_candidates_to_keep
+        except AttributeError:
+            self.nr_of_candidates_to_keep = default_settings.nr_of_candidates_to_keep
+
+        try:
+            self.use_feature_cache = properties.use_feature_cache
+        except AttributeError:
+            self.use_feature_cache = default_settings.use_feature_cache
+
+        try:
+            self.use_stable_vocabulary = properties.use_stable_vocabulary
+        except AttributeError:
+            self.use_stable_vocabulary = default_settings.use_stable_vocabulary
+
+        try:
+            self.warm_start_model = properties.warm_start_model
+        except AttributeError:
+            self.warm_start_model = default_settings.warm_start_model
+
+        try:
+            self.ssvm_margin_method = properties.ssvm_margin_method
+        except AttributeError:
+            self.ssvm_margin_method = default_settings.ssvm_margin_method
+
+        try:
+            self.n_jobs = properties.n_jobs
+        except AttributeError:
+            self.n_jobs = default_settings.n_jobs
+
+        try:
+            self.use_compiled_corpus = properties.use_compiled_corpus
+        except AttributeError:
+            self.use_compiled_corpus = default_settings.use_compiled_corpus
+
+        try:
+            self.use_parse_cache = properties.use_parse_cache
+        except AttributeError:
+            self.use_parse_cache = default_settings.use_parse_cache
+
+        try:
+            self.use_word2vec_subset = properties.use_word2vec_subset
+        except AttributeError:
+            self.use_word2vec_subset = default_settings.use_word2vec_subset
+
+        try:
+            self.clustering_engine = properties.clustering_engine
+        except AttributeError:
+            self.clustering_engine = default_settings.clustering_engine
+
+        try:
+            self.nr_of_kmeans_clusters = properties.nr_of_kmeans_clusters
+        except AttributeError:
+            self.nr_of_kmeans_clusters = default_settings.nr_of_kmeans_clusters
+
+        try:
+            self.use_clustering_cache = properties.use_clustering_cache
+        except AttributeError:
+            self.use_clustering_cache = default_settings.use_clustering_cache
+
+        try:
+            self.verbosity = properties.verbosity
+        except AttributeError:
+            self.verbosity = default_settings.verbosity
+
+        try:
+            self.write_run_report = properties.write_run_report
+        except AttributeError:
+            self.write_run_report = default_settings.write_run_report
+
+        try:
+            self.speculative_selection = properties.speculative_selection
+        except AttributeError:
+            self.speculative_selection = default_settings.speculative_selection
+
+        try:
+            self.speculative_candidates_factor = properties.speculative_candidates_factor
+        except AttributeError:
+            self.speculative_candidates_factor = default_settings.speculative_candidates_factor
+
         try:
             self.labelled_data_dir = properties.labelled_data_dir
         except AttributeError:
@@ -383,7 +629,47 @@ class PropertiesContainer:
         try:  
             self.saved_model_dir = properties.saved_model_dir
         except AttributeError: 
-            self.saved_model_dir = default_settings.saved_model_dir 
+            self.saved_model_dir = default_settings.saved_model_dir
+
+        try:
+            self.feature_cache_dir = properties.feature_cache_dir
+        except AttributeError:
+            self.feature_cache_dir = default_settings.feature_cache_dir
+
+        try:
+            self.stable_vocabulary_file = properties.stable_vocabulary_file
+        except AttributeError:
+            self.stable_vocabulary_file = default_settings.stable_vocabulary_file
+
+        try:
+            self.model_state_file = properties.model_state_file
+        except AttributeError:
+            self.model_state_file = default_settings.model_state_file
+
+        try:
+            self.compiled_corpus_dir = properties.compiled_corpus_dir
+        except AttributeError:
+            self.compiled_corpus_dir = default_settings.compiled_corpus_dir
+
+        try:
+            self.parse_cache_file = properties.parse_cache_file
+        except AttributeError:
+            self.parse_cache_file = default_settings.parse_cache_file
+
+        try:
+            self.word2vec_subset_dir = properties.word2vec_subset_dir
+        except AttributeError:
+            self.word2vec_subset_dir = default_settings.word2vec_subset_dir
+
+        try:
+            self.clustering_cache_dir = properties.clustering_cache_dir
+        except AttributeError:
+            self.clustering_cache_dir = default_settings.clustering_cache_dir
+
+        try:
+            self.run_report_file = properties.run_report_file
+        except AttributeError:
+            self.run_report_file = default_settings.run_report_file
 
         try:  
             self.beginning_prefix = properties.beginning_prefix
@@ -423,7 +709,10 @@ class PropertiesContainer:
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     properties_main, path_slash_format_main, path_dot_format = load_properties(parser)
-    word2vecwrapper = vectorize_data.Word2vecWrapper(properties_main.model_path, properties_main.semantic_vector_length)
+    word2vecwrapper = vectorize_data.Word2vecWrapper(properties_main.model_path, properties_main.semantic_vector_length, \
+                                                     word2vec_subset.get_subset_dir(properties_main, path_slash_format_main), \
+                                                     properties_main.clustering_engine, properties_main.nr_of_kmeans_clusters, \
+                                                     word2vec_clustering.get_clustering_cache_dir(properties_main, path_slash_format_main))
 
     select_new_data(properties_main, path_slash_format_main, word2vecwrapper)
 
@@ -0,0 +1,297 @@
+"""
+Measures how reading, vectorizing, training, predicting and selecting scale with the size of the data, for
+NonStructuredLogisticRegression and StructuredModelFrankWolfeSSVM, on synthetic corpora (see synthetic_corpus).
+
+Run from the directory of PAL, for instance:
+python -m benchmarks.run_benchmarks --sizes 100,400,1600 --output benchmark_results.tsv --baseline previous_results.tsv
+
+The results are written as a table (tab-separated), with one row for each model, size and stage. The peak memory of the
+process (peak_rss_so_far_mb) can only be measured for the process as a whole, and is therefore the peak of the stage and
+the stages before it. How much a stage has raised the peak (peak_rss_growth_mb) is what can be compared between stages.
+When a table from
+an earlier run with the same corpus settings is given as --baseline, the wall time of each stage is compared
+to the earlier one, and the stages that have become slower than --regression_threshold times the earlier wall time
+are listed.
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+import default_settings
+import classify_and_select
+import instrumentation
+import logging_setup
+import vectorize_data
+from benchmarks import synthetic_corpus
+
+MODEL_TYPES = {"NonStructuredLogisticRegression": classify_and_select.NonStructuredLogisticRegression, \
+               "StructuredModelFrankWolfeSSVM": classify_and_select.StructuredModelFrankWolfeSSVM}
+RESULT_COLUMNS = ["model", "nr_of_sentences", "nr_of_unlabelled_sentences", "nr_of_tokens", "stage", \
+                  "wall_time", "cpu_time", "peak_rss_so_far_mb", "peak_rss_growth_mb"]
+CORPUS_SETTINGS = ["sentence_length", "vocabulary_size", "minority_class_rate", "nr_of_classes", "unlabelled_ratio", \
+                   "max_iterations", "use_sparse_features", "seed"]
+
+
+def run_benchmark(model_name, nr_of_sentences, benchmark_settings):
+    """
+    run_benchmark
+
+    Generates a corpus with nr_of_sentences labelled sentences (and nr_of_sentences * unlabelled_ratio unlabelled ones),
+    and measures each stage of one round of active selection for the model model_name.
+
+    returns: a list with one row (a dict with the RESULT_COLUMNS) for each stage
+    """
+    minority_classes = synthetic_corpus.get_minority_classes(benchmark_settings.nr_of_classes)
+    nr_of_unlabelled_sentences = nr_of_sentences * benchmark_settings.unlabelled_ratio
+    labelled_text_vector, labelled_label_vector = \
+        synthetic_corpus.generate_corpus(nr_of_sentences, benchmark_settings.sentence_length, benchmark_settings.vocabulary_size, \
+                                             benchmark_settings.minority_class_rate, benchmark_settings.nr_of_classes, \
+                                             benchmark_settings.seed)
+    unlabelled_text_vector, _ = \
+        synthetic_corpus.generate_corpus(nr_of_unlabelled_sentences, benchmark_settings.sentence_length, benchmark_settings.vocabulary_size, \
+                                             benchmark_settings.minority_class_rate, benchmark_settings.nr_of_classes, \
+                                             benchmark_settings.seed + 1)
+    nr_of_tokens = sum([len(text) for text in labelled_text_vector]) + sum([len(text) for text in unlabelled_text_vector])
+
+    corpus_dir = tempfile.mkdtemp(prefix="pal_benchmark_")
+    labelled_dir = os.path.join(corpus_dir, "labelled")
+    unlabelled_file = os.path.join(corpus_dir, "unlabelled", "unlabelled.csv")
+    synthetic_corpus.write_labelled_file(os.path.join(labelled_dir, "synthetic.csv"), labelled_text_vector, labelled_label_vector)
+    synthetic_corpus.write_unlabelled_file(unlabelled_file, unlabelled_text_vector)
+
+    results = []
+    peak_rss_before_stages_mb = instrumentation.get_peak_rss_mb()
+    def add_result(measurement):
+        peak_rss_mb = instrumentation.get_peak_rss_mb()
+        peak_rss_growth_mb = None
+        if peak_rss_mb is not None:
+            previous_peak_rss_mb = results[-1]["peak_rss_so_far_mb"] if len(results) > 0 else peak_rss_before_stages_mb
+            peak_rss_growth_mb = round(peak_rss_mb - previous_peak_rss_mb, 1)
+        results.append({"model": model_name, "nr_of_sentences": nr_of_sentences, \
+                        "nr_of_unlabelled_sentences": nr_of_unlabelled_sentences, "nr_of_tokens": nr_of_tokens, \
+                        "stage": measurement.name, "wall_time": measurement.wall_time, "cpu_time": measurement.cpu_time, \
+                        "peak_rss_so_far_mb": peak_rss_mb, "peak_rss_growth_mb": peak_rss_growth_mb})
+
+    try:
+        with instrumentation.phase("read") as measurement:
+            text_vector_labelled, label_vector_labelled, label_dict = \
+                vectorize_data.read_file_labelled_data(labelled_dir, ".csv", minority_classes, synthetic_corpus.OUTSIDE_CLASS)
+            text_vector_unlabelled = vectorize_data.read_file_unlabelled_data(unlabelled_file)
+        add_result(measurement)
+
+        with instrumentation.phase("vectorize") as measurement:
+            X_labelled_np, X_unlabelled_np, y_labelled_np, text_vector_labelled_np, text_vector_unlabelled_np, \
+                current_word_vectorizer, context_word_vectorizer = \
+                vectorize_data.vectorize_data(text_vector_labelled = text_vector_labelled, \
+                                                  text_vector_unlabelled = text_vector_unlabelled, \
+                                                  label_vector_labelled = label_vector_labelled, \
+                                                  class_dict = label_dict, \
+                                                  use_word2vec = False, \
+                                                  number_of_previous_words = default_settings.number_of_previous_words, \
+                                                  number_of_following_words = default_settings.number_of_following_words, \
+                                                  use_current_word_as_feature = default_settings.use_current_word_as_feature, \
+                                                  min_df_current = default_settings.min_df_current, \
+                                                  min_df_context = default_settings.min_df_context, \
+                                                  word2vecwrapper = None, \
+                                                  current_word_vocabulary = False, \
+                                                  context_word_vocabulary = False, \
+                                                  use_clustering = False, \
+                                                  use_sparse_features = benchmark_settings.use_sparse_features)
+        add_result(measurement)
+
+        model_type = MODEL_TYPES[model_name]
+        with instrumentation.phase("fit") as measurement:
+            model = model_type(label_dict, minority_classes, synthetic_corpus.OUTSIDE_CLASS, synthetic_corpus.BEGINNING_PREFIX, \
+                                   synthetic_corpus.INSIDE_PREFIX, benchmark_settings.max_iterations, False, \
+                                   default_settings.nr_of_cross_validation_splits, default_settings.c_value, \
+                                   default_settings.ssvm_margin_method, default_settings.n_jobs)
+            model.fit(X_labelled_np, y_labelled_np)
+        add_result(measurement)
+
+        with instrumentation.phase("predict") as measurement:
+            model.predict(X_unlabelled_np)
+        add_result(measurement)
+
+        # The selection includes training the model again, as in a round of active selection
+        with instrumentation.phase("select") as measurement:
+            classify_and_select.get_new_data(X_labelled_np, X_unlabelled_np, y_labelled_np, text_vector_labelled_np, \
+                                                 text_vector_unlabelled_np, label_dict, minority_classes, \
+                                                 default_settings.nr_of_samples, "all", \
+                                                 synthetic_corpus.OUTSIDE_CLASS, synthetic_corpus.BEGINNING_PREFIX, \
+                                                 synthetic_corpus.INSIDE_PREFIX, default_settings.inactive_learning, \
+                                                 benchmark_settings.max_iterations, default_settings.prefer_predicted_chunks, \
+                                                 model_type, False, default_settings.nr_of_cross_validation_splits, \
+                                                 default_settings.c_value, margin_method = default_settings.ssvm_margin_method, \
+                                                 n_jobs = default_settings.n_jobs)
+        add_result(measurement)
+    finally:
+        shutil.rmtree(corpus_dir)
+
+    return results
+
+
+def run_benchmark_in_new_process(model_name, nr_of_sentences, benchmark_settings):
+    """
+    Runs run_benchmark in a new process, so that the peak memory is measured for this benchmark only,
+    and so that nothing is cached from the previous benchmarks.
+    """
+    pool = multiprocessing.Pool(processes=1, maxtasksperchild=1)
+    try:
+        return pool.apply(run_benchmark, (model_name, nr_of_sentences, benchmark_settings))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def get_fastest_of_repetitions(repetitions):
+    """
+    returns: the rows of the first repetition, with the smallest wall and CPU time, and the largest peak memory, of all repetitions
+    """
+    results = [dict(row) for row in repetitions[0]]
+    for repetition in repetitions[1:]:
+        for row, repeated_row in zip(results, repetition):
+            row["wall_time"] = min(row["wall_time"], repeated_row["wall_time"])
+            row["cpu_time"] = min(row["cpu_time"], repeated_row["cpu_time"])
+            for column in ["peak_rss_so_far_mb", "peak_rss_growth_mb"]:
+                if repeated_row[column] is not None:
+                    row[column] = max(row[column], repeated_row[column])
+    return results
+
+
+def get_settings_line(benchmark_settings):
+    return "# " + " ".join([setting + "=" + str(getattr(benchmark_settings, setting)) for setting in CORPUS_SETTINGS])
+
+
+def write_results(output_file, results, benchmark_settings):
+    """
+    write_results
+
+    Writes the results as a tab-separated table, after a line with the corpus settings (starting with #)
+    """
+    f = open(output_file, "w")
+    f.write(get_settings_line(benchmark_settings) + "\n")
+    f.write("\t".join(RESULT_COLUMNS) + "\n")
+    for row in results:
+        values = []
+        for column in RESULT_COLUMNS:
+            if isinstance(row[column], float):
+                values.append(str(round(row[column], 4)))
+            else:
+                values.append(str(row[column]))
+        f.write("\t".join(values) + "\n")
+    f.close()
+
+
+def read_results(results_file):
+    """
+    returns: the corpus settings line and the rows of a table written by write_results
+    """
+    f = open(results_file)
+    lines = [line.rstrip("\n") for line in f if line.strip() != ""]
+    f.close()
+    settings_line = lines[0] if lines[0].startswith("#") else None
+    rows = [line.split("\t") for line in lines if not line.startswith("#")]
+    header = rows[0]
+    return settings_line, [dict(zip(header, row)) for row in rows[1:]]
+
+
+def compare_to_baseline(results, baseline_file, benchmark_settings, regression_threshold):
+    """
+    compare_to_baseline
+
+    Prints the wall time of each stage relative to the wall time of the same model, size and stage in baseline_file.
+    returns: the rows that are more than regression_threshold times slower than in the baseline
+    """
+    baseline_settings_line, baseline_rows = read_results(baseline_file)
+    if baseline_settings_line != get_settings_line(benchmark_settings):
+        print("WARNING: The baseline " + baseline_file + " was run with other corpus settings, and is not comparable:")
+        print(baseline_settings_line)
+        return []
+
+    baseline_wall_times = {}
+    for row in baseline_rows:
+        baseline_wall_times[(row["model"], row["nr_of_sentences"], row["stage"])] = float(row["wall_time"])
+
+    regressions = []
+    print("\nCompared to " + baseline_file + " (wall time / wall time of the baseline):")
+    for row in results:
+        key = (row["model"], str(row["nr_of_sentences"]), row["stage"])
+        if key not in baseline_wall_times or baseline_wall_times[key] == 0:
+            continue
+        relative_wall_time = row["wall_time"] / baseline_wall_times[key]
+        print("\t".join([str(el) for el in key]) + "\t" + str(round(relative_wall_time, 2)))
+        if relative_wall_time > regression_threshold:
+            regressions.append(row)
+    return regressions
+
+
+def print_results(results):
+    print("\t".join(RESULT_COLUMNS))
+    for row in results:
+        print("\t".join([str(round(row[column], 4)) if isinstance(row[column], float) else str(row[column]) for column in RESULT_COLUMNS]))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', action='store', dest='sizes', default="100,400,1600", \
+                            help='The numbers of labelled sentences to benchmark, separated by commas. Default: 100,400,1600')
+    parser.add_argument('--models', action='store', dest='models', default=",".join(sorted(MODEL_TYPES.keys())), \
+                            help='The models to benchmark, separated by commas. Default: ' + ",".join(sorted(MODEL_TYPES.keys())))
+    parser.add_argument('--sentence_length', action='store', dest='sentence_length', type=int, default=20, \
+                            help='The average number of tokens in a sentence. Default: 20')
+    parser.add_argument('--vocabulary_size', action='store', dest='vocabulary_size', type=int, default=5000, \
+                            help='The number of different words. Default: 5000')
+    parser.add_argument('--minority_class_rate', action='store', dest='minority_class_rate', type=float, default=0.02, \
+                            help='The probability that a chunk of a minority class starts at a token. Default: 0.02')
+    parser.add_argument('--nr_of_classes', action='store', dest='nr_of_classes', type=int, default=1, \
+                            help='The number of classes of chunks. Default: 1')
+    parser.add_argument('--unlabelled_ratio', action='store', dest='unlabelled_ratio', type=int, default=4, \
+                            help='The number of unlabelled sentences for each labelled sentence. Default: 4')
+    parser.add_argument('--max_iterations', action='store', dest='max_iterations', type=int, default=default_settings.max_iterations, \
+                            help='max_iterations of the structured model. Default: ' + str(default_settings.max_iterations))
+    parser.add_argument('--use_sparse_features', action='store_true', dest='use_sparse_features', \
+                            help='To represent the features as sparse matrices')
+    parser.add_argument('--seed', action='store', dest='seed', type=int, default=1, \
+                            help='The seed used for generating the corpora. Default: 1')
+    parser.add_argument('--repetitions', action='store', dest='repetitions', type=int, default=1, \
+                            help='The number of times to run each benchmark. The fastest time of the repetitions is given. Default: 1')
+    parser.add_argument('--output', action='store', dest='output', default="benchmark_results.tsv", \
+                            help='The file to write the results to. Default: benchmark_results.tsv')
+    parser.add_argument('--baseline', action='store', dest='baseline', \
+                            help='The results of an earlier run (written with --output), to compare with')
+    parser.add_argument('--regression_threshold', action='store', dest='regression_threshold', type=float, default=1.5, \
+                            help='How many times slower than in the baseline a stage can be, before it is listed as slower. Default: 1.5')
+    parser.add_argument('--verbosity', action='store', dest='verbosity', type=int, default=0, \
+                            help='The verbosity of the logging (see verbosity in default_settings). Default: 0')
+    args = parser.parse_args()
+
+    logging_setup.set_up_logging(args.verbosity)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    model_names = args.models.split(",")
+    for model_name in model_names:
+        if model_name not in MODEL_TYPES:
+            print("Unknown model " + model_name + ", it should be one of " + str(sorted(MODEL_TYPES.keys())))
+            exit(1)
+
+    results = []
+    for model_name in model_names:
+        for nr_of_sentences in sizes:
+            print("Benchmarking " + model_name + " with " + str(nr_of_sentences) + " labelled sentences")
+            repetitions = [run_benchmark_in_new_process(model_name, nr_of_sentences, args) for i in range(0, args.repetitions)]
+            results.extend(get_fastest_of_repetitions(repetitions))
+
+    print()
+    print_results(results)
+    write_results(args.output, results, args)
+    print("\nThe results are written to " + args.output)
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args, args.regression_threshold)
+        if len(regressions) > 0:
+            print("\nSlower than " + str(args.regression_threshold) + " times the baseline:")
+            print_results(regressions)
+            exit(1)
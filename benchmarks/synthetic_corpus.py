@@ -0,0 +1,125 @@
+import os
+import numpy as np
+
+#######################################################################################
+# Synthetic corpora in the BIO-format of the labelled and unlabelled data of a project
+# (see the example project), to measure how the vectorizing, training and selection scale
+# with the size of the data. The words are drawn from a vocabulary with a Zipf-like
+# distribution, and each class of chunks has its own cue words, so that the models have
+# something to learn. The same seed always gives the same corpus.
+#######################################################################################
+
+BEGINNING_PREFIX = "B-"
+INSIDE_PREFIX = "I-"
+OUTSIDE_CLASS = "O"
+MAX_CHUNK_LENGTH = 3
+CUE_WORDS_PER_CLASS = 20
+
+
+def get_minority_classes(nr_of_classes):
+    """
+    returns: the minority classes, with their prefixes, of a synthetic corpus with nr_of_classes classes of chunks
+    Ex: ['B-class0', 'I-class0', 'B-class1', 'I-class1']
+    """
+    minority_classes = []
+    for class_nr in range(0, nr_of_classes):
+        minority_classes.append(BEGINNING_PREFIX + "class" + str(class_nr))
+        minority_classes.append(INSIDE_PREFIX + "class" + str(class_nr))
+    return minority_classes
+
+
+def generate_corpus(nr_of_sentences, sentence_length, vocabulary_size, minority_class_rate, nr_of_classes, seed = 1):
+    """
+    generate_corpus
+
+    nr_of_sentences: the number of sentences to generate
+    sentence_length: the average number of tokens in a sentence (the lengths vary between half and one and a half times this)
+    vocabulary_size: the number of different words
+    minority_class_rate: the probability that a chunk of one of the minority classes starts at a token
+    nr_of_classes: the number of classes of chunks (each with a B- and an I- class)
+    seed: the seed of the random generator
+
+    returns: text_vector, label_vector: in the format returned by vectorize_data.read_file_labelled_data
+    Each class of chunks occurs at least once, in the first sentences, so that also small corpora can be trained on.
+    """
+    random_state = np.random.RandomState(seed)
+
+    words = ["w" + str(word_nr) for word_nr in range(0, vocabulary_size)]
+    word_probabilities = 1.0 / np.arange(1, vocabulary_size + 1)
+    word_probabilities = word_probabilities / word_probabilities.sum()
+    cue_words = [["cue" + str(class_nr) + "_" + str(cue_nr) for cue_nr in range(0, CUE_WORDS_PER_CLASS)] \
+                     for class_nr in range(0, nr_of_classes)]
+
+    text_vector = []
+    label_vector = []
+    for sentence_nr in range(0, nr_of_sentences):
+        length = random_state.randint(max(1, sentence_length // 2), sentence_length + sentence_length // 2 + 1)
+        text = [words[word_nr] for word_nr in random_state.choice(vocabulary_size, size=length, p=word_probabilities)]
+        labels = [OUTSIDE_CLASS] * length
+
+        position = 0
+        if sentence_nr < nr_of_classes: # to make sure that all classes occur
+            position = random_state.randint(0, length)
+            position = add_chunk(text, labels, position, sentence_nr, cue_words, random_state)
+        while position < length:
+            if random_state.random_sample() < minority_class_rate:
+                position = add_chunk(text, labels, position, random_state.randint(0, nr_of_classes), cue_words, random_state)
+            else:
+                position = position + 1
+
+        text_vector.append(text)
+        label_vector.append(labels)
+
+    return text_vector, label_vector
+
+
+def add_chunk(text, labels, position, class_nr, cue_words, random_state):
+    """
+    add_chunk
+
+    Replaces the tokens from position with a chunk of the class class_nr (of at most MAX_CHUNK_LENGTH cue words of the class)
+    returns: the position after the chunk
+    """
+    chunk_length = min(random_state.randint(1, MAX_CHUNK_LENGTH + 1), len(text) - position)
+    for chunk_position in range(position, position + chunk_length):
+        text[chunk_position] = cue_words[class_nr][random_state.randint(0, len(cue_words[class_nr]))]
+        if chunk_position == position:
+            labels[chunk_position] = BEGINNING_PREFIX + "class" + str(class_nr)
+        else:
+            labels[chunk_position] = INSIDE_PREFIX + "class" + str(class_nr)
+    return position + chunk_length
+
+
+def write_labelled_file(file_name, text_vector, label_vector):
+    """
+    write_labelled_file
+
+    Writes the samples to file_name in the format of the labelled data: one token and its label per line (separated
+    by a tab), and an empty line after each sentence.
+    """
+    output_dir = os.path.dirname(file_name)
+    if output_dir != "" and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    f = open(file_name, "w")
+    for text, labels in zip(text_vector, label_vector):
+        for word, label in zip(text, labels):
+            f.write(word + "\t" + label + "\n")
+        f.write("\n")
+    f.close()
+
+
+def write_unlabelled_file(file_name, text_vector):
+    """
+    write_unlabelled_file
+
+    Writes the samples to file_name in the format of the unlabelled data: one token per line, and an empty line after each sentence.
+    """
+    output_dir = os.path.dirname(file_name)
+    if output_dir != "" and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    f = open(file_name, "w")
+    for text in text_vector:
+        for word in text:
+            f.write(word + "\n")
+        f.write("\n")
+    f.close()
@@ -1,17 +1,33 @@
+import heapq
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import joblib
+from joblib import Parallel, delayed
 import numpy as np
+import scipy.sparse as sp
 from pystruct.models import ChainCRF
 from pystruct.learners import FrankWolfeSSVM
+from pystruct.utils import compress_sym
 from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import SGDClassifier
 from sklearn.utils import shuffle
 from sklearn.metrics import make_scorer
 from sklearn.metrics import f1_score
 from sklearn.grid_search import GridSearchCV
 from sklearn.cross_validation import StratifiedKFold
 
+import instrumentation
+
+logger = logging.getLogger(__name__)
+
 def get_new_data(X_labelled_np, X_unlabelled_np, y_labelled_np, text_vector_labelled_np, text_vector_unlabelled_np, \
                      label_dict, minority_categories, nr_of_samples,  maximum_samples_to_search_among, outside_class, \
                      beginning_prefix, inside_prefix, inactive_learning, max_iterations, prefer_predicted_chunks, \
-                     model_type, use_cross_validation, nr_of_cross_validation_splits, c_value):
+                     model_type, use_cross_validation, nr_of_cross_validation_splits, c_value, model_state_path = None, \
+                     margin_method = "permutations", n_jobs = 1, feature_fingerprint = None):
 
     """
 
@@ -105,7 +121,8 @@ def get_new_data(X_labelled_np, X_unlabelled_np, y_labelled_np, text_vector_labe
     
     :param c_value: c_value to use (only relevant if use_cross_validation is False)
  
-    :return: to_select_X: A numpy.ndarray containing the features representing the selected data
+    :return: to_select_X: A list with the features representing each selected sample (a numpy.ndarray, or a scipy.sparse.csr_matrix
+    when the features are sparse, with one row per token)
     Ex:
     [ array([[0, 0, 0, ..., 0, 0, 0],
        [0, 0, 0, ..., 0, 0, 0],
@@ -119,20 +136,6 @@ def get_new_data(X_labelled_np, X_unlabelled_np, y_labelled_np, text_vector_labe
        [0, 0, 0, ..., 0, 0, 0],
        ..., 
     
-    :return: unlabelled_x: A numpy.ndarray containing the features representing the still unlabelled data
-    Ex:
-    [ array([[0, 0, 0, ..., 0, 1, 0],
-       [0, 0, 0, ..., 0, 0, 0],
-       [0, 0, 0, ..., 0, 0, 0],
-       ..., 
-       [0, 0, 0, ..., 0, 0, 0],
-       [0, 0, 0, ..., 0, 0, 0],
-       [0, 0, 0, ..., 0, 1, 0]])
-       array([[0, 0, 0, ..., 0, 0, 1],
-       [0, 0, 0, ..., 0, 0, 0],
-       [0, 0, 0, ..., 0, 0, 0],
-       ..., 
-    
     :return: to_select_text: A list containing numpy.ndarray with the tokens in the text that is selected for annotation and pre-labelling
     Ex:
     [array(['14', 'try', 'to', 'see', 'it', 'my', 'way', '!_!'], 
@@ -142,37 +145,136 @@ def get_new_data(X_labelled_np, X_unlabelled_np, y_labelled_np, text_vector_labe
       dtype='<U7'), array(['3_3', 'they', 'decided', 'to', 'follow', 'it', 'in', 'spite', 'of',
        'the', 'warnings', '._.'], 
       dtype='<U8')]
-     :return: sentences_unlabelled: A numpy.ndarray with samples containing the tokens in the text that is not selected, and which is 
-      therefore to remain in the pool of unlabelled data
-     [array(['3_3', 'they', 'decided', 'to', 'follow', 'it', 'in', 'spite', 'of',
-       'the', 'warnings', '._.'], 
-      dtype='<U8')
-      array(['4_4', 'it', 'is', 'clearly', 'wrong', '._.'], 
-      dtype='<U7')
-      ...
-    
      :return: predicted_for_selected: A list of predictions made by the currently trained model on the selected data
      Ex:
      [array([2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2]), array([2, 2, 2, 2, 2, 2]), 
      array([2, 0, 2, 2, 2, 2, 2, 2, 2, 2, 2]), array([2, 2, 2, 2, 2, 2, 2]), array([2, 2, 2, 2, 0, 2, 2, 2, 2])]
+
+     :return: selected_indeces: The indeces in X_unlabelled_np (and text_vector_unlabelled_np) of the selected samples.
+     The selected samples are not removed from X_unlabelled_np, which is instead done by the caller
+     (see unlabelled_pool.UnlabelledPool).
+
+    :param model_state_path: If not None, the path to a file in which the fitted model is saved, so that the model in the next round
+    can be warm-started from it (see get_fitted_model)
+
+    :param margin_method: "permutations" or "viterbi", see StructuredModelFrankWolfeSSVM.get_scores_unlabelled_with_predicted_chunks
+
+    :param n_jobs: The number of processes to use for scoring the unlabelled data (see StructuredModelFrankWolfeSSVM.get_margins)
+
+    :param feature_fingerprint: What identifies the columns of the features (see feature_cache.get_fingerprint), which have to be
+    the same as for the saved model for the model to be warm-started (see get_fitted_model)
     """
 
     maximum_samples_to_search_among = get_maximum_samples_to_search_among(maximum_samples_to_search_among, X_unlabelled_np, nr_of_samples)
     
-    model = model_type(label_dict, minority_categories, outside_class, beginning_prefix, inside_prefix, max_iterations, \
-                           use_cross_validation, nr_of_cross_validation_splits, c_value)
-    print("Started to train the model on the labelled data")
-    model.fit(X_labelled_np, y_labelled_np)
-    print("Training on labelled data finished")
+    with instrumentation.phase("fit") as measurement:
+        model = get_fitted_model(X_labelled_np, y_labelled_np, label_dict, minority_categories, outside_class, beginning_prefix, \
+                                     inside_prefix, max_iterations, model_type, use_cross_validation, nr_of_cross_validation_splits, \
+                                     c_value, model_state_path, margin_method, n_jobs, feature_fingerprint = feature_fingerprint)
+        measurement.count("labelled_samples", len(X_labelled_np))
 
-    to_select_X, unlabelled_x, to_select_text, sentences_unlabelled, predicted_for_selected = \
+    to_select_X, to_select_text, predicted_for_selected, selected_indeces = \
         model.get_selected_unlabelled(X_labelled_np, y_labelled_np, X_unlabelled_np, nr_of_samples, text_vector_labelled_np, \
                                text_vector_unlabelled_np,  maximum_samples_to_search_among, inactive_learning, prefer_predicted_chunks)
 
     #print(predicted_for_selected)
     #print(predicted_for_selected.__class__.__name__)
 
-    return(to_select_X, unlabelled_x, to_select_text, sentences_unlabelled, predicted_for_selected)
+    return(to_select_X, to_select_text, predicted_for_selected, selected_indeces)
+
+
+def get_new_data_from_chunks(X_labelled_np, y_labelled_np, unlabelled_chunks, label_dict, minority_categories, nr_of_samples, \
+                                 nr_of_candidates_to_keep, outside_class, beginning_prefix, inside_prefix, inactive_learning, max_iterations, \
+                                 prefer_predicted_chunks, model_type, use_cross_validation, nr_of_cross_validation_splits, c_value, \
+                                 model_state_path = None, margin_method = "permutations", n_jobs = 1, feature_fingerprint = None):
+    """
+    get_new_data_from_chunks does the same as get_new_data, but for a pool of unlabelled data that is given in chunks,
+    so that the entire pool never has to be vectorized (or kept in memory) at the same time.
+    Each chunk is scored with the fitted model, and only the nr_of_candidates_to_keep best candidates are kept between the chunks.
+    All samples in the pool are searched among, i.e. there is no random selection of samples as with maximum_samples_to_search_among.
+
+    :param unlabelled_chunks: An iterable of (start_index, X_chunk_np, text_vector_chunk_np), e.g. as returned by
+    vectorize_data.vectorize_unlabelled_in_chunks, where start_index is the index in the pool of the first sample in the chunk
+
+    :param nr_of_candidates_to_keep: The maximum number of scored candidates (with and without predicted chunks, respectively) to keep
+    while going through the chunks. (At least nr_of_samples candidates are always kept.)
+
+    The other params are the same as for get_new_data.
+
+    :return: to_select_text: A list containing numpy.ndarray with the tokens in the text that is selected for annotation and pre-labelling
+
+    :return: predicted_for_selected: A list of predictions made by the currently trained model on the selected data
+
+    :return: selected_indeces: The indeces in the pool of the selected samples
+    """
+    try:
+        nr_of_samples = int(nr_of_samples)
+    except ValueError:
+        logger.error("The property nr_of_samples can only take a numerical value, " + str(nr_of_samples) + " is not valid.")
+        exit(1)
+
+    with instrumentation.phase("fit") as measurement:
+        model = get_fitted_model(X_labelled_np, y_labelled_np, label_dict, minority_categories, outside_class, beginning_prefix, \
+                                     inside_prefix, max_iterations, model_type, use_cross_validation, nr_of_cross_validation_splits, \
+                                     c_value, model_state_path, margin_method, n_jobs, feature_fingerprint = feature_fingerprint)
+        measurement.count("labelled_samples", len(X_labelled_np))
+
+    return model.get_selected_unlabelled_from_chunks(unlabelled_chunks, nr_of_samples, nr_of_candidates_to_keep, \
+                                                         inactive_learning, prefer_predicted_chunks)
+
+
+def get_fitted_model(X_labelled_np, y_labelled_np, label_dict, minority_categories, outside_class, beginning_prefix, inside_prefix, \
+                         max_iterations, model_type, use_cross_validation, nr_of_cross_validation_splits, c_value, model_state_path, \
+                         margin_method = "permutations", n_jobs = 1, previous_model = None, feature_fingerprint = None):
+    """
+    get_fitted_model creates a model of model_type and fits it on the labelled data.
+
+    If model_state_path is not None, and a model from the previous round is saved there, the model is first warm-started from
+    the previous model (see the warm_start method of the model types). The fitted model is then saved in model_state_path,
+    to be used in the next round. Model types that do not support warm-starting are not loaded or saved.
+
+    If previous_model is not None, the model is instead warm-started from previous_model (a model that is kept in memory
+    between the rounds, see selection_server).
+
+    The previous model is only used if it was fitted on features with the same feature_fingerprint (see feature_cache.get_fingerprint),
+    since the number of features can be the same also when the columns mean different things (e.g. when the vocabulary has been
+    refitted, or the words have been clustered again). The fingerprint is kept in the feature_fingerprint attribute of the fitted model.
+    If feature_fingerprint is None, the model is not warm-started.
+    """
+    model = model_type(label_dict, minority_categories, outside_class, beginning_prefix, inside_prefix, max_iterations, \
+                           use_cross_validation, nr_of_cross_validation_splits, c_value, margin_method, n_jobs)
+
+    if not model.supports_warm_start and (previous_model is not None or model_state_path is not None):
+        logger.info(model.__name__ + " is always trained from scratch, so the model is not warm-started or saved.")
+        previous_model = None
+        model_state_path = None
+
+    previous_model_description = None
+    if previous_model is not None:
+        previous_model_description = "model of the previous round"
+    elif model_state_path is not None and os.path.exists(model_state_path):
+        previous_model = joblib.load(model_state_path)
+        previous_model_description = "model saved in " + model_state_path
+
+    if previous_model is not None:
+        if previous_model.__name__ != model.__name__ or previous_model.label_dict != model.label_dict:
+            logger.warning("The " + previous_model_description + " is of another type or has other classes. Will train the model from scratch.")
+        elif feature_fingerprint is None or getattr(previous_model, "feature_fingerprint", None) != feature_fingerprint:
+            logger.warning("The " + previous_model_description + " was fitted on other features (e.g. since the vocabulary has changed, " + \
+                           "see use_stable_vocabulary). Will train the model from scratch.")
+        elif model.warm_start(previous_model, X_labelled_np, y_labelled_np):
+            logger.info("The model is warm-started from the " + previous_model_description)
+        else:
+            logger.warning("The " + previous_model_description + " can not be used for warm-starting. Will train the model from scratch.")
+
+    logger.info("Started to train the model on the labelled data")
+    model.fit(X_labelled_np, y_labelled_np)
+    model.feature_fingerprint = feature_fingerprint
+    logger.info("Training on labelled data finished")
+
+    if model_state_path is not None:
+        joblib.dump(model, model_state_path)
+    return model
 
 
 def get_maximum_samples_to_search_among(maximum_samples_to_search_among, X_unlabelled_np, nr_of_samples):
@@ -187,24 +289,24 @@ def get_maximum_samples_to_search_among(maximum_samples_to_search_among, X_unlab
         nr_of_samples_int = int(nr_of_samples)
 
         if isinstance(maximum_samples_to_search_among, str) and maximum_samples_to_search_among.lower() == "all":
-            print("Will search for samples to select among all " + str(len(X_unlabelled_np)) + " unlabelled samples.") 
+            logger.info("Will search for samples to select among all " + str(len(X_unlabelled_np)) + " unlabelled samples.") 
             return len(X_unlabelled_np)    
         try:
             maximum_samples_to_search_among_int = int(maximum_samples_to_search_among)
 
 
             if maximum_samples_to_search_among_int > len(X_unlabelled_np):
-                print("There are " + str(len(X_unlabelled_np)) + " unlabelled samples left. Will search for samples to select among those.") 
+                logger.info("There are " + str(len(X_unlabelled_np)) + " unlabelled samples left. Will search for samples to select among those.") 
                 return len(X_unlabelled_np)
             else:
-                print("Will search for samples to select among " + str(maximum_samples_to_search_among_int) + " randomly selected unlabelled samples.")
+                logger.info("Will search for samples to select among " + str(maximum_samples_to_search_among_int) + " randomly selected unlabelled samples.")
                 return maximum_samples_to_search_among_int
         except ValueError:
-            print("The property maximum_samples_to_search_among can only take a numerical value or the string 'all', " + \
+            logger.error("The property maximum_samples_to_search_among can only take a numerical value or the string 'all', " + \
                       maximum_samples_to_search_among + " is not valid.")
             exit(1)
     except ValueError:
-        print("The property nr_of_samples can only take a numerical value, " + str(nr_of_samples) + " is not valid.")
+        logger.error("The property nr_of_samples can only take a numerical value, " + str(nr_of_samples) + " is not valid.")
         exit(1)
 
 
@@ -215,12 +317,23 @@ def get_maximum_samples_to_search_among(maximum_samples_to_search_among, X_unlab
 #####
 
 #Abstract class
+# The methods for computing the uncertainty margin of samples with predicted chunks for the structured model
+MARGIN_METHODS = ["permutations", "viterbi"]
+
+# The number of passes over the new samples when a NonStructuredSGDLogisticRegression is warm-started
+PARTIAL_FIT_EPOCHS = 5
+
+
 class ModelWrapperBase:
     """
     ModelWrapperBase is an abstract class that all models to be used in the active learning and pre-annotation framework
     are to be subclasses of (it's not enforced, but it's recommended).
 
     """
+    # If the model type implements warm_start. Models of other types are always trained from scratch, and are not saved
+    # for warm-starting (see get_fitted_model).
+    supports_warm_start = False
+
     # Abstract methods, to show what needs to be implemented
     def fit(self, X, Y):
         """
@@ -335,13 +448,33 @@ class ModelWrapperBase:
         raises a NotImplementedError in ModelWrapperBase, and is to be implemented in the subclasses                                                                               
         """
         raise NotImplementedError
-        
+
+    def warm_start(self, previous_model, X, Y):
+        """
+        Makes the next call to fit start from the parameters of previous_model (a model of the same type, fitted in the previous round),
+        instead of from scratch.
+
+        params: X, Y: The training data that the model is to be fitted on
+
+        The caller makes sure that previous_model was fitted on the same features (see get_fitted_model).
+
+        returns True if the model will be warm-started, and False if previous_model can not be used.
+        Returns False in ModelWrapperBase. Subclasses that implement it are also to set supports_warm_start to True.
+        """
+        return False
 
     def init_params(self, label_dict, minority_classes, outside_class, beginning_prefix, inside_prefix, max_iterations, \
-                        use_cross_validation, nr_of_cross_validation_splits, c_value):
+                        use_cross_validation, nr_of_cross_validation_splits, c_value, margin_method = "permutations", \
+                        n_jobs = 1):
         """
         Method for setting all the parameters of the modelwrapper (as specified by the properties).
+        margin_method is only used by the structured model, see StructuredModelFrankWolfeSSVM.get_scores_unlabelled_with_predicted_chunks
+        n_jobs is the number of processes that the structured model uses for scoring the unlabelled data, see StructuredModelFrankWolfeSSVM.get_margins
         """
+        if margin_method not in MARGIN_METHODS:
+            raise ValueError("margin_method can only be one of " + str(MARGIN_METHODS) + ", " + str(margin_method) + " is not valid.")
+        self.margin_method = margin_method
+        self.n_jobs = n_jobs
         self.outside_class = outside_class
         self.beginning_prefix = beginning_prefix
         self.inside_prefix = inside_prefix
@@ -355,14 +488,14 @@ class ModelWrapperBase:
         self.minority_classes = minority_classes
         self.minority_classes_index = []
         for el in self.minority_classes:
-            print("class", el)
+            logger.debug("class " + str(el))
             self.minority_classes_index.append(self.label_dict[el])
     
         self.inv_label_dict = {v: k for k, v in label_dict.items()}
         for el in self.inv_label_dict.keys():
             if el not in self.minority_classes_index:
                 self.majority_class = el
-        print("self.majority_class", self.majority_class)
+        logger.debug("self.majority_class " + str(self.majority_class))
         
         # These two variables are only set if the model is to be saved
         self.current_word_vectorizer = None
@@ -399,17 +532,9 @@ class ModelWrapperBase:
         ...
 
         """
-        X_flat = np.concatenate(X)
+        X_flat = stack_sentences(X)
         predicted =  self.model.predict(X_flat)
-        X_flat_counter = 0
-        predicted_in_sentences = []
-        for sentence in X:
-            predicted_for_sentence = []
-            for word in sentence:
-                predicted_for_sentence.append(predicted[X_flat_counter])
-                X_flat_counter  = X_flat_counter + 1
-            predicted_in_sentences.append(predicted_for_sentence)
-        return predicted_in_sentences
+        return split_into_sentences(predicted, X)
 
     def get_scores_unlabelled_with_predicted_chunks(self, to_search_among_x, ys, selected_indeces, sentences_unlabelled):
         """
@@ -573,7 +698,8 @@ class ModelWrapperBase:
     
     :param prefer_predicted_chunks:  With this option set to True, the active learning prefers unlabelled samples in which chunks are predicted (typically this is set to False, therefore) 
      
-    :return: to_select_X: A numpy.ndarray containing the features representing the selected data
+    :return: to_select_X: A list with the features representing each selected sample (a numpy.ndarray, or a scipy.sparse.csr_matrix
+    when the features are sparse, with one row per token)
     Ex:
     [ array([[0, 0, 0, ..., 0, 0, 0],
        [0, 0, 0, ..., 0, 0, 0],
@@ -587,20 +713,6 @@ class ModelWrapperBase:
        [0, 0, 0, ..., 0, 0, 0],
        ..., 
     
-    :return: unlabelled_x: A numpy.ndarray containing the features representing the still unlabelled data
-    Ex:
-    [ array([[0, 0, 0, ..., 0, 1, 0],
-       [0, 0, 0, ..., 0, 0, 0],
-       [0, 0, 0, ..., 0, 0, 0],
-       ..., 
-       [0, 0, 0, ..., 0, 0, 0],
-       [0, 0, 0, ..., 0, 0, 0],
-       [0, 0, 0, ..., 0, 1, 0]])
-       array([[0, 0, 0, ..., 0, 0, 1],
-       [0, 0, 0, ..., 0, 0, 0],
-       [0, 0, 0, ..., 0, 0, 0],
-       ..., 
-    
     :return: to_select_text: A list containing numpy.ndarray with the tokens in the text that is selected for annotation and pre-labelling
     Ex:
     [array(['14', 'try', 'to', 'see', 'it', 'my', 'way', '!_!'], 
@@ -610,29 +722,24 @@ class ModelWrapperBase:
       dtype='<U7'), array(['3_3', 'they', 'decided', 'to', 'follow', 'it', 'in', 'spite', 'of',
        'the', 'warnings', '._.'], 
       dtype='<U8')]
-     :return: sentences_unlabelled: A numpy.ndarray with samples containing the tokens in the text that is not selected, and which is 
-      therefore to remain in the pool of unlabelled data
-     [array(['3_3', 'they', 'decided', 'to', 'follow', 'it', 'in', 'spite', 'of',
-       'the', 'warnings', '._.'], 
-      dtype='<U8')
-      array(['4_4', 'it', 'is', 'clearly', 'wrong', '._.'], 
-      dtype='<U7')
-      ...
-    
      :return: predicted_for_selected: A list of predictions made by the currently trained model on the selected data
      Ex:
      [array([2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2]), array([2, 2, 2, 2, 2, 2]), 
      array([2, 0, 2, 2, 2, 2, 2, 2, 2, 2, 2]), array([2, 2, 2, 2, 2, 2, 2]), array([2, 2, 2, 2, 0, 2, 2, 2, 2])]
+
+     :return: selected_indeces: The indeces in X_unlabelled_np (and text_vector_unlabelled_np) of the selected samples.
+     The selected samples are not removed from X_unlabelled_np, which is instead done by the caller
+     (see unlabelled_pool.UnlabelledPool).
      """
 
 
 
         # Check the number of samples to select
         if step_size == 0:
-            print("You have chosen to select 0 new samples to pre-annotated. The variable 'nr_of_samples' in 'settings.py' should be at least 1")
+            logger.error("You have chosen to select 0 new samples to pre-annotated. The variable 'nr_of_samples' in 'settings.py' should be at least 1")
             exit(1)
         if step_size > len(unlabelled_x):
-            print("More samples have been asked for than exist among unlabelled. A maximum of " + str(len(unlabelled_x)) + " nr of samples can be returned")
+            logger.warning("More samples have been asked for than exist among unlabelled. A maximum of " + str(len(unlabelled_x)) + " nr of samples can be returned")
             step_size = len(unlabelled_x)
 
 
@@ -641,12 +748,18 @@ class ModelWrapperBase:
         to_search_among_x = []
         for selected_index in selected_indeces:
             to_search_among_x.append(unlabelled_x[selected_index])
-        ys = self.predict(to_search_among_x)
-        print("Requested a search among a maximum of " + str(maximum_samples_to_search_among) + " samples")
+        with instrumentation.phase("predict") as measurement:
+            ys = self.predict(to_search_among_x)
+            measurement.count("samples", len(to_search_among_x))
+        # The predictions of the selected samples are used as pre-annotations, so they do not have to be predicted again
+        predicted_by_index = dict(zip(selected_indeces, ys))
+        logger.info("Requested a search among a maximum of " + str(maximum_samples_to_search_among) + " samples")
 
         # Get scores for the unlabelled samples for which a minority category has been predicted
-        scores_with_index, index_in_which_no_minority_categories_are_predicted = \
-            self.get_scores_unlabelled_with_predicted_chunks(to_search_among_x, ys, selected_indeces, sentences_unlabelled)
+        with instrumentation.phase("score") as measurement:
+            scores_with_index, index_in_which_no_minority_categories_are_predicted = \
+                self.get_scores_unlabelled_with_predicted_chunks(to_search_among_x, ys, selected_indeces, sentences_unlabelled)
+            measurement.count("samples_with_predicted_chunks", len(scores_with_index))
 
         # if there are too few samples among the unlabelled in which minority categoies are predict, also return unlabelled samples without minority categories
         # or if the setting is chosen to don't prefer samples in which minority categores are predicted, compute certainty score for all those unlabelled
@@ -655,12 +768,14 @@ class ModelWrapperBase:
                 number_of_unlabelled_to_select = step_size - len(scores_with_index)
             else: # i.e. not prefer_predicted_chunks 
                 number_of_unlabelled_to_select = len(index_in_which_no_minority_categories_are_predicted) # include all of them, and filter out later
-            print("Will search among " + str(number_of_unlabelled_to_select) + " without labelled chunks.")
-            sorted_indeces_no_predicted_chunks = \
-                self.get_scores_unlabelled_sorted_no_predicted_chunks(number_of_unlabelled_to_select,\
-                                                                          index_in_which_no_minority_categories_are_predicted, sentences_unlabelled, inactive_learning)
+            logger.info("Will search among " + str(number_of_unlabelled_to_select) + " without labelled chunks.")
+            with instrumentation.phase("score") as measurement:
+                sorted_indeces_no_predicted_chunks = \
+                    self.get_scores_unlabelled_sorted_no_predicted_chunks(number_of_unlabelled_to_select,\
+                                                                              index_in_which_no_minority_categories_are_predicted, sentences_unlabelled, inactive_learning)
+                measurement.count("samples_without_predicted_chunks", len(index_in_which_no_minority_categories_are_predicted))
         else:
-            print("Will search for the best ones among the " + str(len(scores_with_index)) + " samples that contained a minority category prediction.")
+            logger.info("Will search for the best ones among the " + str(len(scores_with_index)) + " samples that contained a minority category prediction.")
             sorted_indeces_no_predicted_chunks = [] # nothing without predicted chunks included
 
 
@@ -674,14 +789,110 @@ class ModelWrapperBase:
         for its in index_to_select_among_checked:
             to_select_X.append(unlabelled_x[its])
             to_select_text.append(sentences_unlabelled[its])
-            predicted_for_selected.append(self.predict(unlabelled_x[its:its+1])[0]) # must submit an numpy array to predict
-        print("__________________________")
+            predicted_for_selected.append(predicted_by_index[its])
+        logger.info("__________________________")
+
+        return to_select_X, to_select_text, predicted_for_selected, index_to_select_among_checked
 
-        unlabelled_x = np.delete(unlabelled_x, index_to_select_among_checked, 0)
-        sentences_unlabelled = np.delete(sentences_unlabelled, index_to_select_among_checked, 0)
-        to_select_X = np.array(to_select_X)
+    def get_selected_unlabelled_from_chunks(self, unlabelled_chunks, step_size, nr_of_candidates_to_keep, inactive_learning, prefer_predicted_chunks):
+        """
+        Does the same as get_selected_unlabelled, but for a pool of unlabelled data that is given in chunks (see get_new_data_from_chunks).
+        This method should only be called after the fit method has been called.
 
-        return to_select_X, unlabelled_x, to_select_text, sentences_unlabelled, predicted_for_selected
+        Each chunk is scored using get_scores_unlabelled_with_predicted_chunks and get_scores_unlabelled_sorted_no_predicted_chunks.
+        Only the nr_of_candidates_to_keep best of the samples with predicted chunks, and of the samples without predicted chunks,
+        are kept between the chunks (together with the tokens and the predictions for these samples, but not their features).
+        In addition, the best sample in which each word is predicted as part of a chunk is kept (see get_best_candidate_by_predicted_word),
+        so that the word spread filter of get_selected_sentences_with_different_vocabulary gives the same selection as when
+        all samples are searched among at once.
+
+        returns to_select_text, predicted_for_selected, selected_indeces (see get_new_data_from_chunks)
+        """
+
+        # Check the number of samples to select
+        if step_size == 0:
+            logger.error("You have chosen to select 0 new samples to pre-annotated. The variable 'nr_of_samples' in 'settings.py' should be at least 1")
+            exit(1)
+        nr_of_candidates_to_keep = max(nr_of_candidates_to_keep, step_size)
+
+        candidates_with_predicted_chunks = []
+        candidates_no_predicted_chunks = []
+        best_candidate_by_predicted_word = {}
+        nr_with_predicted_chunks = 0
+        searched_among = 0
+        for start_index, chunk_x, chunk_sentences in unlabelled_chunks:
+            chunk_indeces = list(range(0, len(chunk_x)))
+            with instrumentation.phase("predict") as measurement:
+                ys = self.predict(chunk_x)
+                measurement.count("samples", len(chunk_x))
+            with instrumentation.phase("score") as measurement:
+                scores_with_index, index_in_which_no_minority_categories_are_predicted = \
+                    self.get_scores_unlabelled_with_predicted_chunks(chunk_x, ys, chunk_indeces, chunk_sentences)
+                nr_with_predicted_chunks = nr_with_predicted_chunks + len(scores_with_index)
+
+                # The samples without predicted chunks are only used if there are too few samples with predicted chunks,
+                # or if the setting is chosen to don't prefer samples in which minority categories are predicted
+                if not prefer_predicted_chunks or nr_with_predicted_chunks < step_size:
+                    scores_no_predicted_chunks = \
+                        self.get_scores_unlabelled_sorted_no_predicted_chunks(len(index_in_which_no_minority_categories_are_predicted), \
+                                                                                  index_in_which_no_minority_categories_are_predicted, \
+                                                                                  chunk_sentences, inactive_learning)
+                else:
+                    scores_no_predicted_chunks = []
+                measurement.count("samples", len(chunk_x))
+
+            # Use the indeces in the pool instead of the indeces in the chunk
+            scores_with_index = [(score, start_index + index, yi, sentence) for (score, index, yi, sentence) in scores_with_index]
+            scores_no_predicted_chunks = [(score, start_index + index, yi, sentence) for (score, index, yi, sentence) in scores_no_predicted_chunks]
+
+            candidates_with_predicted_chunks = get_best_candidates(candidates_with_predicted_chunks + scores_with_index, \
+                                                                       nr_of_candidates_to_keep, inactive_learning)
+            update_best_candidate_by_predicted_word(best_candidate_by_predicted_word, scores_with_index, self.majority_class, inactive_learning)
+            candidates_no_predicted_chunks = get_best_candidates(candidates_no_predicted_chunks + scores_no_predicted_chunks, \
+                                                                     nr_of_candidates_to_keep, inactive_learning)
+            searched_among = searched_among + len(chunk_x)
+            logger.info("Searched among " + str(searched_among) + " so far.")
+
+        if searched_among == 0:
+            logger.error("There is no more unlabelled data available. System will exit")
+            exit(1)
+        if step_size > searched_among:
+            logger.warning("More samples have been asked for than exist among unlabelled. A maximum of " + str(searched_among) + " nr of samples can be returned")
+            step_size = searched_among
+
+        # The samples that are the best ones for one of their predicted words are the only ones, apart from the
+        # nr_of_candidates_to_keep best, that can be selected when the word spread is taken into account
+        candidates_with_predicted_chunks = get_best_candidates(candidates_with_predicted_chunks + \
+                                                                   list(best_candidate_by_predicted_word.values()), \
+                                                                   None, inactive_learning)
+        logger.info("Kept " + str(len(candidates_with_predicted_chunks)) + " candidates with predicted chunks, for " + \
+                        str(len(best_candidate_by_predicted_word)) + " different predicted words.")
+
+        # Same selection as in get_selected_unlabelled
+        if len(candidates_with_predicted_chunks) < step_size or not prefer_predicted_chunks and len(candidates_no_predicted_chunks) > 0:
+            if len(candidates_with_predicted_chunks) < step_size:
+                number_of_unlabelled_to_select = step_size - len(candidates_with_predicted_chunks)
+            else: # i.e. not prefer_predicted_chunks
+                number_of_unlabelled_to_select = len(candidates_no_predicted_chunks) # include all of them, and filter out later
+            logger.info("Will search among " + str(number_of_unlabelled_to_select) + " without labelled chunks.")
+            sorted_indeces_no_predicted_chunks = candidates_no_predicted_chunks[:number_of_unlabelled_to_select]
+        else:
+            logger.info("Will search for the best ones among the " + str(len(candidates_with_predicted_chunks)) + \
+                      " samples that contained a minority category prediction.")
+            sorted_indeces_no_predicted_chunks = []
+
+        selected_indeces = \
+            get_selected_sentences_with_different_vocabulary(candidates_with_predicted_chunks, sorted_indeces_no_predicted_chunks,\
+                                                                 step_size, self.majority_class, inactive_learning, prefer_predicted_chunks)
+
+        candidates_by_index = {}
+        for (score, index, yi, sentence) in candidates_with_predicted_chunks + candidates_no_predicted_chunks:
+            candidates_by_index[index] = (yi, sentence)
+        to_select_text = [candidates_by_index[index][1] for index in selected_indeces]
+        predicted_for_selected = [candidates_by_index[index][0] for index in selected_indeces]
+        logger.info("__________________________")
+
+        return to_select_text, predicted_for_selected, selected_indeces
 
     def get_params(self):
         return self.model.get_params()
@@ -690,74 +901,120 @@ class ModelWrapperBase:
 
 class StructuredModelFrankWolfeSSVM(ModelWrapperBase):
     def __init__(self, label_dict, minority_classes, outside_class, beginning_prefix, inside_prefix, max_iterations, \
-                     use_cross_validation, nr_of_cross_validation_splits, c_value):
+                     use_cross_validation, nr_of_cross_validation_splits, c_value, margin_method = "permutations", \
+                     n_jobs = 1):
         if use_cross_validation:
             raise NotImplementedError("Cross validatio not implemented for StructuredModelFrankWolfeSSVM")
         self.model = ChainCRF()
         self.__name__ = "StructuredModelFrankWolfeSSVM"
         self.init_params(label_dict, minority_classes, outside_class, beginning_prefix, inside_prefix, max_iterations, \
-                             use_cross_validation, nr_of_cross_validation_splits, c_value)
+                             use_cross_validation, nr_of_cross_validation_splits, c_value, margin_method, n_jobs)
         
     def fit(self, X, Y):
-        self.model = ChainCRF() # make a new model each time
-        self.ssvm = FrankWolfeSSVM(model=self.model, max_iter=self.max_iterations, C=self.c_value)
+        # make a new model each time
+        if is_sparse_sentences(X):
+            self.model = SparseChainCRF()
+        else:
+            self.model = ChainCRF()
+        self.ssvm = FrankWolfeSSVM(model=self.model, max_iter=self.max_iterations, C=self.c_value, n_jobs=self.n_jobs)
         ret = self.ssvm.fit(X, Y)
         return ret
 
+    # warm_start is not implemented (supports_warm_start is False): In the block-coordinate mode of FrankWolfeSSVM, the dual variables
+    # of each sample start from zero, so a w from the previous round would remain as a constant offset in the weights,
+    # and the model would not be the solution for the current labelled data.
+
     def predict(self, X):
         try:
             return self.ssvm.predict(X)
         except ValueError as e:
-            print("Predict failed, perhaps one feature set was used for training the model, and another feature set is used when predicting")
-            print(str(e))
+            logger.error("Predict failed, perhaps one feature set was used for training the model, and another feature set is used when predicting")
+            logger.error(str(e))
             exit(1)
 
     def score(self, X, Y):
         return self.ssvm.score(X,Y)
 
     def get_smallest_diff_alternative(self, xi, yi, permutation_method):
-        joint = self.model.joint_feature(xi, yi)
-        score = np.dot(self.ssvm.w, joint)
-        #print("score", score)
-        
-        # min_difference is the score difference between the predicted classification and the second best classification
-        min_difference = float("inf")
-
-        alternative_score_to_compare_with = None
+        # The potentials are computed once for the sample, and all alternatives are then scored at the same time
+        # (which gives the same scores as np.dot(self.ssvm.w, self.model.joint_feature(xi, yi_alternative)) for each alternative)
+        unary_potentials = self.model._get_unary_potentials(xi, self.ssvm.w)
+        pairwise_potentials = self.model._get_pairwise_potentials(xi, self.ssvm.w)
 
         # for alternatives to annotated chunks 'get_permutations_with_predicted_chunks' is the permutation_method
         # for alternatives when there are no annotated chunks 'get_permutations_no_predicted_chunks' is the permutation_method
         yi_alternatives = permutation_method(yi, self)
-    
 
-        best_alternative = None
-        for yi_alternative in yi_alternatives:
-            joint_alternative = self.model.joint_feature(xi, yi_alternative)
-            score_alternative = np.dot(self.ssvm.w, joint_alternative)
+        # min_difference is the score difference between the predicted classification and the second best classification
+        return get_smallest_score_difference(unary_potentials, pairwise_potentials, yi, yi_alternatives)
 
-            difference_between_predicted_and_alternative = score - score_alternative
+    def get_smallest_diff_viterbi(self, xi, yi):
+        """
+        Returns the difference between the score of yi and the score of the best classification that is different from yi,
+        among all classifications that follow the beginning/inside constraints (an inside class can only follow a beginning or
+        inside class of the same category, and can not start the sample). The best and second best classifications are found with
+        a 2-best Viterbi search, so there is no limit on the number of positions in which the classification can differ from yi.
+        """
+        unary_potentials = self.model._get_unary_potentials(xi, self.ssvm.w)
+        pairwise_potentials = self.model._get_pairwise_potentials(xi, self.ssvm.w)
+        return get_smallest_difference_viterbi(unary_potentials, pairwise_potentials, yi, self)
 
-            if difference_between_predicted_and_alternative < min_difference:
-                min_difference = difference_between_predicted_and_alternative
-                alternative_score_to_compare_with = score_alternative
-                best_alternative = yi_alternative
-        #print("best_alternative", best_alternative)
-        #print("alternative_score_to_compare_with", alternative_score_to_compare_with)
-        return min_difference
+    def get_margins(self, X, ys, with_predicted_chunks):
+        """
+        Returns the score difference between the predicted classification and the best alternative for each sample in X,
+        with the alternatives for samples with predicted chunks (see get_scores_unlabelled_with_predicted_chunks) if
+        with_predicted_chunks is True, and otherwise the alternatives for samples without predicted chunks.
+
+        If n_jobs is not 1, the samples are split into shards that are scored in n_jobs processes. The features and the weights
+        are then written to memory-mapped files, which the processes read, instead of being sent to each process. The margins are
+        computed in the same way for each sample as when only one process is used, so the result is the same.
+        """
+        if self.n_jobs == 1 or len(X) < 2:
+            if with_predicted_chunks and self.margin_method == "viterbi":
+                return [self.get_smallest_diff_viterbi(xi, yi) for xi, yi in zip(X, ys)]
+            elif with_predicted_chunks:
+                return [self.get_smallest_diff_alternative(xi, yi, get_permutations_with_predicted_chunks) for xi, yi in zip(X, ys)]
+            return [self.get_smallest_diff_alternative(xi, yi, get_permutations_no_predicted_chunks) for xi, yi in zip(X, ys)]
+
+        shared_dir = tempfile.mkdtemp(prefix="scoring_")
+        try:
+            write_shared_scoring_data(shared_dir, X, self.ssvm.w, self.model)
+            label_settings = LabelSettings(self)
+            # A few shards per process, so that the processes are kept busy also when the samples differ in length
+            nr_of_shards = min(len(X), 4 * joblib.effective_n_jobs(self.n_jobs))
+            shard_starts = [int(len(X) * i / nr_of_shards) for i in range(0, nr_of_shards + 1)]
+            margins_for_shards = Parallel(n_jobs=self.n_jobs)(delayed(get_margins_for_shard)\
+                                                                   (shared_dir, start, end, ys[start:end], label_settings, \
+                                                                        self.margin_method, with_predicted_chunks) \
+                                                                   for start, end in zip(shard_starts[:-1], shard_starts[1:]))
+        finally:
+            shutil.rmtree(shared_dir, ignore_errors=True)
+        return [margin for margins in margins_for_shards for margin in margins]
 
     def get_scores_unlabelled_with_predicted_chunks(self, to_search_among_x, ys, selected_indeces, sentences_unlabelled):
+        """
+        Scores the samples in which chunks are predicted by the difference between the score of the predicted classification and
+        the best alternative. With margin_method "permutations", the alternatives are created by get_permutations_with_predicted_chunks
+        (and if there are more than 6 positions to permute, the only alternative is no chunks). With margin_method "viterbi",
+        all alternatives are searched among, with get_smallest_diff_viterbi.
+        """
+        with_predicted_chunks = [is_minority_classes_in_vector(yi, self.minority_classes_index) for yi in ys]
+        margins = self.get_margins([xi for xi, predicted in zip(to_search_among_x, with_predicted_chunks) if predicted], \
+                                       [yi for yi, predicted in zip(ys, with_predicted_chunks) if predicted], True)
+        margins = iter(margins)
+
         scores_with_index = []
         index_in_which_no_minority_categories_are_predicted = []
         searched_among = 0 # Only to print information 
-        for xi, yi, index in zip(to_search_among_x, ys, selected_indeces):
-            if is_minority_classes_in_vector(yi, self.minority_classes_index): # search among those in which minority category has been predicted
-                difference_between_predicted_and_second_best = self.get_smallest_diff_alternative(xi, yi, get_permutations_with_predicted_chunks)
+        for xi, yi, index, predicted in zip(to_search_among_x, ys, selected_indeces, with_predicted_chunks):
+            if predicted: # search among those in which minority category has been predicted
+                difference_between_predicted_and_second_best = next(margins)
                 scores_with_index.append((difference_between_predicted_and_second_best, index, yi, sentences_unlabelled[index])) 
             else:
                 index_in_which_no_minority_categories_are_predicted.append((xi, yi, index))
             searched_among = searched_among + 1
             if searched_among % 100 == 0: # only to print information
-                print("Searched among " + str(searched_among) + " so far.")
+                logger.debug("Searched among " + str(searched_among) + " so far.")
         return scores_with_index, index_in_which_no_minority_categories_are_predicted
 
     
@@ -765,12 +1022,14 @@ class StructuredModelFrankWolfeSSVM(ModelWrapperBase):
     # (where number_of_unlabelled_to_select is equal to len(index_in_which_no_minority_categories_are_predicted) if the setting to not prioritize chunks is chosen.)
     def get_scores_unlabelled_sorted_no_predicted_chunks(self, number_of_unlabelled_to_select, index_in_which_no_minority_categories_are_predicted, sentences_unlabelled, inactive_learning):
 
+        margins = self.get_margins([xi for xi, yi, index in index_in_which_no_minority_categories_are_predicted], \
+                                       [yi for xi, yi, index in index_in_which_no_minority_categories_are_predicted], False)
         scores_with_index_no_predicted_chunks = []
-        for xi, yi, index in index_in_which_no_minority_categories_are_predicted:
-            difference_between_predicted_and_second_best_no_predicted_chunks = self.get_smallest_diff_alternative(xi, yi, get_permutations_no_predicted_chunks)
+        for (xi, yi, index), difference_between_predicted_and_second_best_no_predicted_chunks in \
+                zip(index_in_which_no_minority_categories_are_predicted, margins):
             scores_with_index_no_predicted_chunks.append((difference_between_predicted_and_second_best_no_predicted_chunks, index, yi, sentences_unlabelled[index]))
         if inactive_learning:
-            print("Running in reversed mode, selecting the samples for which the learning is most certain.")
+            logger.info("Running in reversed mode, selecting the samples for which the learning is most certain.")
             sorted_score_index_no_predicted_chunks = sorted(scores_with_index_no_predicted_chunks, reverse=True)
         else:
             # This is the the option that is typically used. The one in which active learning is achieved.
@@ -782,16 +1041,19 @@ class StructuredModelFrankWolfeSSVM(ModelWrapperBase):
 
 
 class NonStructuredLogisticRegression(ModelWrapperBase):
+    supports_warm_start = True
+
     def __init__(self, label_dict, minority_classes, outside_class, beginning_prefix, inside_prefix, max_iterations,  \
-                     use_cross_validation, nr_of_cross_validation_splits, c_value):
+                     use_cross_validation, nr_of_cross_validation_splits, c_value, margin_method = "permutations", \
+                     n_jobs = 1):
         # max_iter not used by the liblinear solver
         self.model = LogisticRegression(verbose=0, penalty='l1', solver='liblinear', C=c_value, random_state = 1)
         self.__name__ = "NonStructuredLogisticRegression"
         self.init_params(label_dict, minority_classes, outside_class, beginning_prefix, inside_prefix, max_iterations, \
-                             use_cross_validation, nr_of_cross_validation_splits, c_value)
+                             use_cross_validation, nr_of_cross_validation_splits, c_value, margin_method, n_jobs)
      
     def fit(self, X, Y):
-        X_flat = np.concatenate(X)
+        X_flat = stack_sentences(X)
         Y_flat = np.concatenate(Y)
 
         if self.use_cross_validation:
@@ -801,7 +1063,7 @@ class NonStructuredLogisticRegression(ModelWrapperBase):
                 if m.startswith(self.beginning_prefix):
                     beginning_classes.append(self.label_dict[m])
             if len(beginning_classes) > 1:
-                print("Cross validation not applicable when having many classes")
+                logger.error("Cross validation not applicable when having many classes")
                 exit(1)
             Y_flat_remove_bi_dist  = [] # only take beginning class into account for determining c-value
             for el in Y_flat:
@@ -811,7 +1073,7 @@ class NonStructuredLogisticRegression(ModelWrapperBase):
                     Y_flat_remove_bi_dist.append(beginning_classes[0])
             Y_flat_remove_bi_dist = np.array(Y_flat_remove_bi_dist)
             
-            print("Starting cross-validation")
+            logger.info("Starting cross-validation")
             parameters={'C': [1, 5, 10]}
             skf = StratifiedKFold(Y_flat_remove_bi_dist, self.nr_of_cross_validation_splits)
 
@@ -822,44 +1084,50 @@ class NonStructuredLogisticRegression(ModelWrapperBase):
             self.model = grid_search_clf.best_estimator_
             self.C = self.model.C
         else:
-            print("No cross-validation")
+            logger.info("No cross-validation")
         ret = self.model.fit(X_flat, Y_flat)
-        print("Model params ", self.model.get_params())
+        logger.info("Model params " + str(self.model.get_params()))
         return ret
 
+    def warm_start(self, previous_model, X, Y):
+        # The liblinear solver always starts from zero, so the saga solver, which minimizes the same l1-regularized loss
+        # (except that the intercept is not regularized), is used instead, starting from the weights of the previous model.
+        # The c-value is chosen again in each round when cross-validation is used, so the model is then trained from scratch.
+        previous = previous_model.model
+        if self.use_cross_validation or not hasattr(previous, "coef_") \
+                or not np.array_equal(previous.classes_, np.unique(np.concatenate(Y))):
+            return False
+        self.model = LogisticRegression(verbose=0, penalty='l1', solver='saga', multi_class='ovr', C=self.c_value, \
+                                            max_iter=self.max_iterations, warm_start=True, random_state = 1)
+        self.model.coef_ = previous.coef_.copy()
+        self.model.intercept_ = previous.intercept_.copy()
+        return True
+
     def predict(self, X):
         return self.predict_nonstructured(X)
 
     def predict_proba(self, X):
-        X_flat = np.concatenate(X)
+        X_flat = stack_sentences(X)
         predicted =  self.model.predict_proba(X_flat)
-        
-        X_flat_counter = 0
-        predicted_in_sentences = []
-        for sentence in X:
-            predicted_for_sentence = []
-            for word in sentence:
-                predicted_for_sentence.append(predicted[X_flat_counter])
-                X_flat_counter  = X_flat_counter + 1
-            predicted_in_sentences.append(predicted_for_sentence)
-        return predicted_in_sentences
+        return split_into_sentences(predicted, X)
 
     def get_probabilities(self, to_search_among_x):
-        probabilities = self.predict_proba(to_search_among_x)
-
-        min_probabilities = []
-        for sentence in probabilities:
-            min_difference_in_sentence = float("inf")
-            for word in sentence:
-                word = list(word)
-                #print("probabilities for word not sorted", word)
-                word_sorted = sorted(word, reverse=True)
-                #print("probabilities for word", word_sorted)
-                diff_best_second_best = word_sorted[0] - word_sorted[1]
-                #print("diff_best_second_best", diff_best_second_best)
-                if diff_best_second_best < min_difference_in_sentence:
-                    min_difference_in_sentence = diff_best_second_best
-            min_probabilities.append(min_difference_in_sentence)
+        """
+        Returns, for each sample, the smallest difference between the probability of the most probable class
+        and the probability of the second most probable class among its tokens (infinity for a sample without tokens)
+        """
+        probabilities = self.model.predict_proba(stack_sentences(to_search_among_x))
+
+        # The two largest probabilities for each token, without sorting all of them
+        two_best = -np.partition(-probabilities, 1, axis=1)[:, :2]
+        diff_best_second_best = two_best[:, 0] - two_best[:, 1]
+
+        sentence_lengths = np.array([sentence.shape[0] for sentence in to_search_among_x])
+        sentence_starts = np.concatenate([[0], np.cumsum(sentence_lengths)[:-1]])
+        min_probabilities = np.full(len(sentence_lengths), float("inf"))
+        non_empty = sentence_lengths > 0
+        if non_empty.any():
+            min_probabilities[non_empty] = np.minimum.reduceat(diff_best_second_best, sentence_starts[non_empty])
         return min_probabilities
 
 
@@ -879,7 +1147,7 @@ class NonStructuredLogisticRegression(ModelWrapperBase):
                 index_in_which_no_minority_categories_are_predicted.append((min_probability_difference, xi, yi, index))
             searched_among = searched_among + 1
             if searched_among % 100 == 0: # only to print information
-                print("Searched among " + str(searched_among) + " so far.")
+                logger.debug("Searched among " + str(searched_among) + " so far.")
         #if len(scores_with_index) > 0:
         #    print("scores_with_index[0]", scores_with_index[0])
         #print("index_in_which_no_minority_categories_are_predicted[0]", index_in_which_no_minority_categories_are_predicted[0])
@@ -895,7 +1163,7 @@ class NonStructuredLogisticRegression(ModelWrapperBase):
         for min_probability_difference, xi, yi, index in index_in_which_no_minority_categories_are_predicted:
             scores_with_index_no_predicted_chunks.append((min_probability_difference, index, yi, sentences_unlabelled[index]))
         if inactive_learning:
-            print("Running in reversed mode, selecting the samples for which the learning is most certain.")
+            logger.info("Running in reversed mode, selecting the samples for which the learning is most certain.")
             sorted_score_index_no_predicted_chunks = sorted(scores_with_index_no_predicted_chunks, reverse=True)
         else:
             # This is the the option that is typically used. The one in which active learning is achieved.
@@ -915,6 +1183,298 @@ class NonStructuredLogisticRegression(ModelWrapperBase):
 
 
 
+class NonStructuredSGDLogisticRegression(NonStructuredLogisticRegression):
+    """
+    NonStructuredSGDLogisticRegression
+
+    A logistic regression that is trained with stochastic gradient descent, so that it can be warm-started in the next round
+    and then only be trained (with partial_fit) on the samples that have been labelled since the previous round.
+    """
+    def __init__(self, label_dict, minority_classes, outside_class, beginning_prefix, inside_prefix, max_iterations,  \
+                     use_cross_validation, nr_of_cross_validation_splits, c_value, margin_method = "permutations", \
+                     n_jobs = 1):
+        if use_cross_validation:
+            raise NotImplementedError("Cross validation not implemented for NonStructuredSGDLogisticRegression")
+        # A larger c_value means less regularization, as for NonStructuredLogisticRegression
+        self.model = SGDClassifier(loss='log_loss', penalty='l1', alpha=0.0001 / c_value, random_state = 1)
+        self.trained_sample_keys = set()
+        self.is_warm_started = False
+        self.__name__ = "NonStructuredSGDLogisticRegression"
+        self.init_params(label_dict, minority_classes, outside_class, beginning_prefix, inside_prefix, max_iterations, \
+                             use_cross_validation, nr_of_cross_validation_splits, c_value, margin_method, n_jobs)
+
+    def fit(self, X, Y):
+        keys = [get_sample_key(xi, yi) for xi, yi in zip(X, Y)]
+        if not self.is_warm_started:
+            ret = self.model.fit(stack_sentences(X), np.concatenate(Y))
+            self.trained_sample_keys = set(keys)
+            return ret
+
+        new_indeces = [i for i, key in enumerate(keys) if key not in self.trained_sample_keys]
+        logger.info("Training on " + str(len(new_indeces)) + " new samples")
+        if len(new_indeces) == 0:
+            return self.model
+        X_new = stack_sentences([X[i] for i in new_indeces])
+        Y_new = np.concatenate([Y[i] for i in new_indeces])
+        classes = np.array(sorted(self.label_dict.values()))
+        for epoch in range(PARTIAL_FIT_EPOCHS):
+            X_new, Y_new = shuffle(X_new, Y_new, random_state = epoch)
+            ret = self.model.partial_fit(X_new, Y_new, classes=classes)
+        self.trained_sample_keys.update(keys)
+        return ret
+
+    def warm_start(self, previous_model, X, Y):
+        self.model = previous_model.model
+        self.trained_sample_keys = previous_model.trained_sample_keys
+        self.is_warm_started = True
+        return True
+
+    def get_cs(self):
+        return str(self.c_value)
+
+
+def get_sample_key(xi, yi):
+    """
+    Small help function that returns a key that identifies a sample by its features and classes
+    """
+    key = hashlib.sha1()
+    if sp.issparse(xi):
+        xi = sp.csr_matrix(xi)
+        key.update(xi.data.tobytes())
+        key.update(xi.indices.tobytes())
+        key.update(xi.indptr.tobytes())
+    else:
+        key.update(np.ascontiguousarray(xi).tobytes())
+    key.update(np.asarray(yi).tobytes())
+    return key.hexdigest()
+
+
+class SparseChainCRF(ChainCRF):
+    """
+    SparseChainCRF
+
+    A ChainCRF for which the features of a sample are given as a scipy.sparse matrix (as created by vectorize_data
+    when use_sparse_features is True), so that they never have to be turned into dense arrays.
+    Only the methods of pystruct's GraphCRF that compute dot products with the features are overridden.
+    """
+    def _get_unary_potentials(self, x, w):
+        self._check_size_w(w)
+        features = self._get_features(x)
+        unary_params = w[:self.n_states * self.n_features].reshape(self.n_states, self.n_features)
+        return np.asarray(features.dot(unary_params.T))
+
+    def joint_feature(self, x, y):
+        self._check_size_x(x)
+        features, edges = self._get_features(x), self._get_edges(x)
+        n_nodes = features.shape[0]
+
+        if isinstance(y, tuple):
+            # y is result of relaxation, tuple of unary and pairwise marginals
+            unary_marginals, pw = y
+            unary_marginals = unary_marginals.reshape(n_nodes, self.n_states)
+            pw = pw.reshape(-1, self.n_states, self.n_states).sum(axis=0)
+        else:
+            y = y.reshape(n_nodes)
+            unary_marginals = np.zeros((n_nodes, self.n_states))
+            unary_marginals[np.arange(n_nodes), y] = 1
+            pw = np.dot(unary_marginals[edges[:, 0]].T, unary_marginals[edges[:, 1]])
+
+        unaries_acc = np.asarray(features.T.dot(unary_marginals)).T
+        if self.directed:
+            pw = pw.ravel()
+        else:
+            pw = compress_sym(pw)
+        return np.hstack([unaries_acc.ravel(), pw])
+
+
+def is_sparse_sentences(X):
+    """
+    Small help function that checks if the samples in X are represented as scipy.sparse matrices.
+    """
+    return len(X) > 0 and sp.issparse(X[0])
+
+
+def stack_sentences(X):
+    """
+    Small help function that turns X, with one feature matrix for each sample, into one matrix with one row for each token.
+    The samples can be either dense numpy arrays or scipy.sparse matrices, and the result is of the same kind.
+    """
+    if is_sparse_sentences(X):
+        return sp.vstack(list(X), format="csr")
+    return np.concatenate(X)
+
+
+def get_smallest_score_difference(unary_potentials, pairwise_potentials, yi, yi_alternatives):
+    """
+    Help function that returns the smallest difference between the score of the classification yi and the scores of
+    the classifications in yi_alternatives (or infinity if there are no alternatives), for a chain model with the given potentials.
+    The score of a classification is the sum of the unary potentials of its classes and the pairwise potentials of its
+    transitions, and all alternatives are scored at the same time.
+
+    params: unary_potentials: ndarray with one row for each token and one column for each class
+    params: pairwise_potentials: ndarray with the potential of each transition, from the class in the row to the class in the column
+    params: yi_alternatives: ndarray with one alternative classification in each row
+    """
+    if len(yi_alternatives) == 0:
+        return float("inf")
+
+    all_y = np.vstack([np.asarray(yi).reshape(1, -1), np.asarray(yi_alternatives).reshape(len(yi_alternatives), -1)])
+    unary_scores = unary_potentials[np.arange(all_y.shape[1]), all_y].sum(axis=1)
+    pairwise_scores = pairwise_potentials[all_y[:, :-1], all_y[:, 1:]].sum(axis=1)
+    scores = unary_scores + pairwise_scores
+    return scores[0] - np.max(scores[1:])
+
+
+class LabelSettings:
+    """
+    LabelSettings
+
+    The settings for the classes of a model wrapper that the permutation methods and get_allowed_transitions use,
+    without the fitted model. Sent to the processes that score the unlabelled data, see StructuredModelFrankWolfeSSVM.get_margins
+    """
+    def __init__(self, model_wrapper):
+        self.majority_class = model_wrapper.majority_class
+        self.inv_label_dict = model_wrapper.inv_label_dict
+        self.minority_classes_index = model_wrapper.minority_classes_index
+        self.outside_class = model_wrapper.outside_class
+        self.beginning_prefix = model_wrapper.beginning_prefix
+        self.inside_prefix = model_wrapper.inside_prefix
+
+
+def write_shared_scoring_data(shared_dir, X, w, model):
+    """
+    Help function that writes the features of the samples in X (one after the other), the start of each sample, and the unary
+    and pairwise parameters of the chain model to .npy files in shared_dir, to be read by get_margins_for_shard
+    """
+    if is_sparse_sentences(X):
+        features = sp.vstack(list(X), format="csr")
+        np.save(os.path.join(shared_dir, "features_data.npy"), features.data)
+        np.save(os.path.join(shared_dir, "features_indices.npy"), features.indices)
+        np.save(os.path.join(shared_dir, "features_indptr.npy"), features.indptr)
+        np.save(os.path.join(shared_dir, "features_shape.npy"), np.array(features.shape))
+    else:
+        np.save(os.path.join(shared_dir, "features.npy"), np.concatenate(X))
+    np.save(os.path.join(shared_dir, "offsets.npy"), np.concatenate([[0], np.cumsum([xi.shape[0] for xi in X])]))
+    np.save(os.path.join(shared_dir, "unary_params.npy"), w[:model.n_states * model.n_features].reshape(model.n_states, model.n_features))
+    np.save(os.path.join(shared_dir, "pairwise_potentials.npy"), model._get_pairwise_potentials(X[0], w))
+
+
+def get_margins_for_shard(shared_dir, start, end, ys, label_settings, margin_method, with_predicted_chunks):
+    """
+    Help function that is run in the processes started by StructuredModelFrankWolfeSSVM.get_margins. Reads the data written by
+    write_shared_scoring_data with memory mapping, and returns the margins of the samples with index start to end.
+    """
+    offsets = np.load(os.path.join(shared_dir, "offsets.npy"))
+    unary_params = np.load(os.path.join(shared_dir, "unary_params.npy"), mmap_mode="r")
+    pairwise_potentials = np.load(os.path.join(shared_dir, "pairwise_potentials.npy"))
+    if os.path.exists(os.path.join(shared_dir, "features.npy")):
+        features = np.load(os.path.join(shared_dir, "features.npy"), mmap_mode="r")
+    else:
+        features = sp.csr_matrix((np.load(os.path.join(shared_dir, "features_data.npy"), mmap_mode="r"), \
+                                      np.load(os.path.join(shared_dir, "features_indices.npy"), mmap_mode="r"), \
+                                      np.load(os.path.join(shared_dir, "features_indptr.npy"), mmap_mode="r")), \
+                                     shape=tuple(np.load(os.path.join(shared_dir, "features_shape.npy"))), copy=False)
+
+    margins = []
+    for i, yi in zip(range(start, end), ys):
+        xi = features[offsets[i]:offsets[i + 1]]
+        # The same computation as in ChainCRF._get_unary_potentials and SparseChainCRF._get_unary_potentials
+        if sp.issparse(xi):
+            unary_potentials = np.asarray(xi.dot(np.asarray(unary_params).T))
+        else:
+            unary_potentials = np.dot(np.asarray(xi), np.asarray(unary_params).T)
+
+        if with_predicted_chunks and margin_method == "viterbi":
+            margins.append(get_smallest_difference_viterbi(unary_potentials, pairwise_potentials, yi, label_settings))
+        elif with_predicted_chunks:
+            yi_alternatives = get_permutations_with_predicted_chunks(yi, label_settings)
+            margins.append(get_smallest_score_difference(unary_potentials, pairwise_potentials, yi, yi_alternatives))
+        else:
+            yi_alternatives = get_permutations_no_predicted_chunks(yi, label_settings)
+            margins.append(get_smallest_score_difference(unary_potentials, pairwise_potentials, yi, yi_alternatives))
+    return margins
+
+
+def get_smallest_difference_viterbi(unary_potentials, pairwise_potentials, yi, model_wrapper):
+    """
+    Help function that returns the difference between the score of yi and the score of the best other classification
+    (see StructuredModelFrankWolfeSSVM.get_smallest_diff_viterbi)
+    """
+    allowed_start, allowed_transitions = get_allowed_transitions(model_wrapper)
+    best_score, best_path, second_best_score = \
+        get_two_best_viterbi(unary_potentials, pairwise_potentials, allowed_start, allowed_transitions)
+    score = get_chain_score(unary_potentials, pairwise_potentials, yi)
+    if np.array_equal(best_path, yi):
+        return score - second_best_score
+    return score - best_score
+
+
+def get_chain_score(unary_potentials, pairwise_potentials, yi):
+    """
+    Help function that returns the score of the classification yi for a chain model with the given potentials
+    """
+    positions = np.arange(len(yi))
+    return unary_potentials[positions, yi].sum() + pairwise_potentials[yi[:-1], yi[1:]].sum()
+
+
+def get_allowed_transitions(model_wrapper):
+    """
+    Help function that returns which classes that are allowed to start a sample (a boolean ndarray with one element for each class),
+    and which transitions that are allowed (a boolean ndarray, from the class in the row to the class in the column).
+    An inside class can only follow a beginning or inside class of the same category, and can not start a sample.
+    """
+    n_states = len(model_wrapper.inv_label_dict)
+    allowed_start = np.ones(n_states, dtype=bool)
+    allowed_transitions = np.ones((n_states, n_states), dtype=bool)
+    for category in range(0, n_states):
+        label = model_wrapper.inv_label_dict[category]
+        if label.startswith(model_wrapper.inside_prefix):
+            allowed_start[category] = False
+            for previous_category in range(0, n_states):
+                previous_label = model_wrapper.inv_label_dict[previous_category]
+                allowed_transitions[previous_category, category] = \
+                    (previous_label.startswith(model_wrapper.beginning_prefix) or previous_label.startswith(model_wrapper.inside_prefix)) \
+                    and previous_label[len(model_wrapper.inside_prefix):] == label[len(model_wrapper.inside_prefix):]
+    return allowed_start, allowed_transitions
+
+
+def get_two_best_viterbi(unary_potentials, pairwise_potentials, allowed_start, allowed_transitions):
+    """
+    Help function that returns the score of the best classification, the best classification, and the score of the second best
+    classification for a chain model with the given potentials, among the classifications that are allowed by allowed_start and
+    allowed_transitions (see get_allowed_transitions). Runs in O(n_tokens * n_states^2).
+    """
+    n_tokens, n_states = unary_potentials.shape
+    transitions = np.where(allowed_transitions, pairwise_potentials, -np.inf)
+
+    # scores[state, k] is the score of the k:th best classification (k = 0, 1) of the tokens so far that ends in state
+    scores = np.full((n_states, 2), -np.inf)
+    scores[:, 0] = np.where(allowed_start, unary_potentials[0], -np.inf)
+    backpointers = np.zeros((n_tokens, n_states), dtype=int)
+    for t in range(1, n_tokens):
+        # candidates[2 * previous_state + k, state]
+        candidates = (scores[:, :, np.newaxis] + transitions[:, np.newaxis, :]).reshape(2 * n_states, n_states)
+        backpointers[t] = np.argmax(candidates, axis=0) // 2
+        two_best = -np.partition(-candidates, 1, axis=0)[:2]
+        scores = two_best.T + unary_potentials[t][:, np.newaxis]
+
+    final_scores = np.sort(scores.ravel())[::-1]
+    best_path = np.zeros(n_tokens, dtype=int)
+    best_path[-1] = np.argmax(scores[:, 0])
+    for t in range(n_tokens - 1, 0, -1):
+        best_path[t - 1] = backpointers[t, best_path[t]]
+    return final_scores[0], best_path, final_scores[1]
+
+
+def split_into_sentences(predicted, X):
+    """
+    Small help function that splits predicted, with one element (or row) for each token in X, into a list with one ndarray
+    for each sample in X.
+    """
+    sentence_lengths = [sentence.shape[0] for sentence in X]
+    return np.split(predicted, np.cumsum(sentence_lengths)[:-1])
+
+
 def is_minority_classes_in_vector(predicted, minority_classes):
     """
 
@@ -926,6 +1486,45 @@ def is_minority_classes_in_vector(predicted, minority_classes):
             return True
     return False
 
+def get_best_candidates(candidates, nr_of_candidates_to_keep, inactive_learning):
+    """
+    Help function that returns the nr_of_candidates_to_keep best of the candidates (tuples of (certainty-score, index, classification, tokens)),
+    sorted in the same order as they are sorted when selecting among them, i.e. the most uncertain first
+    (or the most certain first, if inactive_learning is True).
+    Candidates that occur more than once (with the same index) are only included once.
+    If nr_of_candidates_to_keep is None, all of the candidates are returned.
+    """
+    candidates = list(dict([(candidate[1], candidate) for candidate in candidates]).values())
+    if nr_of_candidates_to_keep is None:
+        nr_of_candidates_to_keep = len(candidates)
+    if inactive_learning:
+        return heapq.nlargest(nr_of_candidates_to_keep, candidates, key=lambda candidate: (candidate[0], candidate[1]))
+    return heapq.nsmallest(nr_of_candidates_to_keep, candidates, key=lambda candidate: (candidate[0], candidate[1]))
+
+
+def update_best_candidate_by_predicted_word(best_candidate_by_predicted_word, candidates, majority_category, inactive_learning):
+    """
+    Help function that updates best_candidate_by_predicted_word (a dict from a word to the best candidate in which the word
+    is predicted as part of a chunk, in the order of get_best_candidates) with candidates (tuples of (certainty-score, index, classification, tokens)).
+
+    get_selected_sentences_with_different_vocabulary skips a sample if one of its predicted words has been predicted in a
+    better sample. A sample that is skipped among all samples is therefore also skipped among these candidates,
+    and a sample that is not skipped is the best one for all of its predicted words, i.e. it is among these candidates.
+    """
+    for candidate in candidates:
+        (score, index, predicted, sentence) = candidate
+        for i, el in enumerate(predicted):
+            if el != majority_category:
+                predicted_word = sentence[i]
+                if predicted_word not in best_candidate_by_predicted_word:
+                    best_candidate_by_predicted_word[predicted_word] = candidate
+                else:
+                    best_score, best_index = best_candidate_by_predicted_word[predicted_word][:2]
+                    if (inactive_learning and (score, index) > (best_score, best_index)) or \
+                            (not inactive_learning and (score, index) < (best_score, best_index)):
+                        best_candidate_by_predicted_word[predicted_word] = candidate
+
+
 def get_selected_sentences_with_different_vocabulary(sorted_score_index, sorted_indeces_no_predicted_chunks, step_size, majority_category, inactive_learning, prefer_predicted_chunks):
     """
     Help function to do the final selection of samples. 
@@ -936,7 +1535,7 @@ def get_selected_sentences_with_different_vocabulary(sorted_score_index, sorted_
     if not prefer_predicted_chunks:
         sorted_score_index = sorted_score_index + sorted_indeces_no_predicted_chunks
     if inactive_learning:
-        print("Running in reversed mode, selecting the samples for which the learning is most certain.")
+        logger.info("Running in reversed mode, selecting the samples for which the learning is most certain.")
         sorted_score_index = sorted(sorted_score_index, reverse=True)
     else:
         # This is the the option that is typically used. The one in which active learning is achieved.
@@ -944,9 +1543,9 @@ def get_selected_sentences_with_different_vocabulary(sorted_score_index, sorted_
     #print("sorted_score_index", sorted_score_index)
 
 
-    print("The best candidates before word spread is taken into account")        
+    logger.debug("The best candidates before word spread is taken into account")
     for el in sorted_score_index[:10]:
-        print(el)
+        logger.debug(str(el))
 
     indeces_to_use = []
     indeces_not_to_use = []
@@ -966,25 +1565,25 @@ def get_selected_sentences_with_different_vocabulary(sorted_score_index, sorted_
         if len(indeces_to_use) >= step_size:
             break
 
-    print("predicted_words", predicted_words)
+    logger.debug("predicted_words " + str(predicted_words))
     
     if len(indeces_to_use) < step_size: #if there weren't enough uncertain with large word spread, take those that have been filtered out
-        print("Can't return samples with the requested word spread")
-        print("Filtered out indeces, that will be used anyway, therefore:")
-        print(step_size - len(indeces_to_use))
-        print(indeces_not_to_use[:step_size - len(indeces_to_use)])
+        logger.info("Can't return samples with the requested word spread")
+        logger.debug("Filtered out indeces, that will be used anyway, therefore:")
+        logger.debug(str(step_size - len(indeces_to_use)))
+        logger.debug(str(indeces_not_to_use[:step_size - len(indeces_to_use)]))
         indeces_to_use = indeces_to_use + indeces_not_to_use[:step_size - len(indeces_to_use)]
     #first_indeces = [index for (score, index, predicted, sentence) in sorted_score_index[:step_size]]
 
-    print("indeces_to_use", indeces_to_use)
+    logger.debug("indeces_to_use " + str(indeces_to_use))
 
     # Only for printing information
     if prefer_predicted_chunks:
         indeces_to_use = indeces_to_use + [el[1] for el in sorted_indeces_no_predicted_chunks]
-        print("The best candidates without a predicted chunk")        
+        logger.debug("The best candidates without a predicted chunk")
         for el in sorted_indeces_no_predicted_chunks:
-            print(el)
-        print("indeces_to_use with chunks all", indeces_to_use)
+            logger.debug(str(el))
+        logger.debug("indeces_to_use with chunks all " + str(indeces_to_use))
 
     return indeces_to_use
 
@@ -1011,8 +1610,8 @@ def get_permutations_with_predicted_chunks(yi, previous_model_wrapper):
             elif previous_model_wrapper.inv_label_dict[el].startswith(previous_model_wrapper.inside_prefix):
                 index_to_permute_inside.append(index)
             else:
-                print("Unknown prefix:")
-                print(previous_model_wrapper.inv_label_dict[el])
+                logger.error("Unknown prefix:")
+                logger.error(previous_model_wrapper.inv_label_dict[el])
                 exit(1)
             if False: # TODO: Add an option to also add this permutation
                 if index + 1 < len(yi):
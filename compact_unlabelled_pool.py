@@ -0,0 +1,20 @@
+"""
+"""
+import argparse
+import os
+import active_learning_preannotation
+import unlabelled_pool
+
+def compact_unlabelled_pool(parser):
+    """
+    Removes the samples that have been selected for labelling from the file with unlabelled data in the project,
+    see unlabelled_pool.compact
+    """
+    properties_main, path_slash_format, path_dot_format = active_learning_preannotation.load_properties(parser)
+    unlabelled_data_path = os.path.join(path_slash_format, properties_main.unlabelled_data_dir, properties_main.unlabelled_data_file)
+    unlabelled_pool.compact(unlabelled_data_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    compact_unlabelled_pool(parser)
@@ -0,0 +1,30 @@
+"""
+"""
+import argparse
+import os
+import active_learning_preannotation
+import compiled_corpus
+
+def compile_corpus(parser):
+    """
+    Compiles the labelled data and the unlabelled data of the project into the format of compiled_corpus,
+    which is used when use_compiled_corpus is True in the settings
+    """
+    properties_main, path_slash_format, path_dot_format = active_learning_preannotation.load_properties(parser)
+
+    labelled_data_dir_for_project = os.path.join(path_slash_format, properties_main.labelled_data_dir)
+    compiled_corpus.compile_labelled_data(labelled_data_dir_for_project, properties_main.data_file_extension, \
+                                              properties_main.minority_classes, properties_main.outside_class, \
+                                              os.path.join(path_slash_format, properties_main.compiled_corpus_dir, \
+                                                               compiled_corpus.LABELLED_CORPUS_DIR))
+
+    unlabelled_data_path = os.path.join(path_slash_format, properties_main.unlabelled_data_dir, properties_main.unlabelled_data_file)
+    if os.path.exists(unlabelled_data_path):
+        compiled_corpus.compile_unlabelled_data(unlabelled_data_path, \
+                                                    os.path.join(path_slash_format, properties_main.compiled_corpus_dir, \
+                                                                     compiled_corpus.UNLABELLED_CORPUS_DIR))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    compile_corpus(parser)
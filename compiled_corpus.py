@@ -0,0 +1,289 @@
+import glob
+import json
+import logging
+import os
+import shutil
+import numpy as np
+
+import vectorize_data
+
+logger = logging.getLogger(__name__)
+
+
+MANIFEST_FILE_NAME = "manifest.json"
+TOKENS_FILE_NAME = "token_ids.npy"
+OFFSETS_FILE_NAME = "sentence_offsets.npy"
+LABELS_FILE_NAME = "label_ids.npy"
+VOCABULARY_FILE_NAME = "vocabulary.json"
+FORMAT_VERSION = 1
+
+LABELLED_CORPUS_DIR = "labelled"
+UNLABELLED_CORPUS_DIR = "unlabelled"
+
+#######################################################################################
+# A compiled format for the labelled and unlabelled data.
+# The tokens (lowercased, and with the fix for one-character tokens, as when the csv-files
+# are read by vectorize_data) are stored as an array of token ids, with a vocabulary that gives
+# the token for each id, and an array with the offset of each sentence in the array of token ids.
+# For labelled data, the labels are stored as an array of label ids in the same way.
+# The arrays are saved as .npy files that are read with memory mapping, so the csv-files
+# do not have to be parsed again as long as they have not changed. The compiled labelled
+# corpus is compiled again when the labelled data has changed (e.g. when new files have been labelled).
+#######################################################################################
+
+class CompiledCorpus:
+    """
+    CompiledCorpus
+
+    A corpus that has been compiled with compile_labelled_data or compile_unlabelled_data. The arrays are read with memory mapping,
+    and the tokens of a sentence are only looked up in the vocabulary when the sentence is read. The ids of a sentence
+    are returned as a view of the memory mapped array, and its tokens and labels as numpy arrays (of str), which are not
+    copied into lists.
+    """
+
+    def __init__(self, corpus_dir):
+        self.corpus_dir = corpus_dir
+        with open(os.path.join(corpus_dir, MANIFEST_FILE_NAME)) as manifest_file:
+            self.manifest = json.load(manifest_file)
+        with open(os.path.join(corpus_dir, VOCABULARY_FILE_NAME)) as vocabulary_file:
+            vocabulary = json.load(vocabulary_file)
+        self.vocabulary = np.empty(len(vocabulary), dtype=object)
+        self.vocabulary[:] = vocabulary
+        self.token_ids = np.load(os.path.join(corpus_dir, TOKENS_FILE_NAME), mmap_mode="r")
+        self.sentence_offsets = np.load(os.path.join(corpus_dir, OFFSETS_FILE_NAME), mmap_mode="r")
+        self.label_ids = None
+        if os.path.exists(os.path.join(corpus_dir, LABELS_FILE_NAME)):
+            self.label_ids = np.load(os.path.join(corpus_dir, LABELS_FILE_NAME), mmap_mode="r")
+            self.label_names = np.empty(len(self.manifest["label_names"]), dtype=object)
+            self.label_names[:] = self.manifest["label_names"]
+
+    def __len__(self):
+        return len(self.sentence_offsets) - 1
+
+    def get_token_ids(self, i):
+        return self.token_ids[self.sentence_offsets[i]:self.sentence_offsets[i + 1]]
+
+    def get_label_ids(self, i):
+        return self.label_ids[self.sentence_offsets[i]:self.sentence_offsets[i + 1]]
+
+    def get_text(self, i):
+        return self.vocabulary[self.get_token_ids(i)]
+
+    def get_labels(self, i):
+        return self.label_names[self.get_label_ids(i)]
+
+    def get_text_vector(self):
+        """
+        Returns the tokens of all sentences, as views of one array with the tokens of the corpus
+        """
+        if len(self) == 0:
+            return []
+        return np.split(self.vocabulary[self.token_ids], self.sentence_offsets[1:-1])
+
+    def get_label_vector(self):
+        """
+        Returns the labels of all sentences, as views of one array with the labels of the corpus
+        """
+        if len(self) == 0:
+            return []
+        return np.split(self.label_names[self.label_ids], self.sentence_offsets[1:-1])
+
+
+def get_sources(file_names):
+    """
+    Returns what identifies the version of the files that a corpus is compiled from (their names, sizes and modification times)
+    """
+    return [[os.path.basename(file_name), os.path.getsize(file_name), os.stat(file_name).st_mtime_ns] for file_name in sorted(file_names)]
+
+
+def get_labelled_files(file_path, data_file_extension):
+    return glob.glob(os.path.join(file_path, "*" + data_file_extension))
+
+
+def save_corpus(corpus_dir, text_vector, manifest, label_vector = None, label_names = None):
+    """
+    Saves the sentences in text_vector (and the labels in label_vector) in the compiled format in corpus_dir.
+    The files are first written to a temporary directory, which then replaces corpus_dir.
+    """
+    vocabulary = {}
+    token_ids = np.zeros(sum([len(text) for text in text_vector]), dtype=np.int32)
+    sentence_offsets = np.zeros(len(text_vector) + 1, dtype=np.int64)
+    position = 0
+    for i, text in enumerate(text_vector):
+        for token in text:
+            if token not in vocabulary:
+                vocabulary[token] = len(vocabulary)
+            token_ids[position] = vocabulary[token]
+            position = position + 1
+        sentence_offsets[i + 1] = position
+
+    temporary_dir = corpus_dir + ".tmp"
+    if os.path.exists(temporary_dir):
+        shutil.rmtree(temporary_dir)
+    os.makedirs(temporary_dir)
+    np.save(os.path.join(temporary_dir, TOKENS_FILE_NAME), token_ids)
+    np.save(os.path.join(temporary_dir, OFFSETS_FILE_NAME), sentence_offsets)
+    if label_vector is not None:
+        label_dict = {label: i for i, label in enumerate(label_names)}
+        label_ids = np.array([label_dict[label] for labels in label_vector for label in labels], dtype=np.int16)
+        np.save(os.path.join(temporary_dir, LABELS_FILE_NAME), label_ids)
+        manifest["label_names"] = label_names
+    with open(os.path.join(temporary_dir, VOCABULARY_FILE_NAME), "w") as vocabulary_file:
+        json.dump(sorted(vocabulary, key=vocabulary.get), vocabulary_file)
+
+    manifest["format_version"] = FORMAT_VERSION
+    manifest["nr_of_sentences"] = len(text_vector)
+    manifest["nr_of_tokens"] = int(position)
+    with open(os.path.join(temporary_dir, MANIFEST_FILE_NAME), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=1)
+
+    if os.path.exists(corpus_dir):
+        shutil.rmtree(corpus_dir)
+    shutil.move(temporary_dir, corpus_dir)
+
+
+def compile_labelled_data(file_path, data_file_extension, minority_classes, outside_class, corpus_dir, \
+                              n_jobs = 1, parse_cache_file = None):
+    """
+    compile_labelled_data
+
+    Reads the labelled data in file_path (with vectorize_data.read_file_labelled_data, using n_jobs and parse_cache_file) and saves it in the
+    compiled format in corpus_dir. The corpus can only be used with the same minority_classes and outside_class.
+
+    returns: text_vector, label_vector, class_dict, as returned by vectorize_data.read_file_labelled_data
+    """
+    # The versions of the files are recorded before they are read, so that a file that changes while it is read is compiled again
+    sources = get_sources(get_labelled_files(file_path, data_file_extension))
+    text_vector, label_vector, class_dict = \
+        vectorize_data.read_file_labelled_data(file_path, data_file_extension, minority_classes, outside_class, n_jobs, parse_cache_file)
+    manifest = {"type": "labelled", "sources": sources, "data_file_extension": data_file_extension, \
+                "minority_classes": minority_classes, "outside_class": outside_class}
+    save_corpus(corpus_dir, text_vector, manifest, label_vector, minority_classes[:] + [outside_class])
+    logger.info("Compiled " + str(len(text_vector)) + " labelled samples from " + file_path + " into " + corpus_dir)
+    return text_vector, label_vector, class_dict
+
+
+def compile_unlabelled_data(file_name, corpus_dir):
+    """
+    compile_unlabelled_data
+
+    Reads the unlabelled data in file_name (in the same way as vectorize_data.read_file_unlabelled_data) and saves it in the
+    compiled format in corpus_dir. The position of a sample in the corpus is the same as in file_name, so the journal of
+    consumed samples (see unlabelled_pool) can be used for the corpus.
+    """
+    text_vector = vectorize_data.read_file_unlabelled_data(file_name)
+    manifest = {"type": "unlabelled", "sources": get_sources([file_name])}
+    save_corpus(corpus_dir, text_vector, manifest)
+    logger.info("Compiled " + str(len(text_vector)) + " unlabelled samples from " + file_name + " into " + corpus_dir)
+
+
+def load_labelled_corpus(corpus_dir, file_path, data_file_extension, minority_classes, outside_class):
+    """
+    load_labelled_corpus
+
+    returns: the CompiledCorpus in corpus_dir, or None if there is no compiled corpus in corpus_dir, or if it has not been
+    compiled from the current version of the labelled data in file_path with the same classes
+    """
+    if not os.path.exists(os.path.join(corpus_dir, MANIFEST_FILE_NAME)):
+        logger.info("There is no compiled corpus in " + corpus_dir + ", will compile the labelled data in " + file_path)
+        return None
+    corpus = CompiledCorpus(corpus_dir)
+    manifest = corpus.manifest
+    if manifest["format_version"] != FORMAT_VERSION or manifest["type"] != "labelled" \
+            or manifest["data_file_extension"] != data_file_extension or manifest["minority_classes"] != list(minority_classes) \
+            or manifest["outside_class"] != outside_class \
+            or manifest["sources"] != get_sources(get_labelled_files(file_path, data_file_extension)):
+        logger.info("The compiled corpus in " + corpus_dir + " is not up to date, will compile the labelled data in " + file_path + " again")
+        return None
+    return corpus
+
+
+def load_unlabelled_corpus(corpus_dir, file_name):
+    """
+    load_unlabelled_corpus
+
+    returns: the CompiledCorpus in corpus_dir, or None if there is no compiled corpus in corpus_dir, or if it has not been
+    compiled from the current version of file_name
+    """
+    if not os.path.exists(os.path.join(corpus_dir, MANIFEST_FILE_NAME)):
+        logger.info("There is no compiled corpus in " + corpus_dir + ", will read the unlabelled data from " + file_name)
+        return None
+    corpus = CompiledCorpus(corpus_dir)
+    manifest = corpus.manifest
+    if manifest["format_version"] != FORMAT_VERSION or manifest["type"] != "unlabelled" \
+            or manifest["sources"] != get_sources([file_name]):
+        logger.warning("The compiled corpus in " + corpus_dir + " is not up to date, will read the unlabelled data from " + file_name + \
+                  " instead. Run compile_corpus.py to update the compiled corpus.")
+        return None
+    return corpus
+
+
+def read_labelled_data(file_path, data_file_extension, minority_classes, outside_class, corpus_dir = None, \
+                           n_jobs = 1, parse_cache_file = None):
+    """
+    read_labelled_data
+
+    Returns the same as vectorize_data.read_file_labelled_data, but reads the compiled corpus in corpus_dir if it is up to date,
+    with the tokens and labels of each sentence as numpy arrays (see CompiledCorpus).
+    If the compiled corpus is not up to date (e.g. since new files have been labelled), or has not been compiled, the labelled data
+    in file_path is compiled into corpus_dir again (with n_jobs and parse_cache_file, see vectorize_data.read_file_labelled_data,
+    so that only the files that have changed are parsed if the parse cache is used).
+    If corpus_dir is None, the labelled data in file_path is read.
+    """
+    if corpus_dir is None:
+        return vectorize_data.read_file_labelled_data(file_path, data_file_extension, minority_classes, outside_class, \
+                                                          n_jobs, parse_cache_file)
+    corpus = load_labelled_corpus(corpus_dir, file_path, data_file_extension, minority_classes, outside_class)
+    if corpus is None:
+        return compile_labelled_data(file_path, data_file_extension, minority_classes, outside_class, corpus_dir, \
+                                         n_jobs, parse_cache_file)
+
+    logger.info("Reading labelled data from the compiled corpus in " + corpus_dir)
+    text_vector = corpus.get_text_vector()
+    label_vector = corpus.get_label_vector()
+    class_dict = {}
+    for i, c in enumerate(minority_classes[:] + [outside_class]):
+        class_dict[c] = i
+    return text_vector, label_vector, class_dict
+
+
+def iterate_unlabelled_data(file_name, skip_ids = None, corpus_dir = None):
+    """
+    iterate_unlabelled_data
+
+    Yields the same as vectorize_data.iterate_unlabelled_data, but reads the compiled corpus in corpus_dir if it is up to date.
+    If corpus_dir is None, or the compiled corpus is not up to date, file_name is read.
+    """
+    corpus = None
+    if corpus_dir is not None:
+        corpus = load_unlabelled_corpus(corpus_dir, file_name)
+    if corpus is None:
+        for text in vectorize_data.iterate_unlabelled_data(file_name, skip_ids):
+            yield text
+        return
+
+    if skip_ids is None:
+        skip_ids = set()
+    else:
+        skip_ids = set(skip_ids)
+    for i in range(len(corpus)):
+        if i not in skip_ids:
+            yield corpus.get_text(i)
+
+
+def get_labelled_corpus_dir(properties, project_path):
+    """
+    returns: the directory of the compiled labelled data of the project, or None if the compiled corpus is not to be used
+    """
+    if not properties.use_compiled_corpus:
+        return None
+    return os.path.join(project_path, properties.compiled_corpus_dir, LABELLED_CORPUS_DIR)
+
+
+def get_unlabelled_corpus_dir(properties, project_path):
+    """
+    returns: the directory of the compiled unlabelled data of the project, or None if the compiled corpus is not to be used
+    """
+    if not properties.use_compiled_corpus:
+        return None
+    return os.path.join(project_path, properties.compiled_corpus_dir, UNLABELLED_CORPUS_DIR)
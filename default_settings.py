@@ -5,6 +5,7 @@
 # Import of the classifiers that are possible to use
 from classify_and_select import StructuredModelFrankWolfeSSVM
 from classify_and_select import NonStructuredLogisticRegression
+from classify_and_select import NonStructuredSGDLogisticRegression
 
 # Minority classes with their prefix. If the classes in the labelled data
 # are not present in this list, they will be ignored
@@ -55,11 +56,30 @@ prefer_predicted_chunks = False
 # Only used by the structured prediction
 max_iterations = 1000
 
+# How the uncertainty is measured for samples in which chunks are predicted, for the structured prediction
+# "permutations": the predicted classification is compared to permutations of the predicted chunks (if more than 6 tokens
+# are included in chunks, it is only compared to the classification with no chunks)
+# "viterbi": the predicted classification is compared to the best other classification, found with a 2-best Viterbi search
+ssvm_margin_method = "permutations"
+
+# The number of processes to use for reading the labelled data files, and for training the structured model and
+# scoring the unlabelled data with it (-1 to use all processors).
+n_jobs = 1
+
 #######
 # Type of model to use (There is only one type available, but to prefer for future ones.)
 
 #model_type = StructuredModelFrankWolfeSSVM
 model_type = NonStructuredLogisticRegression
+#model_type = NonStructuredSGDLogisticRegression
+
+# If the model is to be saved in the project directory after each round, and the model in the next round is to start from
+# the saved model instead of being trained from scratch. NonStructuredLogisticRegression then starts from the weights of the
+# saved model, and NonStructuredSGDLogisticRegression is only trained on the newly labelled samples. StructuredModelFrankWolfeSSVM
+# is always trained from scratch, and is not saved.
+# The saved model is only used if the features are the same as in the previous round (the same columns of the vocabulary,
+# clusters and other feature settings), so this is typically used together with use_stable_vocabulary.
+warm_start_model = False
 
 #####
 # If the model is to be saved, when a evaluation against an external reference standard is carried out
@@ -79,6 +99,76 @@ use_cross_validation = False
 # If 10-fold cross validation is chosen, this c_value is not used
 c_value = 1
 
+# If the features are to be represented as sparse matrices (scipy.sparse.csr_matrix)
+# instead of as dense arrays. This saves a lot of memory (and time) for large vocabularies
+# and large pools of unlabelled data.
+use_sparse_features = False
+
+# If the unlabelled data is to be read, vectorized and scored in chunks of this number of sentences,
+# instead of all at once. Then, the memory needed depends on the chunk size, and not on the size of the pool
+# of unlabelled data. All unlabelled data is then searched among (maximum_samples_to_search_among is not used).
+# None, if the entire pool of unlabelled data is to be read at once.
+unlabelled_chunk_size = None
+
+# When unlabelled_chunk_size is used: The number of the most informative sentences (with and without
+# predicted chunks, respectively) to keep as candidates while going through the chunks. For the word spread
+# of the selected sentences to be the same as when all unlabelled data is read at once, the most informative
+# sentence for each word that is predicted as part of a chunk is also kept (at most one sentence per word).
+nr_of_candidates_to_keep = 100
+
+# If the features of the unlabelled data are to be stored on disk (in feature_cache_dir in the project directory),
+# so that samples that have not changed are not vectorized again in the next round. The stored features can only
+# be used as long as the vocabulary and the feature settings are the same.
+use_feature_cache = False
+
+# If the columns of the features are to stay the same between rounds (instead of refitting the vocabulary on the
+# labelled data in each round). New words are then appended to a vocabulary that is stored in the project directory,
+# and min_df_current, min_df_context and the external vocabularies decide which of the columns that are used.
+# This makes it possible for the feature cache to be used also after new data has been labelled.
+# With whether_to_use_clustering, the clusters are computed once, for the terms in the stable vocabulary when it is first used.
+use_stable_vocabulary = False
+
+# If the labelled and unlabelled data are to be read from a compiled corpus (in compiled_corpus_dir in the project directory),
+# instead of parsing the csv-files in each run. The compiled corpus is created with compile_corpus.py, and is only used
+# as long as the csv-files have not changed since it was compiled. Otherwise the unlabelled csv-file is read, and the labelled
+# data is compiled again (e.g. when new files have been labelled).
+use_compiled_corpus = False
+
+# If the parsed content of each file with labelled data is to be saved (in parse_cache_file in the project directory),
+# so that only the files that are new or have changed are parsed in the next round.
+use_parse_cache = False
+
+# If the word2vec vectors are to be read from the vectors exported for the vocabulary of the project (in word2vec_subset_dir
+# in the project directory) by export_word2vec_subset.py, instead of loading the entire model in each run.
+# The model is then only loaded for words that were not in the project when the vectors were exported.
+use_word2vec_subset = False
+
+# How the word2vec vectors are clustered, when whether_to_use_clustering is True
+# "dbscan": DBSCAN (with eps 0.8), where the neighbours of the vectors are found with a ball tree
+# "minibatch_kmeans": MiniBatchKMeans with nr_of_kmeans_clusters clusters, which scales better to large vocabularies
+clustering_engine = "dbscan"
+nr_of_kmeans_clusters = 1000
+
+# If the clustering of the word2vec vectors is to be saved (in clustering_cache_dir in the project directory),
+# so that it is only computed again when the vocabulary, the model or the clustering settings change.
+use_clustering_cache = False
+
+# How much information to output while running
+# 0: only warnings and errors, 1: information about the progress, 2: also details about individual samples, words and files
+# (messages that concern many samples or words are otherwise counted and reported once)
+verbosity = 1
+
+# If the wall time, CPU time, peak memory and number of processed samples of each phase of a run (read, vectorize,
+# fit, predict, select, write etc.) are to be appended to run_report_file in the project directory (one JSON object per line)
+write_run_report = True
+
+# If the selection server (selection_server.py) is to select candidates for the next batch in the background, with the current
+# model, while the batch that was just selected is being labelled. The next batch is then selected among these candidates
+# with the model trained on the new labelled data, so that only the candidates, and not the entire pool, have to be scored.
+# speculative_candidates_factor is the number of candidates, as a multiple of the number of samples in the batch.
+speculative_selection = False
+speculative_candidates_factor = 5
+
 # Settings, typically not changed
 #################################
 
@@ -91,6 +181,14 @@ evaluation_output_dir = "evaluation"
 separate_evaluation_output_dir = "separate_evaluation"
 separate_evaluation_data_dir = "separate_evaluation_data"
 saved_model_dir = "saved_model"
+feature_cache_dir = "feature_cache"
+stable_vocabulary_file = "stable_vocabulary.json"
+model_state_file = "model_state.pkl"
+compiled_corpus_dir = "compiled_corpus"
+parse_cache_file = "parse_cache.pkl"
+word2vec_subset_dir = "word2vec_subset"
+clustering_cache_dir = "clustering_cache"
+run_report_file = "run_report.jsonl"
 beginning_prefix = "B-"
 inside_prefix = "I-"
 outside_class = "O"
@@ -4,12 +4,17 @@ import argparse
 import train_and_evaluate_model
 import active_learning_preannotation
 import vectorize_data
+import word2vec_subset
+import word2vec_clustering
 import os
 import importlib
 
 def do_cross_validation(parser):
     properties_main, path_slash_format, path_dot_format = active_learning_preannotation.load_properties(parser)
-    word2vecwrapper = vectorize_data.Word2vecWrapper(properties_main.model_path, properties_main.semantic_vector_length)
+    word2vecwrapper = vectorize_data.Word2vecWrapper(properties_main.model_path, properties_main.semantic_vector_length, \
+                                                     word2vec_subset.get_subset_dir(properties_main, path_slash_format), \
+                                                     properties_main.clustering_engine, properties_main.nr_of_kmeans_clusters, \
+                                                     word2vec_clustering.get_clustering_cache_dir(properties_main, path_slash_format))
 
     CROSS_VALIDATION_SETTINGS = "cross_validation_settings"
     if not os.path.exists(os.path.join(path_slash_format, CROSS_VALIDATION_SETTINGS + ".py")):
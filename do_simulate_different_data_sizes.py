@@ -4,6 +4,10 @@ import argparse
 import train_and_evaluate_model
 import active_learning_preannotation
 import vectorize_data
+import word2vec_subset
+import word2vec_clustering
+import logging_setup
+import profiling
 import os
 import importlib
 
@@ -18,6 +22,8 @@ def load_properties(parser, settings_name):
     parser.add_argument('--end_fold', action='store', dest='end_fold', \
                             help='The number of the fold which to end with (i.e., the number just before this one will be the last)')
 
+    profiling.add_profile_arguments(parser)
+
     args = parser.parse_args()
     if not args.project_path:
         print("The argument '--project' with the path to the data needs to be given")
@@ -55,7 +61,9 @@ def load_properties(parser, settings_name):
     #properties = importlib.import_module(project_path + "." + SETTINGS)
 
     properties_container = active_learning_preannotation.PropertiesContainer(properties)
+    logging_setup.set_up_logging(properties_container.verbosity)
     simulation_properties_container = SimulationProperties(properties)
+    profiling.start_profiling_from_arguments(args, path_slash_format)
 
     #active_learning_preannotation.check_properties(properties.minority_classes, properties.outside_class, properties.beginning_prefix, \
      #                    properties.inside_prefix)
@@ -95,7 +103,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     SETTINGS = "different_sizes_simulation_settings"
     properties, simulation_properties, path_slash_format, start_fold, end_fold = load_properties(parser, SETTINGS)
-    word2vecwrapper = vectorize_data.Word2vecWrapper(properties.model_path, properties.semantic_vector_length)
+    word2vecwrapper = vectorize_data.Word2vecWrapper(properties.model_path, properties.semantic_vector_length, \
+                                                     word2vec_subset.get_subset_dir(properties, path_slash_format), \
+                                                     properties.clustering_engine, properties.nr_of_kmeans_clusters, \
+                                                     word2vec_clustering.get_clustering_cache_dir(properties, path_slash_format))
     train_and_evaluate_model.simulate_different_data_sizes(properties, simulation_properties,\
                                                                path_slash_format, word2vecwrapper, start_fold, end_fold)
 
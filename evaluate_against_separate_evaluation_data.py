@@ -4,13 +4,18 @@ import argparse
 import train_and_evaluate_model
 import active_learning_preannotation
 import vectorize_data
+import word2vec_subset
+import word2vec_clustering
 import os
 import importlib
 
 def do_evaluate_against_separate_evaluation_data(parser):
     SETTINGS = "settings"
     properties_main, path_slash_format, path_dot_format = active_learning_preannotation.load_properties(parser)
-    word2vecwrapper = vectorize_data.Word2vecWrapper(properties_main.model_path, properties_main.semantic_vector_length)
+    word2vecwrapper = vectorize_data.Word2vecWrapper(properties_main.model_path, properties_main.semantic_vector_length, \
+                                                     word2vec_subset.get_subset_dir(properties_main, path_slash_format), \
+                                                     properties_main.clustering_engine, properties_main.nr_of_kmeans_clusters, \
+                                                     word2vec_clustering.get_clustering_cache_dir(properties_main, path_slash_format))
     main_properties_file_name = os.path.join(path_slash_format, SETTINGS + ".py")
 
     EVAL_SETTINGS = "evaluate_against_separate_evaluation_data_settings"
@@ -0,0 +1,50 @@
+"""
+"""
+import argparse
+import os
+from sklearn.feature_extraction.text import CountVectorizer
+import active_learning_preannotation
+import vectorize_data
+import compiled_corpus
+import unlabelled_pool
+import word2vec_subset
+
+def export_word2vec_subset(parser):
+    """
+    Exports the word2vec vectors for the tokens in the labelled data and the pool of unlabelled data of the project,
+    to be used when use_word2vec_subset is True in the settings (see word2vec_subset)
+    """
+    properties_main, path_slash_format, path_dot_format = active_learning_preannotation.load_properties(parser)
+    if properties_main.model_path is None:
+        print("There is no 'model_path' in the settings, showing where the word2vec model is")
+        exit(1)
+
+    labelled_data_dir_for_project = os.path.join(path_slash_format, properties_main.labelled_data_dir)
+    labelled_text_vector, labelled_label_vector, label_dict = \
+        compiled_corpus.read_labelled_data(labelled_data_dir_for_project, properties_main.data_file_extension, \
+                                               properties_main.minority_classes, properties_main.outside_class, \
+                                               compiled_corpus.get_labelled_corpus_dir(properties_main, path_slash_format), \
+                                               properties_main.n_jobs, vectorize_data.get_parse_cache_file(properties_main, path_slash_format))
+    tokens = set([token for text in labelled_text_vector for token in text])
+
+    unlabelled_data_path = os.path.join(path_slash_format, properties_main.unlabelled_data_dir, properties_main.unlabelled_data_file)
+    if os.path.exists(unlabelled_data_path):
+        for text in compiled_corpus.iterate_unlabelled_data(unlabelled_data_path, unlabelled_pool.read_consumed_ids(unlabelled_data_path), \
+                                                                compiled_corpus.get_unlabelled_corpus_dir(properties_main, path_slash_format)):
+            tokens.update(text)
+
+    # The tokens are looked up when word2vec features are constructed, and the terms of the tokens
+    # (as given by the CountVectorizer) when the vocabulary is clustered
+    analyzer = CountVectorizer(binary = True).build_analyzer()
+    for token in list(tokens):
+        tokens.update(analyzer(token))
+    # The words in the form in which they are looked up by Word2vecWrapper.get_vector
+    words = [token[0] if len(token) == 3 and token[1] == "_" else token for token in tokens]
+
+    word2vecwrapper = vectorize_data.Word2vecWrapper(properties_main.model_path, properties_main.semantic_vector_length)
+    word2vec_subset.export_subset(word2vecwrapper, words, os.path.join(path_slash_format, properties_main.word2vec_subset_dir))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    export_word2vec_subset(parser)
@@ -0,0 +1,296 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import numpy as np
+import scipy.sparse as sp
+
+logger = logging.getLogger(__name__)
+
+
+INDEX_FILE_NAME = "index.json"
+
+
+def get_fingerprint(current_word_vectorizer, context_word_vectorizer, use_word2vec, word2vecwrapper, \
+                        number_of_previous_words, number_of_following_words, use_current_word_as_feature, use_clustering):
+    """
+    get_fingerprint
+
+    Returns a string that identifies everything (except the tokens of the sample) that the features for a sample depend on:
+    the vocabularies of the vectorizers, the size of the context window, and which other features that are used.
+    If any of these change, the features that are stored in the cache can no longer be used.
+    """
+    settings = {"current_word_vocabulary": get_vocabulary_fingerprint(current_word_vectorizer), \
+                "context_word_vocabulary": get_vocabulary_fingerprint(context_word_vectorizer), \
+                "number_of_previous_words": number_of_previous_words, \
+                "number_of_following_words": number_of_following_words, \
+                "use_current_word_as_feature": use_current_word_as_feature, \
+                "use_word2vec": use_word2vec, \
+                "use_clustering": use_clustering}
+    if use_word2vec or use_clustering:
+        settings["model_path"] = word2vecwrapper.model_path
+        settings["semantic_vector_length"] = word2vecwrapper.semantic_vector_length
+    if use_clustering:
+        # The clusters depend on the vocabulary that was clustered
+        settings["clustered_vocabulary"] = word2vecwrapper._vocabulary_list
+        settings["clustering_engine"] = word2vecwrapper.clustering_engine
+        settings["nr_of_kmeans_clusters"] = word2vecwrapper.nr_of_kmeans_clusters
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def get_vocabulary_fingerprint(vectorizer):
+    """
+    get_vocabulary_fingerprint
+
+    Returns what identifies the columns that vectorizer gives the terms. For a stable_vocabulary.StableCountVectorizer, this is
+    the identity of the stable vocabulary and its number of columns, so that stored features can be used also after new terms
+    have been appended. For a CountVectorizer, it is the entire vocabulary.
+    """
+    if hasattr(vectorizer, "vocabulary_fingerprint"):
+        return vectorizer.vocabulary_fingerprint
+    return sorted([(word, int(column)) for word, column in vectorizer.vocabulary_.items()])
+
+
+def get_key(text):
+    """
+    get_key
+
+    Returns the key under which the features of the sample with the tokens in text are stored
+    """
+    return hashlib.sha1("\n".join(text).encode("utf-8")).hexdigest()
+
+
+class FeatureCache:
+    """
+    FeatureCache
+
+    An on-disk cache for the features of the samples in the pool of unlabelled data, so that samples that have not changed
+    since the last round do not have to be vectorized again.
+
+    The features are stored as shards of rows in scipy.sparse.csr_matrix format, which are saved as .npy files (data, indices, indptr)
+    and read with memory mapping. Each sample is stored under a key that is the hash of its tokens, and the cache is valid for one
+    fingerprint (see get_fingerprint) at a time. When the fingerprint changes, everything in the cache is removed.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        self.fingerprint = None
+        self.nr_of_columns = None
+        self.shards = {} # shard name -> number of rows in the shard
+        self.entries = {} # key -> [shard name, first row, end row]
+        self.next_shard_number = 0
+        self._loaded_shards = {}
+
+        index_path = os.path.join(self.cache_dir, INDEX_FILE_NAME)
+        if os.path.exists(index_path):
+            with open(index_path) as index_file:
+                index = json.load(index_file)
+            self.fingerprint = index["fingerprint"]
+            self.nr_of_columns = index["nr_of_columns"]
+            self.shards = index["shards"]
+            self.entries = index["entries"]
+            self.next_shard_number = index["next_shard_number"]
+
+    def set_fingerprint(self, fingerprint):
+        """
+        set_fingerprint
+
+        Sets the fingerprint of the features that are to be read and stored. If it is different from the fingerprint of the features
+        that are stored in the cache, the stored features are removed.
+        """
+        if fingerprint != self.fingerprint:
+            if self.fingerprint is not None:
+                logger.info("The vocabulary or the feature settings have changed, will clear the feature cache" + \
+                                ("" if self.cache_dir is None else " in " + self.cache_dir))
+            for shard_name in list(self.shards.keys()):
+                self._remove_shard(shard_name)
+            self.entries = {}
+            self.nr_of_columns = None
+            self.fingerprint = fingerprint
+            self._save_index()
+
+    def get_feature_matrix(self, keys):
+        """
+        get_feature_matrix
+
+        Reads the features of the samples with the given keys that are stored in the cache.
+
+        returns feature_matrix: a scipy.sparse.csr_matrix with the rows of the stored samples, one sample after the other
+        (in the order of keys), or None if no sample is stored
+
+        returns missing: a list with the indeces in keys of the samples that are not stored in the cache
+        """
+        missing = []
+        rows_for_shard = {}
+        for i, key in enumerate(keys):
+            if key in self.entries:
+                shard_name, start, end = self.entries[key]
+                if shard_name not in rows_for_shard:
+                    rows_for_shard[shard_name] = []
+                rows_for_shard[shard_name].append(np.arange(start, end))
+            else:
+                missing.append(i)
+
+        if len(rows_for_shard) == 0:
+            return None, missing
+
+        # Read the rows that are needed from each shard. The rows from a shard are read in the order of keys,
+        # so the position of the next sample from each shard in the stacked matrix can be kept track of.
+        parts = []
+        next_row_for_shard = {}
+        position = 0
+        for shard_name, rows in rows_for_shard.items():
+            rows = np.concatenate(rows)
+            parts.append(self._get_shard(shard_name)[rows])
+            next_row_for_shard[shard_name] = position
+            position = position + len(rows)
+        stacked = sp.vstack(parts, format="csr")
+
+        order = []
+        for key in keys:
+            if key in self.entries:
+                shard_name, start, end = self.entries[key]
+                order.append(np.arange(next_row_for_shard[shard_name], next_row_for_shard[shard_name] + end - start))
+                next_row_for_shard[shard_name] = next_row_for_shard[shard_name] + end - start
+        return stacked[np.concatenate(order)], missing
+
+    def store(self, keys, feature_matrix, sentence_offsets):
+        """
+        store
+
+        Stores the features of new samples as a new shard.
+
+        params: keys: the keys of the samples
+        params: feature_matrix, sentence_offsets: the features of the samples, as returned by vectorize_data.get_feature_matrix
+        """
+        if len(keys) == 0:
+            return
+        if self.nr_of_columns is None:
+            self.nr_of_columns = feature_matrix.shape[1]
+
+        shard_name = "shard_" + str(self.next_shard_number)
+        self.next_shard_number = self.next_shard_number + 1
+        feature_matrix = sp.csr_matrix(feature_matrix)
+        np.save(os.path.join(self.cache_dir, shard_name + "_data.npy"), feature_matrix.data)
+        np.save(os.path.join(self.cache_dir, shard_name + "_indices.npy"), feature_matrix.indices)
+        np.save(os.path.join(self.cache_dir, shard_name + "_indptr.npy"), feature_matrix.indptr)
+        self.shards[shard_name] = feature_matrix.shape[0]
+
+        for key, start, end in zip(keys, sentence_offsets[:-1], sentence_offsets[1:]):
+            self.entries[key] = [shard_name, int(start), int(end)]
+        self._save_index()
+
+    def retain(self, keys):
+        """
+        retain
+
+        Evicts all samples that are not among keys (i.e., samples that have been selected or removed from the pool of unlabelled data).
+        Shards that are no longer used are removed, and if less than half of the stored rows are still used, the remaining rows
+        are rewritten into one new shard.
+        """
+        keys = set(keys)
+        self.entries = {key: entry for key, entry in self.entries.items() if key in keys}
+        self._remove_unused_shards()
+
+    def evict(self, keys):
+        """
+        evict
+
+        Evicts the samples with the given keys from the cache.
+        """
+        for key in keys:
+            self.entries.pop(key, None)
+        self._remove_unused_shards()
+
+    def _remove_unused_shards(self):
+        used_rows = {}
+        for shard_name, start, end in self.entries.values():
+            used_rows[shard_name] = used_rows.get(shard_name, 0) + end - start
+        for shard_name in list(self.shards.keys()):
+            if shard_name not in used_rows:
+                self._remove_shard(shard_name)
+
+        nr_of_used_rows = sum(used_rows.values())
+        nr_of_stored_rows = sum(self.shards.values())
+        if len(self.shards) > 1 and 2 * nr_of_used_rows < nr_of_stored_rows:
+            self._compact()
+        else:
+            self._save_index()
+
+    def _compact(self):
+        keys = list(self.entries.keys())
+        lengths = [self.entries[key][2] - self.entries[key][1] for key in keys]
+        feature_matrix, _ = self.get_feature_matrix(keys)
+        old_shard_names = list(self.shards.keys())
+        self.store(keys, feature_matrix, np.concatenate([[0], np.cumsum(lengths)]))
+        for shard_name in old_shard_names:
+            self._remove_shard(shard_name)
+        self._save_index()
+
+    def _get_shard(self, shard_name):
+        if shard_name not in self._loaded_shards:
+            data = np.load(os.path.join(self.cache_dir, shard_name + "_data.npy"), mmap_mode="r")
+            indices = np.load(os.path.join(self.cache_dir, shard_name + "_indices.npy"), mmap_mode="r")
+            indptr = np.load(os.path.join(self.cache_dir, shard_name + "_indptr.npy"), mmap_mode="r")
+            self._loaded_shards[shard_name] = sp.csr_matrix((data, indices, indptr), \
+                                                                shape=(self.shards[shard_name], self.nr_of_columns), copy=False)
+        return self._loaded_shards[shard_name]
+
+    def _remove_shard(self, shard_name):
+        self._loaded_shards.pop(shard_name, None)
+        for part in ["_data.npy", "_indices.npy", "_indptr.npy"]:
+            path = os.path.join(self.cache_dir, shard_name + part)
+            if os.path.exists(path):
+                os.remove(path)
+        self.shards.pop(shard_name, None)
+
+    def _save_index(self):
+        index = {"fingerprint": self.fingerprint, "nr_of_columns": self.nr_of_columns, "shards": self.shards, \
+                 "entries": self.entries, "next_shard_number": self.next_shard_number}
+        index_path = os.path.join(self.cache_dir, INDEX_FILE_NAME)
+        with open(index_path + ".tmp", "w") as index_file:
+            json.dump(index, index_file)
+        shutil.move(index_path + ".tmp", index_path)
+
+
+class MemoryFeatureCache(FeatureCache):
+    """
+    MemoryFeatureCache
+
+    A FeatureCache that keeps the features in memory instead of on disk, for a process that runs several rounds
+    of selection (see selection_server).
+    """
+
+    def __init__(self):
+        self.cache_dir = None
+        self.fingerprint = None
+        self.nr_of_columns = None
+        self.shards = {}
+        self.entries = {}
+        self.next_shard_number = 0
+        self._loaded_shards = {} # shard name -> the features of the shard, as a scipy.sparse.csr_matrix
+
+    def store(self, keys, feature_matrix, sentence_offsets):
+        if len(keys) == 0:
+            return
+        if self.nr_of_columns is None:
+            self.nr_of_columns = feature_matrix.shape[1]
+
+        shard_name = "shard_" + str(self.next_shard_number)
+        self.next_shard_number = self.next_shard_number + 1
+        self._loaded_shards[shard_name] = sp.csr_matrix(feature_matrix)
+        self.shards[shard_name] = feature_matrix.shape[0]
+
+        for key, start, end in zip(keys, sentence_offsets[:-1], sentence_offsets[1:]):
+            self.entries[key] = [shard_name, int(start), int(end)]
+
+    def _remove_shard(self, shard_name):
+        self._loaded_shards.pop(shard_name, None)
+        self.shards.pop(shard_name, None)
+
+    def _save_index(self):
+        pass
@@ -0,0 +1,179 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+try:
+    import resource
+except ImportError: # not available on all platforms, then the peak memory is not measured
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+#######################################################################################
+# Measurements of the phases of a run (e.g. read, vectorize, fit, predict, score, select
+# and write), with the wall time, the CPU time, the peak memory and counts of the items
+# processed. A run is started with start_run and ended with end_run, and the code of a phase
+# is measured with "with phase(name) as measurement". Each phase of the run is appended as one
+# JSON object to the report file of the run (a JSON-lines file in the project directory),
+# so that the runs of a project can be compared round by round. Phases that are measured
+# within another phase are included as subphases in the record of the outer phase.
+#######################################################################################
+
+# The runs that have been started, in each thread (so that phases that are measured in a background thread
+# belong to the run started in that thread)
+_threads = threading.local()
+
+
+def get_runs():
+    if not hasattr(_threads, "runs"):
+        _threads.runs = []
+    return _threads.runs
+
+
+class Measurement:
+    """
+    Measurement
+
+    The measurement of one phase. Counts of the items processed in the phase are added with count.
+    """
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.counts = {}
+        self.subphases = {}
+        self.start_time = time.time()
+        self.start_cpu_time = time.process_time()
+        self.wall_time = None
+        self.cpu_time = None
+
+    def count(self, name, nr_of_items):
+        self.counts[name] = self.counts.get(name, 0) + int(nr_of_items)
+
+    def stop(self):
+        self.wall_time = time.time() - self.start_time
+        self.cpu_time = time.process_time() - self.start_cpu_time
+
+    def add_subphase(self, measurement):
+        """
+        Adds a measurement of a phase within this phase. Phases with the same name are added together.
+        """
+        add_to_subphases(self.subphases, measurement.name, {"occurrences": 1, "wall_time": measurement.wall_time, \
+                                                                "cpu_time": measurement.cpu_time, "counts": measurement.counts, \
+                                                                "subphases": measurement.subphases})
+
+
+def add_to_subphases(subphases, name, record):
+    """
+    Adds record (the occurrences, times, counts and subphases of a phase) to the subphase name in subphases.
+    Subphases with the same name are added together, also at the levels below.
+    """
+    subphase = subphases.setdefault(name, {"occurrences": 0, "wall_time": 0.0, "cpu_time": 0.0, "counts": {}})
+    subphase["occurrences"] = subphase["occurrences"] + record["occurrences"]
+    subphase["wall_time"] = subphase["wall_time"] + record["wall_time"]
+    subphase["cpu_time"] = subphase["cpu_time"] + record["cpu_time"]
+    for count_name, nr_of_items in record["counts"].items():
+        subphase["counts"][count_name] = subphase["counts"].get(count_name, 0) + nr_of_items
+    for nested_name, nested_record in record.get("subphases", {}).items():
+        add_to_subphases(subphase.setdefault("subphases", {}), nested_name, nested_record)
+
+
+class RunReport:
+    """
+    RunReport
+
+    The phases of a run, that are appended to report_file (or only logged, if report_file is None)
+    """
+
+    def __init__(self, run_name, report_file = None, labels = None):
+        self.run_name = run_name
+        self.report_file = report_file
+        self.labels = labels if labels is not None else {}
+        self.run_id = time.strftime("%Y%m%d_%H%M%S") + "_" + str(os.getpid())
+        self.open_phases = []
+
+    def write(self, measurement):
+        peak_rss_mb = get_peak_rss_mb()
+        logger.info("Phase " + measurement.name + ": " + str(round(measurement.wall_time, 3)) + " s (CPU " + \
+                        str(round(measurement.cpu_time, 3)) + " s)" + \
+                        ("" if peak_rss_mb is None else ", peak memory " + str(round(peak_rss_mb)) + " MB"))
+        if self.report_file is None:
+            return
+
+        record = {"run": self.run_id, "run_name": self.run_name}
+        record.update(self.labels)
+        record.update(measurement.labels)
+        record.update({"phase": measurement.name, \
+                       "start_time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(measurement.start_time)), \
+                       "wall_time": round(measurement.wall_time, 6), "cpu_time": round(measurement.cpu_time, 6), \
+                       "peak_rss_mb": peak_rss_mb, "counts": measurement.counts, "subphases": measurement.subphases})
+        report_file = open(self.report_file, "a")
+        report_file.write(json.dumps(record) + "\n")
+        report_file.close()
+
+
+def get_peak_rss_mb():
+    """
+    returns: the largest amount of memory the process has used so far, in MB, or None if it can not be measured
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is given in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+
+
+def start_run(run_name, report_file = None, **labels):
+    """
+    start_run
+
+    Starts a run, to which the phases measured until end_run is called belong.
+    report_file: the file to append the records of the phases to, or None if they are only to be logged
+    labels: values that are included in the record of each phase of the run, e.g. the number of a fold
+    """
+    get_runs().append(RunReport(run_name, report_file, labels))
+
+
+def end_run():
+    runs = get_runs()
+    if len(runs) > 0:
+        runs.pop()
+
+
+@contextlib.contextmanager
+def phase(name, **labels):
+    """
+    phase
+
+    Measures the code in the with-block as the phase name of the run that was started last (in the same thread).
+    Yields a Measurement, to which counts of the processed items can be added.
+    labels: values that are included in the record of the phase, e.g. the number of the round
+    """
+    measurement = Measurement(name, labels)
+    runs = get_runs()
+    report = runs[-1] if len(runs) > 0 else None
+    if report is not None:
+        report.open_phases.append(measurement)
+    try:
+        yield measurement
+    finally:
+        if report is not None:
+            report.open_phases.pop()
+    measurement.stop()
+
+    if report is None:
+        return
+    if len(report.open_phases) > 0:
+        report.open_phases[-1].add_subphase(measurement)
+    else:
+        report.write(measurement)
+
+
+def get_run_report_file(properties, project_path):
+    """
+    returns: the file of the run report of the project, or None if no run report is to be written
+    """
+    if not properties.write_run_report:
+        return None
+    return os.path.join(project_path, properties.run_report_file)
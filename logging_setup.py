@@ -0,0 +1,74 @@
+import logging
+import sys
+
+
+MAX_DETAILED_MESSAGES = 10
+
+#######################################################################################
+# The logging of the modules that do the vectorizing, training and selection. Progress is
+# logged at level INFO, and details about individual samples, words or files at level DEBUG.
+# Messages that would otherwise be logged once for each item are instead counted with a
+# MessageCounter, which logs the counts once when a phase is finished.
+#######################################################################################
+
+def set_up_logging(verbosity):
+    """
+    set_up_logging
+
+    Sets up the logging to stdout, for the given verbosity:
+    0: only warnings and errors
+    1: also information about the progress (the default)
+    2: also details about individual samples, words and files
+    """
+    if verbosity <= 0:
+        level = logging.WARNING
+    elif verbosity == 1:
+        level = logging.INFO
+    else:
+        level = logging.DEBUG
+
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers[:]:
+        if getattr(handler, "is_set_up_by_logging_setup", False): # not to log the messages twice if set up again
+            root_logger.removeHandler(handler)
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    handler.is_set_up_by_logging_setup = True
+    root_logger.addHandler(handler)
+    root_logger.setLevel(level)
+
+
+class MessageCounter:
+    """
+    MessageCounter
+
+    Counts messages that would otherwise be logged once for each item, and logs how many times each message has occurred
+    when report is called. The details of the first max_detailed_messages occurrences of each message are logged at level DEBUG.
+    """
+
+    def __init__(self, logger, max_detailed_messages = MAX_DETAILED_MESSAGES):
+        self.logger = logger
+        self.max_detailed_messages = max_detailed_messages
+        self.counts = {}
+
+    def count(self, message, detail = None):
+        self.counts[message] = self.counts.get(message, 0) + 1
+        if detail is not None and self.counts[message] <= self.max_detailed_messages:
+            self.logger.debug(message + ": " + detail)
+
+    def add(self, counts):
+        """
+        Adds counts (the counts attribute of another MessageCounter), e.g. from a MessageCounter used in another process
+        """
+        for message, count in counts.items():
+            self.counts[message] = self.counts.get(message, 0) + count
+
+    def report(self, phase, level = logging.INFO):
+        """
+        report
+
+        Logs the number of times each message has occurred during phase, and starts counting from zero again
+        """
+        for message in sorted(self.counts):
+            self.logger.log(level, phase + ": " + message + " (" + str(self.counts[message]) + " times)")
+        self.counts = {}
@@ -0,0 +1,186 @@
+import atexit
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import time
+try:
+    import pyinstrument
+except ImportError: # pyinstrument is only needed when it is chosen as profiler
+    pyinstrument = None
+
+CPROFILE = "cprofile"
+PYINSTRUMENT = "pyinstrument"
+PROFILERS = [CPROFILE, PYINSTRUMENT]
+
+# Stacks with less than this part of the total time are left out of the collapsed stack file (of cProfile)
+MIN_PART_OF_TOTAL_TIME = 0.0001
+
+logger = logging.getLogger(__name__)
+
+#######################################################################################
+# Profiling of a run of one of the scripts, turned on with the command line option --profile
+# (see add_profile_arguments). The profiler is started when the settings have been loaded,
+# and the result is written when the script ends:
+# <output>.txt: the functions sorted by cumulative time (by the time of each call tree, for pyinstrument)
+# <output>.collapsed: the call stacks in the collapsed format ("f1;f2;f3 microseconds" on each line)
+# used by flamegraph.pl, speedscope and inferno to draw flame graphs
+# <output>.prof: the raw statistics of cProfile, that can be read with pstats or snakeviz
+#######################################################################################
+
+def add_profile_arguments(parser):
+    """
+    add_profile_arguments
+
+    Adds the options --profile and --profile-output to parser (an instance of argparse.ArgumentParser)
+    """
+    parser.add_argument('--profile', action='store', dest='profile', nargs='?', const=CPROFILE, choices=PROFILERS, \
+                            help='Profile the run, with cProfile (the default) or pyinstrument')
+    parser.add_argument('--profile-output', action='store', dest='profile_output', \
+                            help='The path, without file extension, to write the profile to. ' + \
+                            'Default: profile_<date>_<time> in the project directory')
+
+
+def start_profiling_from_arguments(args, project_path):
+    """
+    Starts profiling if --profile was given in args (the result of parser.parse_args())
+    """
+    if not args.profile:
+        return
+    output = args.profile_output
+    if not output:
+        output = os.path.join(project_path, "profile_" + time.strftime("%Y%m%d_%H%M%S"))
+    start_profiling(args.profile, output)
+
+
+def start_profiling(profiler_name, output):
+    """
+    start_profiling
+
+    Starts the profiler profiler_name (CPROFILE or PYINSTRUMENT), and registers that the profile is to be written
+    to files starting with output when the script ends.
+    """
+    output_dir = os.path.dirname(output)
+    if output_dir != "" and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    if profiler_name == CPROFILE:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        atexit.register(write_cprofile, profiler, output)
+    elif profiler_name == PYINSTRUMENT:
+        if pyinstrument is None:
+            logger.error("The profiler " + PYINSTRUMENT + " is not installed. Install it with 'pip install pyinstrument', or use " + CPROFILE)
+            sys.exit(1)
+        profiler = pyinstrument.Profiler()
+        profiler.start()
+        atexit.register(write_pyinstrument, profiler, output)
+    else:
+        raise ValueError("Unknown profiler " + str(profiler_name) + ", it should be one of " + str(PROFILERS))
+    logger.info("Profiling with " + profiler_name + ", the profile will be written to " + output + ".*")
+
+
+def write_cprofile(profiler, output):
+    profiler.disable()
+    profiler.dump_stats(output + ".prof")
+
+    text = io.StringIO()
+    stats = pstats.Stats(profiler, stream=text)
+    stats.sort_stats("cumulative").print_stats()
+    f = open(output + ".txt", "w")
+    f.write(text.getvalue())
+    f.close()
+
+    write_collapsed_stacks(output + ".collapsed", get_collapsed_stacks_from_cprofile(stats.stats))
+    logger.info("The profile is written to " + output + ".txt, " + output + ".collapsed and " + output + ".prof")
+
+
+def write_pyinstrument(profiler, output):
+    profiler.stop()
+    f = open(output + ".txt", "w")
+    f.write(profiler.output_text(unicode=False, color=False))
+    f.close()
+
+    stacks = {}
+    root_frame = profiler.last_session.root_frame()
+    if root_frame is not None:
+        add_pyinstrument_stacks(root_frame, [], stacks)
+    write_collapsed_stacks(output + ".collapsed", stacks)
+    logger.info("The profile is written to " + output + ".txt and " + output + ".collapsed")
+
+
+def get_function_name(file_name, line_number, function_name):
+    return function_name + " (" + os.path.basename(file_name) + ":" + str(line_number) + ")"
+
+
+def get_collapsed_stacks_from_cprofile(stats):
+    """
+    get_collapsed_stacks_from_cprofile
+
+    cProfile only records the time of each pair of calling and called function, and not entire call stacks. The stacks
+    are therefore estimated by following the calls from the functions that were not called by other profiled functions,
+    and dividing the time of a function between the functions that called it, in proportion to the time of each call.
+    Stacks in which a function calls itself (directly or indirectly) are cut where the recursion starts.
+
+    stats: the stats of a pstats.Stats, i.e. a dict from (file_name, line_number, function_name) to
+    (primitive calls, calls, time in the function itself, cumulative time, {calling function: (the same for these calls)})
+
+    returns: a dict from a stack (a tuple of function names, with the outermost first) to its time in seconds
+    """
+    callees = {}
+    for function, (primitive_calls, calls, own_time, cumulative_time, callers) in stats.items():
+        for caller, caller_stats in callers.items():
+            callees.setdefault(caller, []).append((function, caller_stats[3]))
+
+    roots = [function for function, function_stats in stats.items() if len(function_stats[4]) == 0]
+    total_time = sum([stats[function][3] for function in roots])
+    min_time = total_time * MIN_PART_OF_TOTAL_TIME
+
+    stacks = {}
+    # Each item is the stack of functions, and the time of the stack (the part of the cumulative time of the last function)
+    to_visit = [((function,), stats[function][3]) for function in roots]
+    while len(to_visit) > 0:
+        stack, stack_time = to_visit.pop()
+        function = stack[-1]
+        cumulative_time = stats[function][3]
+        if cumulative_time <= 0:
+            continue
+        part = stack_time / cumulative_time
+        own_time = stats[function][2] * part
+        if own_time > 0:
+            name_stack = tuple([get_function_name(*el) for el in stack])
+            stacks[name_stack] = stacks.get(name_stack, 0.0) + own_time
+        for callee, callee_time in callees.get(function, []):
+            if callee in stack or callee_time * part < min_time:
+                continue
+            to_visit.append((stack + (callee,), callee_time * part))
+    return stacks
+
+
+def add_pyinstrument_stacks(frame, stack, stacks):
+    """
+    Adds the time spent in frame itself, and in the frames it has called, to stacks (see get_collapsed_stacks_from_cprofile)
+    """
+    name_stack = stack + [get_function_name(frame.file_path_short or "", frame.line_no, frame.function)]
+    own_time = frame.time - sum([child.time for child in frame.children])
+    if own_time > 0:
+        stacks[tuple(name_stack)] = stacks.get(tuple(name_stack), 0.0) + own_time
+    for child in frame.children:
+        add_pyinstrument_stacks(child, name_stack, stacks)
+
+
+def write_collapsed_stacks(file_name, stacks):
+    """
+    write_collapsed_stacks
+
+    Writes stacks (a dict from a stack of function names to its time in seconds) in the collapsed format,
+    with the time in microseconds
+    """
+    f = open(file_name, "w")
+    for stack in sorted(stacks.keys()):
+        microseconds = int(round(stacks[stack] * 1000000))
+        if microseconds > 0:
+            f.write(";".join([name.replace(";", ",") for name in stack]) + " " + str(microseconds) + "\n")
+    f.close()
@@ -1 +1,2 @@
-cp data/example_project/unlabelled/unlabelled.csv.original data/example_project/unlabelled/unlabelled.csv
\ No newline at end of file
+cp data/example_project/unlabelled/unlabelled.csv.original data/example_project/unlabelled/unlabelled.csv
+rm -f data/example_project/unlabelled/unlabelled.csv.consumed
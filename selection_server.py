@@ -0,0 +1,465 @@
+"""
+A resident server for the active learning and pre-annotation of a project, that keeps what select_new_data would
+otherwise read and compute again in each round in memory between the rounds: the labelled data, the pool of unlabelled data,
+the Word2vecWrapper, the features of the pool and the fitted model.
+
+Start the server with:
+python selection_server.py --project data.example_project --port 8765
+
+The server only listens on localhost, and takes requests with JSON content:
+GET /status: the number of labelled and unlabelled samples, and the number of rounds so far
+POST /labelled {"file": <path to a file with labelled data>}: adds the samples in the file to the labelled data
+(the file is copied to the labelled data directory of the project, if it is not already there)
+POST /labelled {"samples": [{"tokens": [...], "labels": [...]}, ...]}: adds the samples to the labelled data
+(they are also written to a new file in the labelled data directory of the project)
+POST /select {"nr_of_samples": 10}: selects and pre-annotates the next samples (nr_of_samples of the settings, if it is not given),
+writes them to the tolabel directory of the project as select_new_data does, and returns them
+POST /shutdown: stops the server
+
+The features of the pool are only computed again for the samples for which they have changed, which for most samples
+requires that use_stable_vocabulary is True (otherwise the vocabulary, and therefore the features, change when labelled data is added).
+If speculative_selection is True, candidates for the next batch are selected in the background after each selection
+(see SelectionSession.start_speculation), and the next batch is selected among them.
+
+The entire pool of unlabelled data is kept in memory (unlabelled_chunk_size is not used). Samples that are selected by other
+processes (e.g. by active_learning_preannotation.py) are removed from the pool before each selection, but the file with unlabelled
+data should not be compacted (with compact_unlabelled_pool.py) while the server is running.
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import numpy as np
+
+import active_learning_preannotation
+import classify_and_select
+import compiled_corpus
+import feature_cache
+import instrumentation
+import stable_vocabulary
+import unlabelled_pool
+import vectorize_data
+import word2vec_clustering
+import word2vec_subset
+
+logger = logging.getLogger(__name__)
+
+LOCALHOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class SelectionSession:
+    """
+    SelectionSession
+
+    The data, features and model of a project that are kept in memory between the rounds of selection.
+    """
+
+    def __init__(self, properties, project_path, word2vecwrapper):
+        """
+        :param properties: an instance of PropertiesContainer which contains the settings for running the active learning and pre-annotation
+        :param project_path: a string containing the path to the folder with the data
+        :param word2vecwrapper: an instance of the vectorize_data.Word2vecWrapper class
+        """
+        self.properties = properties
+        self.project_path = project_path
+        self.word2vecwrapper = word2vecwrapper
+        self.classes = properties.minority_classes[:] + [properties.outside_class]
+        self.labelled_data_dir = os.path.join(project_path, properties.labelled_data_dir)
+        self.unlabelled_data_path = os.path.join(project_path, properties.unlabelled_data_dir, properties.unlabelled_data_file)
+        self.round_nr = 0
+        self.model = None
+        self.speculation_thread = None
+        self.speculative_candidate_ids = None
+
+        self.model_state_path = None
+        if properties.warm_start_model:
+            self.model_state_path = os.path.join(project_path, properties.model_state_file)
+
+        if properties.unlabelled_chunk_size:
+            logger.warning("The server keeps the entire pool of unlabelled data in memory, unlabelled_chunk_size is not used")
+
+        instrumentation.start_run("selection_server_start", instrumentation.get_run_report_file(properties, project_path))
+        try:
+            with instrumentation.phase("read") as measurement:
+                self.labelled_files = set([os.path.basename(file_name) for file_name in \
+                                               glob.glob(os.path.join(self.labelled_data_dir, "*" + properties.data_file_extension))])
+                self.labelled_text_vector, self.labelled_label_vector, self.label_dict = \
+                    compiled_corpus.read_labelled_data(self.labelled_data_dir, properties.data_file_extension, \
+                                                           properties.minority_classes, properties.outside_class, \
+                                                           compiled_corpus.get_labelled_corpus_dir(properties, project_path), \
+                                                           properties.n_jobs, vectorize_data.get_parse_cache_file(properties, project_path))
+                self.pool = unlabelled_pool.read_unlabelled_pool(self.unlabelled_data_path, \
+                                                                     compiled_corpus.get_unlabelled_corpus_dir(properties, project_path))
+                measurement.count("labelled_samples", len(self.labelled_text_vector))
+                measurement.count("unlabelled_samples", len(self.pool))
+        finally:
+            instrumentation.end_run()
+
+        self.vocabulary = None
+        if properties.use_stable_vocabulary:
+            self.vocabulary = stable_vocabulary.StableVocabulary(os.path.join(project_path, properties.stable_vocabulary_file))
+            self.vocabulary.add_tokens([token for text in self.pool.get_sentences(self.pool.get_unlabelled_ids()) for token in text])
+
+        self.unlabelled_feature_cache = feature_cache.MemoryFeatureCache()
+
+    def get_status(self):
+        if self.speculation_thread is not None and self.speculation_thread.is_alive():
+            speculation = "running"
+        elif self.speculative_candidate_ids is not None:
+            speculation = "ready"
+        else:
+            speculation = None
+        return {"project": self.project_path, "labelled_samples": len(self.labelled_text_vector), \
+                "unlabelled_samples": len(self.pool), "rounds": self.round_nr, "speculation": speculation}
+
+    def add_labelled(self, request):
+        """
+        add_labelled
+
+        Adds the samples in request["file"] (a file in the format of the labelled data), or the samples in request["samples"],
+        to the labelled data. The labels that are not among the minority_classes are replaced by the outside_class,
+        as when the labelled data is read.
+
+        returns: the number of added samples, and the number of labelled samples
+        """
+        if "file" in request:
+            file_name = request["file"]
+            if not os.path.isfile(file_name):
+                raise ValueError("There is no file " + str(file_name))
+            if os.path.basename(file_name) in self.labelled_files:
+                raise ValueError("A file named " + os.path.basename(file_name) + " has already been added to the labelled data")
+            labelled_file_name = os.path.join(self.labelled_data_dir, os.path.basename(file_name))
+            if os.path.abspath(file_name) != os.path.abspath(labelled_file_name):
+                shutil.copy(file_name, labelled_file_name)
+        elif "samples" in request:
+            labelled_file_name = self.write_labelled_samples(request["samples"])
+        else:
+            raise ValueError("The request should contain 'file' or 'samples'")
+
+        text_vector, label_vector = vectorize_data.read_labelled_file(labelled_file_name)
+        self.labelled_files.add(os.path.basename(labelled_file_name))
+        minority_classes_set = set(self.properties.minority_classes)
+        self.labelled_text_vector.extend(text_vector)
+        for labels in label_vector:
+            self.labelled_label_vector.append([label if label in minority_classes_set else self.properties.outside_class for label in labels])
+        logger.info("Added " + str(len(text_vector)) + " labelled samples from " + labelled_file_name)
+
+        return {"added_samples": len(text_vector), "labelled_samples": len(self.labelled_text_vector), "file": labelled_file_name}
+
+    def write_labelled_samples(self, samples):
+        """
+        write_labelled_samples
+
+        Writes samples (a list of {"tokens": [...], "labels": [...]}) to a new file in the labelled data directory
+        returns: the name of the file
+        """
+        for sample in samples:
+            if not isinstance(sample, dict) or "tokens" not in sample or "labels" not in sample or \
+                    len(sample["tokens"]) != len(sample["labels"]):
+                raise ValueError("Each sample should have as many 'tokens' as 'labels'")
+
+        file_name_start = os.path.join(self.labelled_data_dir, time.strftime("labelled_%Y%m%d_%H%M%S"))
+        file_name = file_name_start + self.properties.data_file_extension
+        file_nr = 1
+        while os.path.exists(file_name):
+            file_name = file_name_start + "_" + str(file_nr) + self.properties.data_file_extension
+            file_nr = file_nr + 1
+
+        labelled_file = open(file_name, "w")
+        for sample in samples:
+            for token, label in zip(sample["tokens"], sample["labels"]):
+                labelled_file.write(str(token) + "\t" + str(label) + "\n")
+            labelled_file.write("\n")
+        labelled_file.close()
+        return file_name
+
+    def select(self, nr_of_samples = None):
+        """
+        select
+
+        Does a round of selection and pre-annotation, as select_new_data, but with the data and the features of the pool kept in memory.
+        Only the labelled data is vectorized again, and the features of the pool only for the samples for which they have changed.
+        If warm_start_model is True, the model is warm-started from the model of the previous round.
+
+        If candidates have been selected in the background after the previous round (see start_speculation), the samples are
+        selected among the candidates that are still in the pool, instead of among the entire pool.
+
+        returns: the file with the selected samples, and the samples with their ids in the pool and their pre-annotated labels
+        """
+        properties = self.properties
+        if nr_of_samples is None:
+            nr_of_samples = properties.nr_of_samples
+        try:
+            nr_of_samples = int(nr_of_samples)
+        except ValueError:
+            raise ValueError("nr_of_samples can only take a numerical value, " + str(nr_of_samples) + " is not valid.")
+
+        self.wait_for_speculation()
+
+        # Samples that have been selected by other processes since the last round
+        self.pool.remove(unlabelled_pool.read_consumed_ids(self.unlabelled_data_path))
+        unlabelled_ids = self.pool.get_unlabelled_ids()
+        if len(unlabelled_ids) == 0:
+            raise ValueError("There are no unlabelled samples left in the pool")
+
+        active_learning_preannotation.check_frequency_of_labels(self.labelled_label_vector, self.classes)
+
+        candidate_ids = self.get_speculative_candidates(nr_of_samples)
+        if candidate_ids is None:
+            ids_to_search_among = unlabelled_ids
+        else:
+            ids_to_search_among = candidate_ids
+
+        instrumentation.start_run("selection_server_select", instrumentation.get_run_report_file(properties, self.project_path), \
+                                      round = self.round_nr, speculative = candidate_ids is not None)
+        try:
+            with instrumentation.phase("vectorize") as measurement:
+                X_labelled_np, y_labelled_np, text_vector_labelled_np, current_word_vectorizer, context_word_vectorizer = \
+                    vectorize_data.vectorize_labelled_data(self.labelled_text_vector, self.labelled_label_vector, self.label_dict, \
+                                                               use_word2vec = properties.whether_to_use_word2vec, \
+                                                               number_of_previous_words = properties.number_of_previous_words, \
+                                                               number_of_following_words = properties.number_of_following_words, \
+                                                               use_current_word_as_feature = properties.use_current_word_as_feature, \
+                                                               min_df_current = properties.min_df_current,  \
+                                                               min_df_context = properties.min_df_context, \
+                                                               word2vecwrapper = self.word2vecwrapper, \
+                                                               current_word_vocabulary = properties.current_word_vocabulary, \
+                                                               context_word_vocabulary = properties.context_word_vocabulary, \
+                                                               use_clustering = properties.whether_to_use_clustering, \
+                                                               use_sparse_features = properties.use_sparse_features, \
+                                                               stable_vocabulary = self.vocabulary)
+                X_unlabelled_np, text_vector_unlabelled_np = \
+                    vectorize_data.vectorize_unlabelled(self.pool.get_sentences(ids_to_search_among), current_word_vectorizer, \
+                                                            context_word_vectorizer, properties.whether_to_use_word2vec, \
+                                                            properties.number_of_previous_words, properties.number_of_following_words, \
+                                                            properties.use_current_word_as_feature, self.word2vecwrapper, \
+                                                            properties.whether_to_use_clustering, properties.use_sparse_features, \
+                                                            self.unlabelled_feature_cache, retain = candidate_ids is None)
+                measurement.count("samples", len(self.labelled_text_vector) + len(ids_to_search_among))
+
+            with instrumentation.phase("select") as measurement:
+                with instrumentation.phase("fit") as fit_measurement:
+                    previous_model = self.model if properties.warm_start_model else None
+                    model = classify_and_select.get_fitted_model(X_labelled_np, y_labelled_np, self.label_dict, properties.minority_classes, \
+                                                                     properties.outside_class, properties.beginning_prefix, \
+                                                                     properties.inside_prefix, properties.max_iterations, properties.model_type, \
+                                                                     properties.use_cross_validation, properties.nr_of_cross_validation_splits, \
+                                                                     properties.c_value, self.model_state_path, properties.ssvm_margin_method, \
+                                                                     properties.n_jobs, previous_model, \
+                                                                     active_learning_preannotation.get_feature_fingerprint(properties, \
+                                                                         current_word_vectorizer, context_word_vectorizer, self.word2vecwrapper))
+                    fit_measurement.count("labelled_samples", len(X_labelled_np))
+
+                if candidate_ids is None:
+                    maximum_samples_to_search_among = \
+                        classify_and_select.get_maximum_samples_to_search_among(properties.maximum_samples_to_search_among, \
+                                                                                    X_unlabelled_np, nr_of_samples)
+                else:
+                    maximum_samples_to_search_among = len(candidate_ids)
+                to_select_X, to_select_text, predicted_for_selected, selected_indeces = \
+                    model.get_selected_unlabelled(X_labelled_np, y_labelled_np, X_unlabelled_np, nr_of_samples, text_vector_labelled_np, \
+                                                      text_vector_unlabelled_np, maximum_samples_to_search_among, \
+                                                      properties.inactive_learning, properties.prefer_predicted_chunks)
+                measurement.count("selected_samples", len(selected_indeces))
+
+            selected_ids = ids_to_search_among[selected_indeces]
+            with instrumentation.phase("write") as measurement:
+                to_annotate_file_path = active_learning_preannotation.write_selected_data(properties, self.project_path, to_select_text, \
+                                                                                              predicted_for_selected, self.label_dict, \
+                                                                                              selected_ids, self.unlabelled_data_path, \
+                                                                                              self.unlabelled_feature_cache)
+                measurement.count("selected_samples", len(to_select_text))
+        finally:
+            instrumentation.end_run()
+
+        self.pool.remove(selected_ids)
+        self.model = model
+        self.round_nr = self.round_nr + 1
+
+        if properties.speculative_selection:
+            self.start_speculation(model, current_word_vectorizer, context_word_vectorizer, X_labelled_np, y_labelled_np, \
+                                       text_vector_labelled_np, nr_of_samples * properties.speculative_candidates_factor)
+
+        label_dict_inv = {v: k for k, v in self.label_dict.items()}
+        samples = []
+        for selected_id, texts, labels in zip(selected_ids, to_select_text, predicted_for_selected):
+            samples.append({"id": int(selected_id), "tokens": [str(text) for text in texts], \
+                            "labels": [label_dict_inv[int(label)] for label in labels]})
+        return {"file": to_annotate_file_path, "round": self.round_nr, "speculative": candidate_ids is not None, "samples": samples}
+
+    def start_speculation(self, model, current_word_vectorizer, context_word_vectorizer, X_labelled_np, y_labelled_np, \
+                              text_vector_labelled_np, nr_of_candidates):
+        """
+        start_speculation
+
+        Starts to select nr_of_candidates candidates for the next batch in a background thread, with the model and the
+        vectorizers of the round that has just finished, among the samples that are still in the pool. The candidates are
+        the samples that model would have selected if nr_of_candidates samples were to be selected.
+        """
+        unlabelled_ids = self.pool.get_unlabelled_ids()
+        if nr_of_candidates >= len(unlabelled_ids):
+            return # the next batch is to be selected among the entire pool anyway
+        self.speculation_thread = threading.Thread(target=self.speculate, \
+                                                       args=(model, current_word_vectorizer, context_word_vectorizer, X_labelled_np, \
+                                                                 y_labelled_np, text_vector_labelled_np, unlabelled_ids, nr_of_candidates))
+        self.speculation_thread.daemon = True
+        self.speculation_thread.start()
+
+    def speculate(self, model, current_word_vectorizer, context_word_vectorizer, X_labelled_np, y_labelled_np, \
+                      text_vector_labelled_np, unlabelled_ids, nr_of_candidates):
+        properties = self.properties
+        instrumentation.start_run("selection_server_speculate", instrumentation.get_run_report_file(properties, self.project_path), \
+                                      round = self.round_nr)
+        try:
+            with instrumentation.phase("vectorize") as measurement:
+                X_unlabelled_np, text_vector_unlabelled_np = \
+                    vectorize_data.vectorize_unlabelled(self.pool.get_sentences(unlabelled_ids), current_word_vectorizer, \
+                                                            context_word_vectorizer, properties.whether_to_use_word2vec, \
+                                                            properties.number_of_previous_words, properties.number_of_following_words, \
+                                                            properties.use_current_word_as_feature, self.word2vecwrapper, \
+                                                            properties.whether_to_use_clustering, properties.use_sparse_features, \
+                                                            self.unlabelled_feature_cache)
+                measurement.count("samples", len(unlabelled_ids))
+
+            with instrumentation.phase("select") as measurement:
+                maximum_samples_to_search_among = \
+                    classify_and_select.get_maximum_samples_to_search_among(properties.maximum_samples_to_search_among, \
+                                                                                X_unlabelled_np, nr_of_candidates)
+                to_select_X, to_select_text, predicted_for_selected, candidate_indeces = \
+                    model.get_selected_unlabelled(X_labelled_np, y_labelled_np, X_unlabelled_np, nr_of_candidates, text_vector_labelled_np, \
+                                                      text_vector_unlabelled_np, maximum_samples_to_search_among, \
+                                                      properties.inactive_learning, properties.prefer_predicted_chunks)
+                measurement.count("candidates", len(candidate_indeces))
+            self.speculative_candidate_ids = unlabelled_ids[candidate_indeces]
+            logger.info("Selected " + str(len(candidate_indeces)) + " candidates for the next batch")
+        except (Exception, SystemExit) as e:
+            # The next batch is then selected among the entire pool
+            logger.warning("The candidates for the next batch could not be selected: " + repr(e))
+        finally:
+            instrumentation.end_run()
+
+    def wait_for_speculation(self):
+        if self.speculation_thread is not None:
+            if self.speculation_thread.is_alive():
+                logger.info("Waiting for the selection of the candidates for the next batch to finish")
+            self.speculation_thread.join()
+            self.speculation_thread = None
+
+    def get_speculative_candidates(self, nr_of_samples):
+        """
+        get_speculative_candidates
+
+        returns: the ids of the candidates selected in the background that are still in the pool, or None if there are no candidates,
+        or if there are fewer than nr_of_samples of them. The candidates can only be used once.
+        """
+        candidate_ids = self.speculative_candidate_ids
+        self.speculative_candidate_ids = None
+        if candidate_ids is None:
+            return None
+        candidate_ids = np.intersect1d(candidate_ids, self.pool.get_unlabelled_ids())
+        if len(candidate_ids) < nr_of_samples:
+            logger.info("There are only " + str(len(candidate_ids)) + " candidates left for the next batch. Will search among the entire pool.")
+            return None
+        return candidate_ids
+
+
+class SelectionRequestHandler(BaseHTTPRequestHandler):
+    """
+    SelectionRequestHandler
+
+    Handles the requests to the server (see the top of this file), with the SelectionSession of the server.
+    The requests are handled one at a time.
+    """
+
+    def do_GET(self):
+        if self.path == "/status":
+            self.handle_session_call(lambda request: self.server.session.get_status())
+        else:
+            self.send_json(404, {"error": "Unknown path " + self.path})
+
+    def do_POST(self):
+        if self.path == "/labelled":
+            self.handle_session_call(self.server.session.add_labelled)
+        elif self.path == "/select":
+            self.handle_session_call(lambda request: self.server.session.select(request.get("nr_of_samples")))
+        elif self.path == "/shutdown":
+            self.server.session.wait_for_speculation()
+            self.server.is_to_be_shut_down = True
+            self.send_json(200, {"shutdown": True})
+        else:
+            self.send_json(404, {"error": "Unknown path " + self.path})
+
+    def handle_session_call(self, session_call):
+        try:
+            request = self.read_json()
+            if not isinstance(request, dict):
+                raise ValueError("The content of the request should be a JSON object")
+            self.send_json(200, session_call(request))
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+        except SystemExit:
+            # The functions for the selection exit when the data or the settings are not valid, which is not to stop the server
+            self.send_json(500, {"error": "The request could not be carried out, see the output of the server"})
+        except Exception as e:
+            # Any other error is only to fail the request, and not to leave the client without a response
+            logger.exception("The request to " + self.path + " failed")
+            self.send_json(500, {"error": "The request could not be carried out: " + repr(e)})
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if length == 0:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length).decode("utf-8"))
+        except json.JSONDecodeError as e:
+            raise ValueError("The content of the request is not valid JSON: " + str(e))
+
+    def send_json(self, status, content):
+        body = json.dumps(content).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(self.address_string() + " " + (format % args))
+
+
+def run_server(session, port = DEFAULT_PORT):
+    """
+    run_server
+
+    Handles requests with session (a SelectionSession) on localhost:port, until a request to /shutdown is received
+    """
+    server = HTTPServer((LOCALHOST, port), SelectionRequestHandler)
+    server.session = session
+    server.is_to_be_shut_down = False
+    logger.info("The selection server is listening on http://" + LOCALHOST + ":" + str(server.server_port))
+    try:
+        while not server.is_to_be_shut_down:
+            server.handle_request()
+    finally:
+        server.server_close()
+    logger.info("The selection server has stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', action='store', dest='port', type=int, default=DEFAULT_PORT, \
+                            help='The port on localhost to listen on. Default: ' + str(DEFAULT_PORT))
+    properties_main, path_slash_format_main, path_dot_format = active_learning_preannotation.load_properties(parser)
+    args = parser.parse_args()
+    word2vecwrapper = vectorize_data.Word2vecWrapper(properties_main.model_path, properties_main.semantic_vector_length, \
+                                                     word2vec_subset.get_subset_dir(properties_main, path_slash_format_main), \
+                                                     properties_main.clustering_engine, properties_main.nr_of_kmeans_clusters, \
+                                                     word2vec_clustering.get_clustering_cache_dir(properties_main, path_slash_format_main))
+
+    session_main = SelectionSession(properties_main, path_slash_format_main, word2vecwrapper)
+    run_server(session_main, args.port)
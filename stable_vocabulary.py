@@ -0,0 +1,145 @@
+import json
+import logging
+import os
+import shutil
+import uuid
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer
+
+logger = logging.getLogger(__name__)
+
+
+INITIAL_NR_OF_COLUMNS = 1024
+
+
+class StableVocabulary:
+    """
+    StableVocabulary
+
+    A persistent index from terms to columns, to which new terms are only appended. It is used instead of refitting the
+    CountVectorizers in each round, so that a term keeps its column between rounds (and features and models computed in an earlier
+    round can still be used).
+
+    The number of columns is reserved in advance (and doubled when the terms no longer fit), since the columns for the current word
+    are followed by the columns for the context words in the feature vector. Which of the terms that are used as features (min_df,
+    or an external vocabulary) is decided by a mask over the columns, see get_vectorizer.
+
+    The terms that are clustered for the cluster features are also kept, see get_clustered_terms.
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.terms = {}
+        self.nr_of_columns = INITIAL_NR_OF_COLUMNS
+        self.vocabulary_id = uuid.uuid4().hex
+        self.clustered_terms = None
+        self._analyzer = CountVectorizer(binary = True).build_analyzer()
+
+        if os.path.exists(self.file_name):
+            with open(self.file_name) as vocabulary_file:
+                saved = json.load(vocabulary_file)
+            self.terms = saved["terms"]
+            self.nr_of_columns = saved["nr_of_columns"]
+            self.vocabulary_id = saved["vocabulary_id"]
+            self.clustered_terms = saved.get("clustered_terms")
+
+    def add_tokens(self, tokens):
+        """
+        add_tokens
+
+        Appends the terms in tokens (as CountVectorizer would analyze them) that are not yet in the index, and saves the index.
+        """
+        new_terms = set()
+        for token in set(tokens):
+            for term in self._analyzer(token):
+                if term not in self.terms:
+                    new_terms.add(term)
+        if len(new_terms) == 0:
+            return
+
+        for term in sorted(new_terms):
+            self.terms[term] = len(self.terms)
+        if len(self.terms) > self.nr_of_columns:
+            while len(self.terms) > self.nr_of_columns:
+                self.nr_of_columns = 2 * self.nr_of_columns
+            logger.info("The stable vocabulary now has " + str(self.nr_of_columns) + \
+                      " columns. Features and models from earlier rounds can no longer be used.")
+        self.save()
+
+    def get_clustered_terms(self):
+        """
+        get_clustered_terms
+
+        Returns the terms whose word2vec vectors are to be clustered (see vectorize_data.Word2vecWrapper.load_clustering).
+        These are the terms in the index the first time this is called (which includes the pool of unlabelled data, if its tokens
+        have been added), and they are saved with the index and not changed afterwards. The clusters, and therefore the columns
+        of the cluster features, then stay the same between rounds, also when min_df selects other terms or new terms are appended.
+        Terms that are appended later are given the cluster of the nearest centroid (see vectorize_data.Word2vecWrapper.get_clusters).
+        """
+        if self.clustered_terms is None:
+            self.clustered_terms = [term for term, column in sorted(self.terms.items(), key=lambda item: item[1])]
+            self.save()
+        return self.clustered_terms
+
+    def get_vectorizer(self, text_concatenated, min_df, external_vocabulary = None):
+        """
+        get_vectorizer
+
+        Returns a StableCountVectorizer that uses the index. The mask of the vectorizer includes the terms that occur in at least
+        min_df tokens in text_concatenated or, if external_vocabulary (a set) is given, the terms that occur in text_concatenated
+        and are included in external_vocabulary (as when the vocabulary is given to a CountVectorizer, min_df is then not used).
+        """
+        vectorizer = StableCountVectorizer(self.terms, self.nr_of_columns, self.vocabulary_id, np.ones(self.nr_of_columns, dtype=bool))
+        document_frequency = np.asarray((vectorizer.transform(text_concatenated) > 0).sum(axis=0)).ravel()
+        if external_vocabulary is None:
+            column_mask = document_frequency >= min_df
+        else:
+            column_mask = document_frequency >= 1
+            for term, column in self.terms.items():
+                if column_mask[column] and not (term in external_vocabulary or term.split("_")[0] in external_vocabulary):
+                    column_mask[column] = False
+        vectorizer.column_mask = column_mask
+        return vectorizer
+
+    def save(self):
+        with open(self.file_name + ".tmp", "w") as vocabulary_file:
+            json.dump({"terms": self.terms, "nr_of_columns": self.nr_of_columns, "vocabulary_id": self.vocabulary_id, \
+                       "clustered_terms": self.clustered_terms}, vocabulary_file)
+        shutil.move(self.file_name + ".tmp", self.file_name)
+
+
+class StableCountVectorizer:
+    """
+    StableCountVectorizer
+
+    Used in the same way as a fitted CountVectorizer(binary = True) in vectorize_data, but transform always returns
+    nr_of_columns columns, with the columns given by the terms of a StableVocabulary. transform does not apply column_mask
+    (so that features that are stored in a feature_cache.FeatureCache are still valid when the mask changes),
+    which is instead done by vectorize_data.apply_vocabulary_mask.
+    """
+
+    def __init__(self, terms, nr_of_columns, vocabulary_id, column_mask):
+        self.terms = dict(terms)
+        self.nr_of_columns = nr_of_columns
+        self.vocabulary_id = vocabulary_id
+        self.column_mask = column_mask
+        self._count_vectorizer = CountVectorizer(binary = True, vocabulary = self.terms)
+
+    @property
+    def vocabulary_(self):
+        return {term: column for term, column in self.terms.items() if self.column_mask[column]}
+
+    @property
+    def vocabulary_fingerprint(self):
+        """
+        Identifies the columns of the raw (not masked) features, which stay the same as long as nr_of_columns is not changed
+        """
+        return self.vocabulary_id + "_" + str(self.nr_of_columns)
+
+    def get_feature_names(self):
+        return [term for term, column in sorted(self.terms.items(), key=lambda item: item[1]) if self.column_mask[column]]
+
+    def transform(self, raw_documents):
+        X = self._count_vectorizer.transform(raw_documents).tocsr()
+        return sp.csr_matrix((X.data, X.indices, X.indptr), shape=(X.shape[0], self.nr_of_columns))
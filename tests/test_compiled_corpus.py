@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+import compiled_corpus
+import vectorize_data
+
+MINORITY_CLASSES = ["B-speculation", "I-speculation"]
+
+
+def write_labelled_file(file_name, samples):
+    f = open(file_name, "w")
+    for sample in samples:
+        for word, label in sample:
+            f.write(word + "\t" + label + "\n")
+        f.write("\n")
+    f.close()
+
+
+def as_lists(vector):
+    return [[str(el) for el in sentence] for sentence in vector]
+
+
+class TestCompiledCorpus(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.labelled_dir = os.path.join(self.data_dir, "labelled")
+        self.corpus_dir = os.path.join(self.data_dir, "compiled_corpus", compiled_corpus.LABELLED_CORPUS_DIR)
+        os.makedirs(self.labelled_dir)
+        write_labelled_file(os.path.join(self.labelled_dir, "b.csv"), \
+                                [[("perhaps", "B-speculation"), ("it", "O"), ("rains", "O")], [("it", "O"), ("is", "O"), ("sunny", "O")]])
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+
+    def read(self):
+        return compiled_corpus.read_labelled_data(self.labelled_dir, ".csv", MINORITY_CLASSES, "O", self.corpus_dir)
+
+    def assert_same_as_csv(self, text_vector, label_vector):
+        csv_text_vector, csv_label_vector, class_dict = \
+            vectorize_data.read_file_labelled_data(self.labelled_dir, ".csv", MINORITY_CLASSES, "O")
+        self.assertEqual(as_lists(text_vector), as_lists(csv_text_vector))
+        self.assertEqual(as_lists(label_vector), as_lists(csv_label_vector))
+
+    def test_sentences_are_views_of_the_compiled_arrays(self):
+        self.read() # compiles the corpus
+        corpus = compiled_corpus.load_labelled_corpus(self.corpus_dir, self.labelled_dir, ".csv", MINORITY_CLASSES, "O")
+        self.assertIsInstance(corpus.token_ids, np.memmap)
+        self.assertTrue(np.shares_memory(corpus.get_token_ids(1), corpus.token_ids))
+
+        text_vector, label_vector, class_dict = self.read()
+        self.assertTrue(all([isinstance(text, np.ndarray) for text in text_vector]))
+        self.assertEqual(class_dict, {"B-speculation": 0, "I-speculation": 1, "O": 2})
+        self.assert_same_as_csv(text_vector, label_vector)
+
+    def test_compiled_again_when_new_files_are_labelled(self):
+        self.read()
+        write_labelled_file(os.path.join(self.labelled_dir, "a.csv"), [[("may", "B-speculation"), ("be", "I-speculation")]])
+        self.assertIsNone(compiled_corpus.load_labelled_corpus(self.corpus_dir, self.labelled_dir, ".csv", MINORITY_CLASSES, "O"))
+
+        text_vector, label_vector, class_dict = self.read()
+        self.assert_same_as_csv(text_vector, label_vector)
+        corpus = compiled_corpus.load_labelled_corpus(self.corpus_dir, self.labelled_dir, ".csv", MINORITY_CLASSES, "O")
+        self.assertIsNotNone(corpus)
+        self.assertEqual(len(corpus), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
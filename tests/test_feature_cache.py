@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import scipy.sparse as sp
+
+import feature_cache
+
+NR_OF_COLUMNS = 20
+
+
+def get_features(keys, seed):
+    """
+    Returns random features for samples with the given keys, in the format returned by vectorize_data.get_feature_matrix
+    """
+    random_state = np.random.RandomState(seed)
+    lengths = random_state.randint(1, 6, len(keys))
+    feature_matrix = sp.csr_matrix((random_state.random_sample((int(lengths.sum()), NR_OF_COLUMNS)) < 0.3).astype(np.float64))
+    sentence_offsets = np.concatenate([[0], np.cumsum(lengths)])
+    return feature_matrix, sentence_offsets
+
+
+def get_rows(feature_matrix, sentence_offsets, index):
+    return feature_matrix[sentence_offsets[index]:sentence_offsets[index + 1]].toarray()
+
+
+class TestFeatureCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = os.path.join(tempfile.mkdtemp(), "feature_cache")
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.cache_dir))
+
+    def assert_stored(self, cache, keys, feature_matrix, sentence_offsets):
+        stored, missing = cache.get_feature_matrix(keys)
+        self.assertEqual(missing, [])
+        self.assertEqual(stored.shape[0], sentence_offsets[-1])
+        self.assertTrue((stored.toarray() == feature_matrix.toarray()).all())
+
+    def test_round_trip(self):
+        cache = feature_cache.FeatureCache(self.cache_dir)
+        cache.set_fingerprint("features")
+        keys = [feature_cache.get_key(["sentence", str(i)]) for i in range(0, 10)]
+        feature_matrix, sentence_offsets = get_features(keys, seed = 1)
+        cache.store(keys[:5], feature_matrix[:sentence_offsets[5]], sentence_offsets[:6])
+
+        # The stored features are read from disk by a new cache with the same fingerprint
+        cache = feature_cache.FeatureCache(self.cache_dir)
+        cache.set_fingerprint("features")
+        self.assert_stored(cache, keys[:5], feature_matrix[:sentence_offsets[5]], sentence_offsets[:6])
+
+        # The rows are returned in the order of the keys, and the samples that are not stored are reported as missing
+        stored, missing = cache.get_feature_matrix([keys[3], keys[7], keys[0]])
+        self.assertEqual(missing, [1])
+        self.assertTrue((stored.toarray() == np.vstack([get_rows(feature_matrix, sentence_offsets, 3), \
+                                                         get_rows(feature_matrix, sentence_offsets, 0)])).all())
+
+    def test_changed_fingerprint_clears_the_cache(self):
+        cache = feature_cache.FeatureCache(self.cache_dir)
+        cache.set_fingerprint("features")
+        keys = [feature_cache.get_key(["sentence", str(i)]) for i in range(0, 4)]
+        feature_matrix, sentence_offsets = get_features(keys, seed = 2)
+        cache.store(keys, feature_matrix, sentence_offsets)
+
+        cache = feature_cache.FeatureCache(self.cache_dir)
+        cache.set_fingerprint("other features")
+        stored, missing = cache.get_feature_matrix(keys)
+        self.assertIsNone(stored)
+        self.assertEqual(missing, [0, 1, 2, 3])
+        self.assertEqual(os.listdir(self.cache_dir), [feature_cache.INDEX_FILE_NAME])
+
+    def test_retain_compacts_the_shards(self):
+        cache = feature_cache.FeatureCache(self.cache_dir)
+        cache.set_fingerprint("features")
+        keys = [feature_cache.get_key(["sentence", str(i)]) for i in range(0, 12)]
+        feature_matrix, sentence_offsets = get_features(keys, seed = 3)
+        for start in range(0, 12, 4):
+            cache.store(keys[start:start + 4], feature_matrix[sentence_offsets[start]:sentence_offsets[start + 4]], \
+                            sentence_offsets[start:start + 5] - sentence_offsets[start])
+        self.assertEqual(len(cache.shards), 3)
+
+        # One sample from each shard is kept, i.e. less than half of the stored rows, so they are rewritten into one shard
+        kept = [1, 6, 11]
+        cache.retain([keys[i] for i in kept])
+        self.assertEqual(len(cache.shards), 1)
+        self.assertEqual(len([file_name for file_name in os.listdir(self.cache_dir) if file_name.endswith(".npy")]), 3)
+
+        cache = feature_cache.FeatureCache(self.cache_dir)
+        cache.set_fingerprint("features")
+        kept_matrix = sp.csr_matrix(np.vstack([get_rows(feature_matrix, sentence_offsets, i) for i in kept]))
+        kept_offsets = np.concatenate([[0], np.cumsum([sentence_offsets[i + 1] - sentence_offsets[i] for i in kept])])
+        self.assert_stored(cache, [keys[i] for i in kept], kept_matrix, kept_offsets)
+        stored, missing = cache.get_feature_matrix([keys[0], keys[5]])
+        self.assertEqual(missing, [0, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+
+import instrumentation
+
+
+class TestInstrumentation(unittest.TestCase):
+    def test_repeated_subphases_are_added_together_at_all_levels(self):
+        instrumentation.start_run("test")
+        try:
+            with instrumentation.phase("select") as measurement:
+                for chunk_nr in range(0, 3):
+                    with instrumentation.phase("chunk") as chunk_measurement:
+                        chunk_measurement.count("samples", 2)
+                        with instrumentation.phase("predict") as predict_measurement:
+                            predict_measurement.count("samples", 2)
+                        with instrumentation.phase("score"):
+                            pass
+        finally:
+            instrumentation.end_run()
+
+        chunk = measurement.subphases["chunk"]
+        self.assertEqual(chunk["occurrences"], 3)
+        self.assertEqual(chunk["counts"], {"samples": 6})
+        self.assertEqual(chunk["subphases"]["predict"]["occurrences"], 3)
+        self.assertEqual(chunk["subphases"]["predict"]["counts"], {"samples": 6})
+        self.assertEqual(chunk["subphases"]["score"]["occurrences"], 3)
+        self.assertGreaterEqual(chunk["wall_time"], chunk["subphases"]["predict"]["wall_time"])
+
+
+if __name__ == "__main__":
+    unittest.main()
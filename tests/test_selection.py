@@ -0,0 +1,159 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+import classify_and_select
+import vectorize_data
+
+WORDS = ["w" + str(i) for i in range(0, 60)]
+LABEL_DICT = {"B-speculation": 0, "I-speculation": 1, "O": 2}
+MINORITY_CLASSES = ["B-speculation", "I-speculation"]
+NR_OF_SAMPLES = 7
+
+# (number_of_previous_words, number_of_following_words)
+WINDOWS = [(0, 0), (1, 0), (0, 3)]
+
+
+def get_data(seed):
+    """
+    Returns labelled samples (in which the words w0 to w5 are chunks) and unlabelled samples
+    """
+    random_state = np.random.RandomState(seed)
+    text_vector_labelled = []
+    label_vector_labelled = []
+    for i in range(0, 60):
+        text = [WORDS[j] for j in random_state.randint(0, len(WORDS), random_state.randint(3, 10))]
+        labels = []
+        for word in text:
+            if int(word[1:]) < 6:
+                labels.append("B-speculation" if len(labels) == 0 or labels[-1] == "O" else "I-speculation")
+            else:
+                labels.append("O")
+        text_vector_labelled.append(text)
+        label_vector_labelled.append(labels)
+    text_vector_unlabelled = [[WORDS[j] for j in random_state.randint(0, len(WORDS), random_state.randint(2, 10))] \
+                                  for i in range(0, 137)]
+    return text_vector_labelled, label_vector_labelled, text_vector_unlabelled
+
+
+def vectorize(text_vector_labelled, label_vector_labelled, text_vector_unlabelled, window, use_sparse_features):
+    return vectorize_data.vectorize_data(text_vector_labelled, text_vector_unlabelled, label_vector_labelled, LABEL_DICT, False, \
+                                             window[0], window[1], True, 1, 1, None, False, False, False, use_sparse_features)
+
+
+def select(vectorized, inactive_learning, prefer_predicted_chunks):
+    """
+    Selects among the entire pool of unlabelled data with get_new_data, and returns the selected indeces and their predictions
+    """
+    X_labelled_np, X_unlabelled_np, y_labelled_np, text_vector_labelled_np, text_vector_unlabelled_np, \
+        current_word_vectorizer, context_word_vectorizer = vectorized
+    to_select_X, to_select_text, predicted_for_selected, selected_indeces = \
+        classify_and_select.get_new_data(X_labelled_np, X_unlabelled_np, y_labelled_np, text_vector_labelled_np, \
+                                             text_vector_unlabelled_np, LABEL_DICT, MINORITY_CLASSES, NR_OF_SAMPLES, "all", "O", "B-", "I-", \
+                                             inactive_learning, 10, prefer_predicted_chunks, \
+                                             classify_and_select.NonStructuredLogisticRegression, False, 0, 1)
+    return list(selected_indeces), [list(predicted) for predicted in predicted_for_selected]
+
+
+class FittedSSVM:
+    """
+    The weights of a fitted FrankWolfeSSVM, which is all that StructuredModelFrankWolfeSSVM.get_margins uses
+    """
+    def __init__(self, w):
+        self.w = w
+
+
+def get_structured_model(X, Y, w, margin_method, n_jobs):
+    model = classify_and_select.StructuredModelFrankWolfeSSVM(LABEL_DICT, MINORITY_CLASSES, "O", "B-", "I-", 10, False, 0, 1, \
+                                                                  margin_method, n_jobs)
+    if classify_and_select.is_sparse_sentences(X):
+        model.model = classify_and_select.SparseChainCRF()
+    else:
+        model.model = classify_and_select.ChainCRF()
+    model.model.initialize(X, Y)
+    model.ssvm = FittedSSVM(w)
+    return model
+
+
+def write_unlabelled_file(file_name, text_vector):
+    f = open(file_name, "w")
+    for text in text_vector:
+        for word in text:
+            f.write(word + "\n")
+        f.write("\n")
+    f.close()
+
+
+class TestSelection(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+
+    def test_selection_in_chunks_is_the_same_as_in_the_entire_pool(self):
+        text_vector_labelled, label_vector_labelled, text_vector_unlabelled = get_data(seed = 2)
+        file_name = os.path.join(self.data_dir, "unlabelled.csv")
+        write_unlabelled_file(file_name, text_vector_unlabelled)
+        for window in WINDOWS:
+            vectorized = vectorize(text_vector_labelled, label_vector_labelled, text_vector_unlabelled, window, False)
+            X_labelled_np, y_labelled_np, text_vector_labelled_np, current_word_vectorizer, context_word_vectorizer = \
+                vectorize_data.vectorize_labelled_data(text_vector_labelled, label_vector_labelled, LABEL_DICT, False, window[0], window[1], \
+                                                           True, 1, 1, None, False, False, False)
+            for inactive_learning in [False, True]:
+                for prefer_predicted_chunks in [False, True]:
+                    expected = select(vectorized, inactive_learning, prefer_predicted_chunks)
+                    # Chunks smaller than, and larger than, the number of candidates that are kept between the chunks
+                    for chunk_size in [5, 1000]:
+                        unlabelled_chunks = vectorize_data.vectorize_unlabelled_in_chunks(file_name, chunk_size, current_word_vectorizer, \
+                                                                                              context_word_vectorizer, False, window[0], \
+                                                                                              window[1], True, None, False)
+                        to_select_text, predicted_for_selected, selected_indeces = \
+                            classify_and_select.get_new_data_from_chunks(X_labelled_np, y_labelled_np, unlabelled_chunks, LABEL_DICT, \
+                                                                             MINORITY_CLASSES, NR_OF_SAMPLES, 20, "O", "B-", "I-", \
+                                                                             inactive_learning, 10, prefer_predicted_chunks, \
+                                                                             classify_and_select.NonStructuredLogisticRegression, False, 0, 1)
+                        self.assertEqual(sorted(zip(*expected)), \
+                                         sorted(zip(list(selected_indeces), [list(predicted) for predicted in predicted_for_selected])))
+                        self.assertEqual([list(text) for text in to_select_text], \
+                                         [text_vector_unlabelled[i] for i in selected_indeces])
+
+    def test_parallel_scoring_gives_the_same_margins_as_serial(self):
+        text_vector_labelled, label_vector_labelled, text_vector_unlabelled = get_data(seed = 3)
+        random_state = np.random.RandomState(3)
+        for window in WINDOWS:
+            for use_sparse_features in [False, True]:
+                X_labelled_np, X_unlabelled_np, y_labelled_np, text_vector_labelled_np, text_vector_unlabelled_np, \
+                    current_word_vectorizer, context_word_vectorizer = \
+                    vectorize(text_vector_labelled, label_vector_labelled, text_vector_unlabelled, window, use_sparse_features)
+                nr_of_features = X_labelled_np[0].shape[1]
+                w = random_state.randn(len(LABEL_DICT) * nr_of_features + len(LABEL_DICT) ** 2)
+                # Classifications with and without predicted chunks
+                ys = []
+                for xi in X_unlabelled_np:
+                    yi = np.full(xi.shape[0], LABEL_DICT["O"])
+                    if random_state.rand() < 0.5:
+                        yi[random_state.randint(0, len(yi))] = LABEL_DICT["B-speculation"]
+                    ys.append(yi)
+                for margin_method in classify_and_select.MARGIN_METHODS:
+                    serial = get_structured_model(X_labelled_np, y_labelled_np, w, margin_method, 1)
+                    parallel = get_structured_model(X_labelled_np, y_labelled_np, w, margin_method, 2)
+                    for with_predicted_chunks in [True, False]:
+                        serial_margins = serial.get_margins(X_unlabelled_np, ys, with_predicted_chunks)
+                        parallel_margins = parallel.get_margins(X_unlabelled_np, ys, with_predicted_chunks)
+                        self.assertEqual(len(parallel_margins), len(X_unlabelled_np))
+                        self.assertTrue(np.allclose(parallel_margins, serial_margins, rtol = 0, atol = 1e-9))
+
+    def test_sparse_features_select_the_same_samples_as_dense(self):
+        text_vector_labelled, label_vector_labelled, text_vector_unlabelled = get_data(seed = 1)
+        for window in WINDOWS:
+            dense = vectorize(text_vector_labelled, label_vector_labelled, text_vector_unlabelled, window, False)
+            sparse = vectorize(text_vector_labelled, label_vector_labelled, text_vector_unlabelled, window, True)
+            for inactive_learning in [False, True]:
+                self.assertEqual(select(sparse, inactive_learning, True), select(dense, inactive_learning, True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+import numpy as np
+import scipy.sparse as sp
+
+import classify_and_select
+
+
+def get_samples(nr_of_samples, nr_of_features, nr_of_states, seed):
+    random_state = np.random.RandomState(seed)
+    X = []
+    Y = []
+    for i in range(0, nr_of_samples):
+        length = random_state.randint(nr_of_states, 8)
+        X.append(random_state.random_sample((length, nr_of_features)) * (random_state.random_sample((length, nr_of_features)) < 0.3))
+        Y.append(random_state.randint(0, nr_of_states, length))
+    Y[0] = np.arange(0, len(Y[0])) % nr_of_states # so that all states occur
+    return X, Y
+
+
+class TestSparseChainCRF(unittest.TestCase):
+    def test_joint_feature_is_the_same_as_for_dense_features(self):
+        X, Y = get_samples(20, 6, 3, seed = 1)
+        X_sparse = [sp.csr_matrix(x) for x in X]
+        for directed in [True, False]:
+            dense_model = classify_and_select.ChainCRF(directed = directed)
+            dense_model.initialize(X, Y)
+            sparse_model = classify_and_select.SparseChainCRF(directed = directed)
+            sparse_model.initialize(X_sparse, Y)
+            for x, x_sparse, y in zip(X, X_sparse, Y):
+                self.assertTrue(np.allclose(sparse_model.joint_feature(x_sparse, y), dense_model.joint_feature(x, y), rtol = 0, atol = 1e-12))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import glob
+import os
+import shutil
+import tempfile
+import unittest
+
+import unlabelled_pool
+
+SENTENCES = [["perhaps", "there", "is", "better", "way"], ["it", "might", "rain"], ["the", "sun", "shines"], \
+             ["we", "may", "go"], ["this", "is", "certain"], ["possibly", "not"], ["no", "doubt", "about", "it"]]
+
+
+def write_unlabelled_file(file_name, sentences):
+    f = open(file_name, "w")
+    for sentence in sentences:
+        for word in sentence:
+            f.write(word + "\n")
+        f.write("\n")
+    f.close()
+
+
+class TestUnlabelledPool(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.data_dir, "unlabelled.csv")
+        write_unlabelled_file(self.file_name, SENTENCES)
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+
+    def test_append_and_remove(self):
+        pool = unlabelled_pool.UnlabelledPool(SENTENCES[:3])
+        self.assertEqual(list(pool.append(SENTENCES[3:])), [3, 4, 5, 6])
+        self.assertEqual(len(pool), len(SENTENCES))
+
+        pool.remove([1, 4, 4])
+        self.assertEqual(len(pool), len(SENTENCES) - 2)
+        self.assertEqual(list(pool.get_unlabelled_ids()), [0, 2, 3, 5, 6])
+        self.assertEqual(pool.get_sentences([2, 5]), [SENTENCES[2], SENTENCES[5]])
+
+    def test_journal_is_replayed_when_the_pool_is_read(self):
+        unlabelled_pool.write_to_journal(self.file_name, [1, 4], "tolabel_1.csv")
+        unlabelled_pool.write_to_journal(self.file_name, [5], "tolabel_2.csv")
+        # A line that was not completely written is not used
+        with open(unlabelled_pool.get_journal_file_name(self.file_name), "a") as journal_file:
+            journal_file.write("20200101_000000\ttolabel_3.csv\t2 3")
+
+        self.assertEqual(list(unlabelled_pool.read_consumed_ids(self.file_name)), [1, 4, 5])
+        pool = unlabelled_pool.read_unlabelled_pool(self.file_name)
+        self.assertEqual(list(pool.get_unlabelled_ids()), [0, 2, 3, 6])
+        self.assertEqual([list(sentence) for sentence in pool.get_sentences(pool.get_unlabelled_ids())], \
+                         [SENTENCES[0], SENTENCES[2], SENTENCES[3], SENTENCES[6]])
+
+    def test_ids_for_positions_among_the_samples_that_are_not_consumed(self):
+        consumed_ids = [1, 4, 5]
+        # The samples that are not consumed are 0, 2, 3 and 6
+        self.assertEqual(list(unlabelled_pool.get_ids_for_positions([0, 1, 2, 3], consumed_ids)), [0, 2, 3, 6])
+        self.assertEqual(list(unlabelled_pool.get_ids_for_positions([1, 3], [])), [1, 3])
+
+    def test_compact(self):
+        unlabelled_pool.write_to_journal(self.file_name, [1, 4], "tolabel_1.csv")
+        unlabelled_pool.write_to_journal(self.file_name, [5], "tolabel_2.csv")
+        pool_before = unlabelled_pool.read_unlabelled_pool(self.file_name)
+        sentences_before = [list(sentence) for sentence in pool_before.get_sentences(pool_before.get_unlabelled_ids())]
+
+        unlabelled_pool.compact(self.file_name)
+
+        # The compacted file only contains the samples that were not consumed, in the same order, and has no journal
+        self.assertFalse(os.path.exists(unlabelled_pool.get_journal_file_name(self.file_name)))
+        pool_after = unlabelled_pool.read_unlabelled_pool(self.file_name)
+        self.assertEqual(list(pool_after.get_unlabelled_ids()), list(range(0, len(sentences_before))))
+        self.assertEqual([list(sentence) for sentence in pool_after.get_sentences(pool_after.get_unlabelled_ids())], sentences_before)
+
+        # The old file is kept with its journal, so that its history can still be replayed
+        old_file_names = glob.glob(os.path.join(self.data_dir, "unlabelled_*.csv"))
+        self.assertEqual(len(old_file_names), 1)
+        old_pool = unlabelled_pool.read_unlabelled_pool(old_file_names[0])
+        self.assertEqual([list(sentence) for sentence in old_pool.get_sentences(old_pool.get_unlabelled_ids())], sentences_before)
+
+        # Positions in the compacted file are recorded in its new journal
+        unlabelled_pool.write_to_journal(self.file_name, unlabelled_pool.get_ids_for_positions([1], []), "tolabel_3.csv")
+        pool_after = unlabelled_pool.read_unlabelled_pool(self.file_name)
+        self.assertEqual([list(sentence) for sentence in pool_after.get_sentences(pool_after.get_unlabelled_ids())], \
+                         [SENTENCES[0], SENTENCES[3], SENTENCES[6]])
+
+    def test_compact_without_journal_does_not_change_the_file(self):
+        unlabelled_pool.compact(self.file_name)
+        self.assertEqual(os.listdir(self.data_dir), ["unlabelled.csv"])
+
+
+if __name__ == "__main__":
+    unittest.main()
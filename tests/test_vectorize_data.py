@@ -0,0 +1,117 @@
+import unittest
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer
+
+import vectorize_data
+
+WORDS = ["perhaps", "there", "is", "a_a", "better", "way", "it", "might", "rain", "._.", "x-y", "moving,"]
+LABEL_DICT = {"B-speculation": 0, "I-speculation": 1, "O": 2}
+
+# (number_of_previous_words, number_of_following_words)
+WINDOWS = [(0, 0), (1, 0), (0, 3)]
+
+
+def get_text_vector(nr_of_samples, seed):
+    random_state = np.random.RandomState(seed)
+    return [[WORDS[i] for i in random_state.randint(0, len(WORDS), random_state.randint(1, 7))] for j in range(0, nr_of_samples)]
+
+
+def get_label_vector(text_vector):
+    return [["B-speculation" if word in ["perhaps", "might"] else "O" for word in text] for text in text_vector]
+
+
+class Word2vecWrapper:
+    """
+    A word2vec model with random vectors and clusters, with the methods of vectorize_data.Word2vecWrapper that get_feature_matrix uses.
+    The word "way" is not in the model, and has the zero vector and no cluster.
+    """
+    def __init__(self, seed):
+        random_state = np.random.RandomState(seed)
+        self.vectors = {word: random_state.random_sample(4) for word in WORDS if word != "way"}
+        self.clusters = {word: random_state.randint(0, 3) for word in WORDS if word != "way"}
+
+    def get_vectors(self, words):
+        return np.array([self.vectors.get(word, np.zeros(4)) for word in words])
+
+    def get_clusters(self, words):
+        features = np.zeros((len(words), 3), dtype=np.int64)
+        for i, word in enumerate(words):
+            if word in self.clusters:
+                features[i, self.clusters[word]] = 1
+        return features
+
+
+def get_features_token_by_token(text_vector, current_word_vectorizer, context_word_vectorizer, word2vecwrapper, \
+                                    number_of_previous_words, number_of_following_words):
+    """
+    Constructs the features of each token, one token at a time, with the columns described in vectorize_data.get_feature_matrix
+    (with use_current_word_as_feature, use_word2vec and use_clustering)
+    """
+    nr_of_context_columns = len(context_word_vectorizer.vocabulary_)
+    rows = []
+    for text in text_vector:
+        for position, word in enumerate(text):
+            row = list(current_word_vectorizer.transform([word]).toarray()[0])
+            row.extend(word2vecwrapper.get_vectors([word])[0])
+            row.extend(word2vecwrapper.get_clusters([word])[0])
+            offsets = list(range(1, number_of_previous_words + 1)) + [-i for i in range(1, number_of_following_words + 1)]
+            for offset in offsets:
+                context_position = position - offset
+                if context_position >= 0 and context_position < len(text):
+                    context_word = text[context_position]
+                    row.extend(context_word_vectorizer.transform([context_word]).toarray()[0])
+                    row.extend([0, 0])
+                    row.extend(word2vecwrapper.get_vectors([context_word])[0])
+                    row.extend([0, 0])
+                    row.extend(word2vecwrapper.get_clusters([context_word])[0])
+                else:
+                    indicators = [1, 0] if offset > 0 else [0, 1] # [start, end]
+                    row.extend([0] * nr_of_context_columns)
+                    row.extend(indicators)
+                    row.extend([0] * 4)
+                    row.extend(indicators)
+                    row.extend([0] * 3)
+            rows.append(row)
+    return np.array(rows)
+
+
+class TestVectorizeData(unittest.TestCase):
+    def test_feature_matrix_is_the_same_as_token_by_token(self):
+        text_vector = get_text_vector(30, seed = 3) + [["unknown"], ["way", "unknown", "perhaps"]]
+        text_concatenated = np.concatenate(text_vector)
+        current_word_vectorizer = CountVectorizer(binary = True, min_df = 1).fit(text_concatenated)
+        context_word_vectorizer = CountVectorizer(binary = True, min_df = 2).fit(text_concatenated)
+        word2vecwrapper = Word2vecWrapper(seed = 4)
+        for number_of_previous_words, number_of_following_words in WINDOWS:
+            feature_matrix, sentence_offsets = \
+                vectorize_data.get_feature_matrix(text_vector, current_word_vectorizer, context_word_vectorizer, True, word2vecwrapper, \
+                                                      number_of_previous_words, number_of_following_words, True, True)
+            expected = get_features_token_by_token(text_vector, current_word_vectorizer, context_word_vectorizer, word2vecwrapper, \
+                                                       number_of_previous_words, number_of_following_words)
+            self.assertEqual(feature_matrix.shape, expected.shape)
+            self.assertTrue(np.allclose(feature_matrix.toarray(), expected, rtol = 0, atol = 1e-12))
+            self.assertEqual(list(sentence_offsets), list(np.cumsum([0] + [len(text) for text in text_vector])))
+
+    def test_sparse_features_are_the_same_as_the_dense(self):
+        text_vector_labelled = get_text_vector(30, seed = 1)
+        text_vector_unlabelled = get_text_vector(20, seed = 2) + [["unknown", "words"]]
+        for number_of_previous_words, number_of_following_words in WINDOWS:
+            vectorized = []
+            for use_sparse_features in [False, True]:
+                vectorized.append(vectorize_data.vectorize_data(text_vector_labelled, text_vector_unlabelled, \
+                                                                    get_label_vector(text_vector_labelled), LABEL_DICT, False, \
+                                                                    number_of_previous_words, number_of_following_words, True, 1, 2, \
+                                                                    None, False, False, False, use_sparse_features))
+            dense, sparse = vectorized
+            for X_dense, X_sparse in [(dense[0], sparse[0]), (dense[1], sparse[1])]:
+                self.assertEqual(len(X_dense), len(X_sparse))
+                for xi_dense, xi_sparse in zip(X_dense, X_sparse):
+                    self.assertTrue(sp.issparse(xi_sparse))
+                    self.assertTrue(np.array_equal(xi_dense, xi_sparse.toarray()))
+            for y_dense, y_sparse in zip(dense[2], sparse[2]):
+                self.assertTrue(np.array_equal(y_dense, y_sparse))
+
+
+if __name__ == "__main__":
+    unittest.main()
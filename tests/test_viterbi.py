@@ -0,0 +1,76 @@
+import itertools
+import unittest
+import numpy as np
+
+import classify_and_select
+
+INV_LABEL_DICT = {0: "B-speculation", 1: "I-speculation", 2: "B-negation", 3: "I-negation", 4: "O"}
+
+
+class LabelSettings:
+    """
+    The attributes of a model wrapper that are used by get_allowed_transitions
+    """
+    def __init__(self):
+        self.inv_label_dict = INV_LABEL_DICT
+        self.beginning_prefix = "B-"
+        self.inside_prefix = "I-"
+
+
+def get_all_scores(unary_potentials, pairwise_potentials, allowed_start, allowed_transitions):
+    """
+    Returns the score of each allowed classification of the chain, by trying all classifications
+    """
+    n_tokens, n_states = unary_potentials.shape
+    scores = {}
+    for path in itertools.product(range(0, n_states), repeat=n_tokens):
+        if allowed_start[path[0]] and all([allowed_transitions[a, b] for a, b in zip(path[:-1], path[1:])]):
+            scores[path] = classify_and_select.get_chain_score(unary_potentials, pairwise_potentials, np.array(path))
+    return scores
+
+
+class TestViterbi(unittest.TestCase):
+    def setUp(self):
+        self.label_settings = LabelSettings()
+        self.allowed_start, self.allowed_transitions = classify_and_select.get_allowed_transitions(self.label_settings)
+
+    def get_chains(self, nr_of_chains, seed, nr_of_values):
+        """
+        Yields random potentials for chains of 1 to 4 tokens. With few different (integer) values of the potentials,
+        many classifications have the same score.
+        """
+        random_state = np.random.RandomState(seed)
+        for i in range(0, nr_of_chains):
+            n_tokens = random_state.randint(1, 5)
+            unary_potentials = random_state.randint(0, nr_of_values, (n_tokens, len(INV_LABEL_DICT))).astype(np.float64)
+            pairwise_potentials = random_state.randint(0, nr_of_values, (len(INV_LABEL_DICT), len(INV_LABEL_DICT))).astype(np.float64)
+            yield random_state, unary_potentials, pairwise_potentials
+
+    def check_against_all_classifications(self, seed, nr_of_values):
+        for random_state, unary_potentials, pairwise_potentials in self.get_chains(100, seed, nr_of_values):
+            scores = get_all_scores(unary_potentials, pairwise_potentials, self.allowed_start, self.allowed_transitions)
+            sorted_scores = sorted(scores.values(), reverse=True) + [-np.inf]
+
+            best_score, best_path, second_best_score = classify_and_select.get_two_best_viterbi(unary_potentials, pairwise_potentials, \
+                                                                                                 self.allowed_start, self.allowed_transitions)
+            self.assertEqual(best_score, sorted_scores[0])
+            self.assertEqual(second_best_score, sorted_scores[1])
+            self.assertEqual(scores[tuple(best_path)], best_score)
+
+            paths = list(scores.keys())
+            for i in random_state.choice(len(paths), min(5, len(paths)), replace=False):
+                yi = np.array(paths[i])
+                best_other_score = max([score for path, score in scores.items() if path != paths[i]] + [-np.inf])
+                self.assertEqual(classify_and_select.get_smallest_difference_viterbi(unary_potentials, pairwise_potentials, yi, \
+                                                                                         self.label_settings), \
+                                 scores[paths[i]] - best_other_score)
+
+    def test_two_best_viterbi_as_trying_all_classifications(self):
+        self.check_against_all_classifications(seed = 1, nr_of_values = 100)
+
+    def test_two_best_viterbi_with_ties(self):
+        self.check_against_all_classifications(seed = 2, nr_of_values = 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+import classify_and_select
+
+LABEL_DICT = {"B-speculation": 0, "I-speculation": 1, "O": 2}
+MINORITY_CLASSES = ["B-speculation", "I-speculation"]
+
+
+def get_samples(nr_of_samples, nr_of_features, seed):
+    """
+    Returns nr_of_samples random sentences (as dense feature matrices) and their labels, where the label of each token
+    is given by its first features, so that there is something to learn
+    """
+    random_state = np.random.RandomState(seed)
+    X = []
+    Y = []
+    for i in range(0, nr_of_samples):
+        length = random_state.randint(3, 9)
+        x = (random_state.random_sample((length, nr_of_features)) < 0.2).astype(np.float64)
+        y = np.full(length, LABEL_DICT["O"], dtype=np.int64)
+        y[x[:, 0] == 1] = LABEL_DICT["B-speculation"]
+        y[(x[:, 1] == 1) & (x[:, 0] == 0)] = LABEL_DICT["I-speculation"]
+        X.append(x)
+        Y.append(y)
+    return X, Y
+
+
+def fit(X, Y, model_type, model_state_path = None, feature_fingerprint = None, max_iterations = 200):
+    return classify_and_select.get_fitted_model(X, Y, LABEL_DICT, MINORITY_CLASSES, "O", "B-", "I-", max_iterations, model_type, \
+                                                    False, 0, 1, model_state_path, feature_fingerprint = feature_fingerprint)
+
+
+class TestWarmStart(unittest.TestCase):
+    def setUp(self):
+        self.project_dir = tempfile.mkdtemp()
+        self.model_state_path = os.path.join(self.project_dir, "model_state.pkl")
+
+    def tearDown(self):
+        shutil.rmtree(self.project_dir)
+
+    def test_logistic_regression_starts_from_the_saved_weights(self):
+        X, Y = get_samples(60, 10, seed = 1)
+        previous = fit(X, Y, classify_and_select.NonStructuredLogisticRegression, self.model_state_path, "features")
+
+        # Fitted with max_iter=1 on the same data, the warm-started model stays close to the saved weights
+        warm = fit(X, Y, classify_and_select.NonStructuredLogisticRegression, self.model_state_path, "features", max_iterations = 1)
+        self.assertEqual(warm.model.solver, "saga")
+        self.assertLess(np.abs(warm.model.coef_ - previous.model.coef_).max(), 0.1 * np.abs(previous.model.coef_).max())
+        cold = fit(X, Y, classify_and_select.NonStructuredLogisticRegression, None, "features", max_iterations = 1)
+        self.assertEqual(cold.model.solver, "liblinear")
+
+        # On more data, the warm-started model predicts as a model trained from scratch
+        X, Y = get_samples(120, 10, seed = 1)
+        warm = fit(X, Y, classify_and_select.NonStructuredLogisticRegression, self.model_state_path, "features")
+        cold = fit(X, Y, classify_and_select.NonStructuredLogisticRegression)
+        X_flat = np.vstack(X)
+        self.assertGreater(np.mean(warm.model.predict(X_flat) == cold.model.predict(X_flat)), 0.95)
+
+    def test_sgd_is_warm_started_only_with_the_same_features(self):
+        X, Y = get_samples(60, 10, seed = 2)
+        fit(X[:30], Y[:30], classify_and_select.NonStructuredSGDLogisticRegression, self.model_state_path, "features")
+
+        warm = fit(X, Y, classify_and_select.NonStructuredSGDLogisticRegression, self.model_state_path, "features")
+        self.assertTrue(warm.is_warm_started)
+        self.assertEqual(warm.feature_fingerprint, "features")
+
+        # The same number of features, but other columns
+        other = fit(X, Y, classify_and_select.NonStructuredSGDLogisticRegression, self.model_state_path, "other features")
+        self.assertFalse(other.is_warm_started)
+
+        without_fingerprint = fit(X, Y, classify_and_select.NonStructuredSGDLogisticRegression, self.model_state_path)
+        self.assertFalse(without_fingerprint.is_warm_started)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,7 +6,6 @@ from sklearn.metrics import precision_score
 from sklearn.metrics import recall_score
 
 import sys
-import time
 import os
 import shutil
 import importlib
@@ -22,6 +21,9 @@ import vectorize_data
 import classify_and_select
 import active_learning_preannotation
 import simple_tokenizer
+import unlabelled_pool
+import compiled_corpus
+import instrumentation
 
 #from classify_and_select import StructuredModelFrankWolfeSSVM
 
@@ -165,53 +167,55 @@ def get_category(properties):
 
 
 def classify_from_loaded_model(properties, project_path, text_vector, word2vecwrapper, model=None, result_X_unlabelled_np=None, text_vector_unlabelled_np = None):
-    start_time = time.time()
-    time_file = open("time_taken.txt", "w")
-    time_file.write("len(text_vector) " + str(len(text_vector)))
-
-
-    category_with_prefix, category = get_category(properties)
-    if not model:
-        model = do_load_model(properties, project_path, category)
-
-    text_tokenized = simple_tokenizer.simple_tokenize_list(text_vector)
-    time_file.write(" ".join(["After tokenize", str(time.time() - start_time), '\n']))
-
-    if result_X_unlabelled_np ==None or text_vector_unlabelled_np == None:
-        result_X_unlabelled_np, text_vector_unlabelled_np = \
-            vectorize_data.vectorize_unlabelled(text_tokenized, model.current_word_vectorizer, model.context_word_vectorizer, \
-                                                    properties.whether_to_use_word2vec, properties.number_of_previous_words, \
-                                                    properties.number_of_following_words, properties.use_current_word_as_feature, \
-                                                    word2vecwrapper, properties.whether_to_use_clustering)
-
-    time_file.write(" ".join(["After vectorize", str(time.time() - start_time), '\n']))
-
-
-    results = model.predict(result_X_unlabelled_np)
-    time_file.write(" ".join(["After predict", str(time.time() - start_time), '\n']))
-
-    probabilities = model.predict_proba(result_X_unlabelled_np)
-    time_file.write(" ".join(["After predict probabilities", str(time.time() - start_time), '\n']))
-
-    to_return = []
-    for prediction, sentence, sentence_vectorized_np, probability, sentence_tokenized in zip(results, text_vector, result_X_unlabelled_np, probabilities, text_tokenized):
-        word_probabilities_expanded = []
-        for word_probabilities in probability:
-            class_prob_score_dict = {}
-            for class_prob_score, i in zip(word_probabilities, range(0, len(model.inv_label_dict.keys()))):
-                class_prob_score_dict[model.inv_label_dict[i]] = class_prob_score
-            word_probabilities_expanded.append(class_prob_score_dict)
-        tag_format = [model.inv_label_dict[el] for el in prediction]
-        if category_with_prefix in tag_format: 
-            binary_category = category
-        else: 
-            binary_category = properties.outside_class
-        certainty_score = get_sentence_certainty_score(sentence_vectorized_np, prediction, model)
-        to_return.append((tag_format, binary_category, certainty_score, sentence, word_probabilities_expanded))
-        certainty_score = None
-        binary_category = None
-        tag_format = None
-    time_file.write(" ".join(["After loop", str(time.time() - start_time), '\n']))    
+    instrumentation.start_run("classify_from_loaded_model", instrumentation.get_run_report_file(properties, project_path))
+    try:
+        category_with_prefix, category = get_category(properties)
+        if not model:
+            model = do_load_model(properties, project_path, category)
+
+        with instrumentation.phase("tokenize") as measurement:
+            text_tokenized = simple_tokenizer.simple_tokenize_list(text_vector)
+            measurement.count("samples", len(text_vector))
+
+        with instrumentation.phase("vectorize") as measurement:
+            if result_X_unlabelled_np ==None or text_vector_unlabelled_np == None:
+                result_X_unlabelled_np, text_vector_unlabelled_np = \
+                    vectorize_data.vectorize_unlabelled(text_tokenized, model.current_word_vectorizer, model.context_word_vectorizer, \
+                                                            properties.whether_to_use_word2vec, properties.number_of_previous_words, \
+                                                            properties.number_of_following_words, properties.use_current_word_as_feature, \
+                                                            word2vecwrapper, properties.whether_to_use_clustering, properties.use_sparse_features)
+            measurement.count("samples", len(text_vector))
+
+        with instrumentation.phase("predict") as measurement:
+            results = model.predict(result_X_unlabelled_np)
+            measurement.count("samples", len(text_vector))
+
+        with instrumentation.phase("predict_probabilities") as measurement:
+            probabilities = model.predict_proba(result_X_unlabelled_np)
+            measurement.count("samples", len(text_vector))
+
+        with instrumentation.phase("score") as measurement:
+            to_return = []
+            for prediction, sentence, sentence_vectorized_np, probability, sentence_tokenized in zip(results, text_vector, result_X_unlabelled_np, probabilities, text_tokenized):
+                word_probabilities_expanded = []
+                for word_probabilities in probability:
+                    class_prob_score_dict = {}
+                    for class_prob_score, i in zip(word_probabilities, range(0, len(model.inv_label_dict.keys()))):
+                        class_prob_score_dict[model.inv_label_dict[i]] = class_prob_score
+                    word_probabilities_expanded.append(class_prob_score_dict)
+                tag_format = [model.inv_label_dict[el] for el in prediction]
+                if category_with_prefix in tag_format: 
+                    binary_category = category
+                else: 
+                    binary_category = properties.outside_class
+                certainty_score = get_sentence_certainty_score(sentence_vectorized_np, prediction, model)
+                to_return.append((tag_format, binary_category, certainty_score, sentence, word_probabilities_expanded))
+                certainty_score = None
+                binary_category = None
+                tag_format = None
+            measurement.count("samples", len(to_return))
+    finally:
+        instrumentation.end_run()
     return to_return, result_X_unlabelled_np, text_vector_unlabelled_np
 
 # if a minority category has been predicted, return the most certain of these
@@ -261,71 +265,88 @@ def train_and_evaluate_model_cross_validation(properties, project_path, word2vec
     classes.append(properties.outside_class)
     print("Classes to use:\t" + str(classes))
     
-    labelled_data_dir_for_project = os.path.join(project_path, properties.labelled_data_dir)
-    labelled_text_vector, labelled_label_vector, label_dict = \
-        vectorize_data.read_file_labelled_data(labelled_data_dir_for_project, properties.data_file_extension, \
-                                                   properties.minority_classes, properties.outside_class)
+    instrumentation.start_run("train_and_evaluate_model_cross_validation", instrumentation.get_run_report_file(properties, project_path))
+    try:
+        with instrumentation.phase("read") as measurement:
+            labelled_data_dir_for_project = os.path.join(project_path, properties.labelled_data_dir)
+            labelled_text_vector, labelled_label_vector, label_dict = \
+                compiled_corpus.read_labelled_data(labelled_data_dir_for_project, properties.data_file_extension, \
+                                                       properties.minority_classes, properties.outside_class, \
+                                                       compiled_corpus.get_labelled_corpus_dir(properties, project_path), \
+                                                       properties.n_jobs, vectorize_data.get_parse_cache_file(properties, project_path))
+            measurement.count("labelled_samples", len(labelled_text_vector))
     
-    active_learning_preannotation.check_frequency_of_labels(labelled_label_vector, classes)
-
-    skf = StratifiedKFold(n_folds=cross_validation_properties.nr_of_cross_validation_splits_for_evaluation, y = [0 for el in labelled_label_vector], shuffle = True, random_state = 3) 
-    # need to input a vector of the same length as labelled_label_vector, so just constuct on only with zeros
-
-    test_sentences = []
-    test_results = []
-    expected_results = []
-
-    foldnr = 0
-    for train_index, test_index in skf:
-        print("foldnr", foldnr)
-        x_train_sentences = [ vec for (i, vec) in enumerate(labelled_text_vector) if i in train_index]
-        y_train = [ vec for (i, vec) in enumerate(labelled_label_vector) if i in train_index]
-
-        x_test_sentences = [ vec for (i, vec) in enumerate(labelled_text_vector) if i in test_index]
-        y_test = [ vec for (i, vec) in enumerate(labelled_label_vector) if i in test_index]
-
-        active_learning_preannotation.check_frequency_of_labels(y_train, classes)
-
-        X_train_np, X_test_np, y_train_np, text_vector_train_np, text_vector_text_test_np, \
-            current_word_vectorizer, context_word_vectorizer = \
-            vectorize_data.vectorize_data(text_vector_labelled = x_train_sentences, \
-                                   text_vector_unlabelled = x_test_sentences, \
-                                              label_vector_labelled = y_train, \
-                                              class_dict = label_dict, \
-                                              use_word2vec = properties.whether_to_use_word2vec, \
-                                              number_of_previous_words = properties.number_of_previous_words,\
-                                              number_of_following_words = properties.number_of_following_words, \
-                                              use_current_word_as_feature = properties.use_current_word_as_feature, \
-                                              min_df_current = properties.min_df_current, \
-                                              min_df_context = properties.min_df_context, \
-                                              word2vecwrapper = word2vecwrapper, \
-                                              current_word_vocabulary = properties.current_word_vocabulary, \
-                                              context_word_vocabulary = properties.context_word_vocabulary,\
-                                              use_clustering = properties.whether_to_use_clustering)
-
-        model = properties.model_type(label_dict, properties.minority_classes, properties.outside_class, properties.beginning_prefix, \
-                                          properties.inside_prefix, properties.max_iterations, properties.use_cross_validation, \
-                                          properties.nr_of_cross_validation_splits, properties.c_value)
-
-        test_sentences.extend(x_test_sentences)
+        active_learning_preannotation.check_frequency_of_labels(labelled_label_vector, classes)
+
+        skf = StratifiedKFold(n_folds=cross_validation_properties.nr_of_cross_validation_splits_for_evaluation, y = [0 for el in labelled_label_vector], shuffle = True, random_state = 3) 
+        # need to input a vector of the same length as labelled_label_vector, so just constuct on only with zeros
+
+        test_sentences = []
+        test_results = []
+        expected_results = []
+
+        foldnr = 0
+        for train_index, test_index in skf:
+            print("foldnr", foldnr)
+            x_train_sentences = [ vec for (i, vec) in enumerate(labelled_text_vector) if i in train_index]
+            y_train = [ vec for (i, vec) in enumerate(labelled_label_vector) if i in train_index]
+
+            x_test_sentences = [ vec for (i, vec) in enumerate(labelled_text_vector) if i in test_index]
+            y_test = [ vec for (i, vec) in enumerate(labelled_label_vector) if i in test_index]
+
+            active_learning_preannotation.check_frequency_of_labels(y_train, classes)
+
+            with instrumentation.phase("vectorize", fold = foldnr) as measurement:
+                X_train_np, X_test_np, y_train_np, text_vector_train_np, text_vector_text_test_np, \
+                    current_word_vectorizer, context_word_vectorizer = \
+                    vectorize_data.vectorize_data(text_vector_labelled = x_train_sentences, \
+                                           text_vector_unlabelled = x_test_sentences, \
+                                                      label_vector_labelled = y_train, \
+                                                      class_dict = label_dict, \
+                                                      use_word2vec = properties.whether_to_use_word2vec, \
+                                                      number_of_previous_words = properties.number_of_previous_words,\
+                                                      number_of_following_words = properties.number_of_following_words, \
+                                                      use_current_word_as_feature = properties.use_current_word_as_feature, \
+                                                      min_df_current = properties.min_df_current, \
+                                                      min_df_context = properties.min_df_context, \
+                                                      word2vecwrapper = word2vecwrapper, \
+                                                      current_word_vocabulary = properties.current_word_vocabulary, \
+                                                      context_word_vocabulary = properties.context_word_vocabulary,\
+                                                      use_clustering = properties.whether_to_use_clustering, \
+                                                      use_sparse_features = properties.use_sparse_features)
+                measurement.count("samples", len(x_train_sentences) + len(x_test_sentences))
+
+            model = properties.model_type(label_dict, properties.minority_classes, properties.outside_class, properties.beginning_prefix, \
+                                              properties.inside_prefix, properties.max_iterations, properties.use_cross_validation, \
+                                              properties.nr_of_cross_validation_splits, properties.c_value)
+
+            test_sentences.extend(x_test_sentences)
         
-        print("Starts to train")
-        model.fit(X_train_np, y_train_np)
-        #print("Score", model.score(X_train_np, y_train_np))
-
-        print("Starts to predict")
-        results = model.predict(X_test_np)
-        foldnr = foldnr + 1
-
-        results_tag_format = get_result_tag_format(results, model)
-        test_results.extend(results_tag_format)
-        expected_results.extend(y_test)
+            print("Starts to train")
+            with instrumentation.phase("fit", fold = foldnr) as measurement:
+                model.fit(X_train_np, y_train_np)
+                measurement.count("samples", len(x_train_sentences))
+            #print("Score", model.score(X_train_np, y_train_np))
+
+            print("Starts to predict")
+            with instrumentation.phase("predict", fold = foldnr) as measurement:
+                results = model.predict(X_test_np)
+                measurement.count("samples", len(x_test_sentences))
+            foldnr = foldnr + 1
+
+            results_tag_format = get_result_tag_format(results, model)
+            test_results.extend(results_tag_format)
+            expected_results.extend(y_test)
         
-    for category in [el for el in label_dict.keys() if el.startswith(properties.beginning_prefix)]:
-        evaluate_category(category, test_sentences, test_results, expected_results, properties.outside_class, project_path, \
-                              cross_validation_properties.evaluation_output_dir, properties.inside_prefix, properties.beginning_prefix, \
-                              properties.c_value, properties.model_type, properties.whether_to_use_word2vec, properties.whether_to_use_clustering, \
-                              len(labelled_text_vector))
+        with instrumentation.phase("write") as measurement:
+            for category in [el for el in label_dict.keys() if el.startswith(properties.beginning_prefix)]:
+                evaluate_category(category, test_sentences, test_results, expected_results, properties.outside_class, project_path, \
+                                      cross_validation_properties.evaluation_output_dir, properties.inside_prefix, properties.beginning_prefix, \
+                                      properties.c_value, properties.model_type, properties.whether_to_use_word2vec, properties.whether_to_use_clustering, \
+                                      len(labelled_text_vector))
+            measurement.count("samples", len(test_sentences))
+    finally:
+        instrumentation.end_run()
 
 
 
@@ -341,97 +362,116 @@ def train_and_evaluate_model_against_evaluation_data(properties, project_path, w
     classes.append(properties.outside_class)
     print("Classes to use:\t" + str(classes))
     
-    labelled_data_dir_for_project = os.path.join(project_path, properties.labelled_data_dir)
-    labelled_text_vector, labelled_label_vector, label_dict = \
-        vectorize_data.read_file_labelled_data(labelled_data_dir_for_project, properties.data_file_extension, \
-                                                   properties.minority_classes, properties.outside_class)
-
-    active_learning_preannotation.check_frequency_of_labels(labelled_label_vector, classes)
-
-    category_with_prefix, category = get_category(properties)
-    print("Performing evaluation for the category " + category)
-
-    separate_evaluation_base_path = os.path.join(properties_eval.separate_evaluation_data_dir, category)
-    positive_path = os.path.join(project_path, separate_evaluation_base_path, category)
-    negative_path = os.path.join(project_path, separate_evaluation_base_path, properties_eval.negative_category)
-
-    expected_results = []
-    positive_sent = []
-    for pos_file in glob.glob(os.path.join(positive_path, "*.txt")):
-        positive_sent.extend(simple_tokenizer.simple_tokenize(pos_file))
-        expected_results.append([category_with_prefix])
-
-    negative_sent = []
-    for neg_file in glob.glob(os.path.join(negative_path, "*.txt")):
-        negative_sent.extend(simple_tokenizer.simple_tokenize(neg_file))
-        expected_results.append([properties.outside_class])
-
-    evaluation_data = positive_sent + negative_sent
-
-    # The unlabelled data sent to the vectorizer is here the evaluation data 
-    X_train_np, X_test_np, y_train_np, text_vector_train_np, text_vector_text_test_np, \
-        current_word_vectorizer, context_word_vectorizer = \
-        vectorize_data.vectorize_data(text_vector_labelled = labelled_text_vector, \
-                                          text_vector_unlabelled = evaluation_data, \
-                                          label_vector_labelled = labelled_label_vector, \
-                                          class_dict = label_dict, \
-                                          use_word2vec = properties.whether_to_use_word2vec, \
-                                          number_of_previous_words = properties.number_of_previous_words, \
-                                          number_of_following_words = properties.number_of_following_words, \
-                                          use_current_word_as_feature = properties.use_current_word_as_feature, \
-                                          min_df_current = properties.min_df_current, \
-                                          min_df_context = properties.min_df_context, \
-                                          word2vecwrapper = word2vecwrapper, \
-                                          current_word_vocabulary = properties.current_word_vocabulary, \
-                                          context_word_vocabulary = properties.context_word_vocabulary, \
-                                          use_clustering = properties.whether_to_use_clustering)    
+    instrumentation.start_run("train_and_evaluate_model_against_evaluation_data", instrumentation.get_run_report_file(properties, project_path))
+    try:
+        with instrumentation.phase("read") as measurement:
+            labelled_data_dir_for_project = os.path.join(project_path, properties.labelled_data_dir)
+            labelled_text_vector, labelled_label_vector, label_dict = \
+                compiled_corpus.read_labelled_data(labelled_data_dir_for_project, properties.data_file_extension, \
+                                                       properties.minority_classes, properties.outside_class, \
+                                                       compiled_corpus.get_labelled_corpus_dir(properties, project_path), \
+                                                       properties.n_jobs, vectorize_data.get_parse_cache_file(properties, project_path))
+            measurement.count("labelled_samples", len(labelled_text_vector))
+
+        active_learning_preannotation.check_frequency_of_labels(labelled_label_vector, classes)
+
+        category_with_prefix, category = get_category(properties)
+        print("Performing evaluation for the category " + category)
+
+        separate_evaluation_base_path = os.path.join(properties_eval.separate_evaluation_data_dir, category)
+        positive_path = os.path.join(project_path, separate_evaluation_base_path, category)
+        negative_path = os.path.join(project_path, separate_evaluation_base_path, properties_eval.negative_category)
+
+        with instrumentation.phase("read") as measurement:
+            expected_results = []
+            positive_sent = []
+            for pos_file in glob.glob(os.path.join(positive_path, "*.txt")):
+                positive_sent.extend(simple_tokenizer.simple_tokenize(pos_file))
+                expected_results.append([category_with_prefix])
+
+            negative_sent = []
+            for neg_file in glob.glob(os.path.join(negative_path, "*.txt")):
+                negative_sent.extend(simple_tokenizer.simple_tokenize(neg_file))
+                expected_results.append([properties.outside_class])
+
+            evaluation_data = positive_sent + negative_sent
+            measurement.count("evaluation_samples", len(evaluation_data))
+
+        # The unlabelled data sent to the vectorizer is here the evaluation data 
+        with instrumentation.phase("vectorize") as measurement:
+            X_train_np, X_test_np, y_train_np, text_vector_train_np, text_vector_text_test_np, \
+                current_word_vectorizer, context_word_vectorizer = \
+                vectorize_data.vectorize_data(text_vector_labelled = labelled_text_vector, \
+                                                  text_vector_unlabelled = evaluation_data, \
+                                                  label_vector_labelled = labelled_label_vector, \
+                                                  class_dict = label_dict, \
+                                                  use_word2vec = properties.whether_to_use_word2vec, \
+                                                  number_of_previous_words = properties.number_of_previous_words, \
+                                                  number_of_following_words = properties.number_of_following_words, \
+                                                  use_current_word_as_feature = properties.use_current_word_as_feature, \
+                                                  min_df_current = properties.min_df_current, \
+                                                  min_df_context = properties.min_df_context, \
+                                                  word2vecwrapper = word2vecwrapper, \
+                                                  current_word_vocabulary = properties.current_word_vocabulary, \
+                                                  context_word_vocabulary = properties.context_word_vocabulary, \
+                                                  use_clustering = properties.whether_to_use_clustering, \
+                                                  use_sparse_features = properties.use_sparse_features)
+            measurement.count("samples", len(labelled_text_vector) + len(evaluation_data))
 
-    model = properties.model_type(label_dict, properties.minority_classes, properties.outside_class, properties.beginning_prefix, \
-                                      properties.inside_prefix, properties.max_iterations, properties.use_cross_validation, \
-                                      properties.nr_of_cross_validation_splits, properties.c_value)
+        model = properties.model_type(label_dict, properties.minority_classes, properties.outside_class, properties.beginning_prefix, \
+                                          properties.inside_prefix, properties.max_iterations, properties.use_cross_validation, \
+                                          properties.nr_of_cross_validation_splits, properties.c_value)
 
 
 
-    print("Starts to train")
-    model.fit(X_train_np, y_train_np)
+        print("Starts to train")
+        with instrumentation.phase("fit") as measurement:
+            model.fit(X_train_np, y_train_np)
+            measurement.count("samples", len(labelled_text_vector))
 
-    if properties_eval.save_model:
-        model.current_word_vectorizer = current_word_vectorizer
-        model.context_word_vectorizer = context_word_vectorizer
+        if properties_eval.save_model:
+            model.current_word_vectorizer = current_word_vectorizer
+            model.context_word_vectorizer = context_word_vectorizer
 
-        print("model.minority_classes_index", model.minority_classes_index)
+            print("model.minority_classes_index", model.minority_classes_index)
 
         
-        for c_nr in range(0, len(model.minority_classes_index)):
-            category_name =  model.inv_label_dict[c_nr]
-            if category_name.startswith(model.beginning_prefix):
-                model.beginning_category = c_nr
-            if category_name.startswith(model.inside_prefix):
-                model.inside_category = c_nr
-        print("model.beginning_category", model.beginning_category)
-
-        savedmodel_filename = do_save_model(properties_eval, project_path, category, model, properties_file_name)
-
-    print("Starts to predict")
-    results = model.predict(X_test_np)
-
-    if properties_eval.save_model:
-        output_path = os.path.join(project_path, properties_eval.saved_model_dir, category) 
-        loaded_model = do_load_model(properties, output_path, category)
-        loaded_results = loaded_model.predict(X_test_np)
-        for res1, res2 in zip(results, loaded_results):
-            if not numpy.array_equal(res1, res2):
-                print(res1, res2)
-                print("ERROR: Loaded model different from saved one")
-                exit(1)
-        loaded_model = None
+            for c_nr in range(0, len(model.minority_classes_index)):
+                category_name =  model.inv_label_dict[c_nr]
+                if category_name.startswith(model.beginning_prefix):
+                    model.beginning_category = c_nr
+                if category_name.startswith(model.inside_prefix):
+                    model.inside_category = c_nr
+            print("model.beginning_category", model.beginning_category)
 
-    test_results = get_result_tag_format(results, model)    
+            savedmodel_filename = do_save_model(properties_eval, project_path, category, model, properties_file_name)
 
-    evaluate_category(category_with_prefix, evaluation_data, test_results, expected_results, \
-                          properties.outside_class, project_path, properties_eval.separate_evaluation_output_dir, \
-                          properties.inside_prefix, properties.beginning_prefix, properties.c_value, properties.model_type, \
-                          properties.whether_to_use_word2vec, properties.whether_to_use_clustering, len(labelled_text_vector))
+        print("Starts to predict")
+        with instrumentation.phase("predict") as measurement:
+            results = model.predict(X_test_np)
+            measurement.count("samples", len(evaluation_data))
+
+        if properties_eval.save_model:
+            output_path = os.path.join(project_path, properties_eval.saved_model_dir, category) 
+            loaded_model = do_load_model(properties, output_path, category)
+            loaded_results = loaded_model.predict(X_test_np)
+            for res1, res2 in zip(results, loaded_results):
+                if not numpy.array_equal(res1, res2):
+                    print(res1, res2)
+                    print("ERROR: Loaded model different from saved one")
+                    exit(1)
+            loaded_model = None
+
+        test_results = get_result_tag_format(results, model)    
+
+        with instrumentation.phase("write") as measurement:
+            evaluate_category(category_with_prefix, evaluation_data, test_results, expected_results, \
+                                  properties.outside_class, project_path, properties_eval.separate_evaluation_output_dir, \
+                                  properties.inside_prefix, properties.beginning_prefix, properties.c_value, properties.model_type, \
+                                  properties.whether_to_use_word2vec, properties.whether_to_use_clustering, len(labelled_text_vector))
+            measurement.count("samples", len(evaluation_data))
+    finally:
+        instrumentation.end_run()
 
 
 ##################################################
@@ -506,22 +546,25 @@ def train_and_evaluate_simulation(x_train_sentences, y_train, x_test_sentences,
     active_learning_preannotation.check_frequency_of_labels(y_train, classes)
 
     print("Before vectorize")
-    X_train_np, X_test_np, y_train_np, text_vector_train_np, text_vector_text_test_np, \
-                      current_word_vectorizer, context_word_vectorizer = \
-                      vectorize_data.vectorize_data(text_vector_labelled = x_train_sentences, \
-                                              text_vector_unlabelled = x_test_sentences, \
-                                              label_vector_labelled = y_train, \
-                                              class_dict = label_dict, \
-                                              use_word2vec = whether_to_use_word2vec, \
-                                              number_of_previous_words = properties.number_of_previous_words,\
-                                              number_of_following_words = properties.number_of_following_words, \
-                                              use_current_word_as_feature = properties.use_current_word_as_feature, \
-                                              min_df_current = properties.min_df_current, \
-                                              min_df_context = properties.min_df_context, \
-                                              word2vecwrapper = word2vecwrapper, \
-                                              current_word_vocabulary = properties.current_word_vocabulary, \
-                                              context_word_vocabulary = properties.context_word_vocabulary, \
-                                              use_clustering = properties.whether_to_use_clustering)    
+    with instrumentation.phase("vectorize", selection_type = selection_type, data_size = nr_of_samples, fold = fold_nr, word2vec = whether_to_use_word2vec) as measurement:
+        X_train_np, X_test_np, y_train_np, text_vector_train_np, text_vector_text_test_np, \
+                          current_word_vectorizer, context_word_vectorizer = \
+                          vectorize_data.vectorize_data(text_vector_labelled = x_train_sentences, \
+                                                  text_vector_unlabelled = x_test_sentences, \
+                                                  label_vector_labelled = y_train, \
+                                                  class_dict = label_dict, \
+                                                  use_word2vec = whether_to_use_word2vec, \
+                                                  number_of_previous_words = properties.number_of_previous_words,\
+                                                  number_of_following_words = properties.number_of_following_words, \
+                                                  use_current_word_as_feature = properties.use_current_word_as_feature, \
+                                                  min_df_current = properties.min_df_current, \
+                                                  min_df_context = properties.min_df_context, \
+                                                  word2vecwrapper = word2vecwrapper, \
+                                                  current_word_vocabulary = properties.current_word_vocabulary, \
+                                                  context_word_vocabulary = properties.context_word_vocabulary, \
+                                                  use_clustering = properties.whether_to_use_clustering, \
+                                                  use_sparse_features = properties.use_sparse_features)
+        measurement.count("samples", len(x_train_sentences) + len(x_test_sentences))
 
     model = properties.model_type(label_dict, properties.minority_classes, properties.outside_class, properties.beginning_prefix, \
                                           properties.inside_prefix, properties.max_iterations, properties.use_cross_validation, \
@@ -531,20 +574,26 @@ def train_and_evaluate_simulation(x_train_sentences, y_train, x_test_sentences,
     test_sentences = x_test_sentences  # not really need a new variable
         
     print("Starts to train")
-    model.fit(X_train_np, y_train_np)
+    with instrumentation.phase("fit", selection_type = selection_type, data_size = nr_of_samples, fold = fold_nr, word2vec = whether_to_use_word2vec) as measurement:
+        model.fit(X_train_np, y_train_np)
+        measurement.count("samples", nr_of_samples)
 
     print("Starts to predict")
-    results = model.predict(X_test_np)
+    with instrumentation.phase("predict", selection_type = selection_type, data_size = nr_of_samples, fold = fold_nr, word2vec = whether_to_use_word2vec) as measurement:
+        results = model.predict(X_test_np)
+        measurement.count("samples", len(x_test_sentences))
 
     results_tag_format = get_result_tag_format(results, model)
     test_results = results_tag_format # not really need a new variable
     expected_results = y_test  # not really need a new variable
         
-    for category in [el for el in label_dict.keys() if el.startswith(properties.beginning_prefix)]:
-        evaluate_category_different_data_sizes(category, test_sentences, test_results, expected_results, properties.outside_class, project_path, 
-                                               properties.evaluation_output_dir, properties.inside_prefix, properties.beginning_prefix, \
-                                                   model.get_params(), model.get_cs(), properties.model_type, whether_to_use_word2vec, nr_of_samples, \
-                                                   selection_type, fold_nr)
+    with instrumentation.phase("write", selection_type = selection_type, data_size = nr_of_samples, fold = fold_nr, word2vec = whether_to_use_word2vec) as measurement:
+        for category in [el for el in label_dict.keys() if el.startswith(properties.beginning_prefix)]:
+            evaluate_category_different_data_sizes(category, test_sentences, test_results, expected_results, properties.outside_class, project_path, 
+                                                   properties.evaluation_output_dir, properties.inside_prefix, properties.beginning_prefix, \
+                                                       model.get_params(), model.get_cs(), properties.model_type, whether_to_use_word2vec, nr_of_samples, \
+                                                       selection_type, fold_nr)
+        measurement.count("samples", len(test_sentences))
 
 def run_active_selection(labelled_text_vector, labelled_label_vector, train_index, x_test_sentences, y_test, label_dict, classes, \
                              properties, word2vecwrapper, project_path, seed_set_size, step_size, max_size, whether_to_use_word2vec, fold_nr):
@@ -558,49 +607,58 @@ def run_active_selection(labelled_text_vector, labelled_label_vector, train_inde
               #print("used_indeces", used_indeces)
 
     print("whether_to_use_word2vec", whether_to_use_word2vec)
+
+    # The id of a sentence in the pool is its position in pool_indeces, which gives its index in labelled_text_vector
+    pool_indeces = sorted(set(train_index[seed_set_size:]) - set(used_indeces))
+    pool = unlabelled_pool.UnlabelledPool([labelled_text_vector[i] for i in pool_indeces])
+
     seed_set_run = True
+    round_nr = 0
     while nr_of_samples + step_size < len(train_index) and nr_of_samples + step_size < max_size:
         if not seed_set_run:
-            x_pool_sentences = [ vec for (i, vec) in enumerate(labelled_text_vector) if i in train_index[seed_set_size:] and i not in used_indeces]
+            unlabelled_ids = pool.get_unlabelled_ids()
+            x_pool_sentences = pool.get_sentences(unlabelled_ids)
             print("len(used_indeces)", len(used_indeces))
-            X_labelled_np, X_unlabelled_np, y_labelled_np, text_vector_labelled_np, text_vector_unlabelled_np, \
-                          current_word_vectorizer, context_word_vectorizer = \
-                          vectorize_data.vectorize_data(\
-                text_vector_labelled = x_train_sentences, text_vector_unlabelled = x_pool_sentences,\
-                    label_vector_labelled = y_train, \
-                                          class_dict = label_dict, use_word2vec = whether_to_use_word2vec, \
-                                          number_of_previous_words = properties.number_of_previous_words, \
-                                          number_of_following_words = properties.number_of_following_words, \
-                                          use_current_word_as_feature = properties.use_current_word_as_feature, \
-                                          min_df_current = properties.min_df_current,  \
-                                          min_df_context = properties.min_df_context, \
-                                          word2vecwrapper = word2vecwrapper, \
-                                          current_word_vocabulary = properties.current_word_vocabulary, \
-                                          context_word_vocabulary = properties.context_word_vocabulary, \
-                    use_clustering = properties.whether_to_use_clustering)  
-
-            to_select_X, new_unlabelled_x, to_select_text, new_sentences_unlabelled, predicted_for_selected = \
-                          classify_and_select.get_new_data(X_labelled_np, X_unlabelled_np, y_labelled_np, text_vector_labelled_np, \
-                                             text_vector_unlabelled_np, label_dict, properties.minority_classes, \
-                                             step_size, properties.maximum_samples_to_search_among, \
-                                             properties.outside_class, properties.beginning_prefix, \
-                                             properties.inside_prefix, properties.inactive_learning, \
-                                             properties.max_iterations, properties.prefer_predicted_chunks, \
-                                             properties.model_type, properties.use_cross_validation, \
-                                             properties.nr_of_cross_validation_splits, \
-                                             properties.c_value)
+            with instrumentation.phase("vectorize", round = round_nr, fold = fold_nr, word2vec = whether_to_use_word2vec) as measurement:
+                X_labelled_np, X_unlabelled_np, y_labelled_np, text_vector_labelled_np, text_vector_unlabelled_np, \
+                              current_word_vectorizer, context_word_vectorizer = \
+                              vectorize_data.vectorize_data(\
+                    text_vector_labelled = x_train_sentences, text_vector_unlabelled = x_pool_sentences,\
+                        label_vector_labelled = y_train, \
+                                              class_dict = label_dict, use_word2vec = whether_to_use_word2vec, \
+                                              number_of_previous_words = properties.number_of_previous_words, \
+                                              number_of_following_words = properties.number_of_following_words, \
+                                              use_current_word_as_feature = properties.use_current_word_as_feature, \
+                                              min_df_current = properties.min_df_current,  \
+                                              min_df_context = properties.min_df_context, \
+                                              word2vecwrapper = word2vecwrapper, \
+                                              current_word_vocabulary = properties.current_word_vocabulary, \
+                                              context_word_vocabulary = properties.context_word_vocabulary, \
+                        use_clustering = properties.whether_to_use_clustering, \
+                        use_sparse_features = properties.use_sparse_features)
+                measurement.count("samples", len(x_train_sentences) + len(x_pool_sentences))
+
+            with instrumentation.phase("select", round = round_nr, fold = fold_nr, word2vec = whether_to_use_word2vec) as measurement:
+                to_select_X, to_select_text, predicted_for_selected, selected_pool_indeces = \
+                              classify_and_select.get_new_data(X_labelled_np, X_unlabelled_np, y_labelled_np, text_vector_labelled_np, \
+                                                 text_vector_unlabelled_np, label_dict, properties.minority_classes, \
+                                                 step_size, properties.maximum_samples_to_search_among, \
+                                                 properties.outside_class, properties.beginning_prefix, \
+                                                 properties.inside_prefix, properties.inactive_learning, \
+                                                 properties.max_iterations, properties.prefer_predicted_chunks, \
+                                                 properties.model_type, properties.use_cross_validation, \
+                                                 properties.nr_of_cross_validation_splits, \
+                                                 properties.c_value, margin_method = properties.ssvm_margin_method, \
+                                                 n_jobs = properties.n_jobs)
+                measurement.count("selected_samples", len(to_select_text))
 
                       #print("to_select_text", to_select_text)
-            selected_set = set()
-            for el in to_select_text:
-                st = " ".join(el)
-                selected_set.add(st)
+            selected_ids = unlabelled_ids[selected_pool_indeces]
+            pool.remove(selected_ids)
 
-
-            selected_indeces = [i for (i, vec) in enumerate(labelled_text_vector) if " ".join(vec) in selected_set]
+            selected_indeces = sorted([pool_indeces[i] for i in selected_ids])
             if len(selected_indeces) != step_size:
                 print("selected_indeces", selected_indeces)
-                print("selected_set", selected_set)
                 print("not enough selected")
                 exit(1)
 
@@ -617,6 +675,7 @@ def run_active_selection(labelled_text_vector, labelled_label_vector, train_inde
                                           selection_type = "active", fold_nr = fold_nr)
                   
         seed_set_run = False
+        round_nr = round_nr + 1
 
 
 
@@ -634,71 +693,78 @@ def simulate_different_data_sizes(properties, simulation_properties, project_pat
     classes.append(properties.outside_class)
     print("Classes to use:\t" + str(classes))
 
+    instrumentation.start_run("simulate_different_data_sizes", instrumentation.get_run_report_file(properties, project_path))
+    try:
+        with instrumentation.phase("read") as measurement:
+            labelled_data_dir_for_project = os.path.join(project_path, properties.labelled_data_dir)
+            labelled_text_vector, labelled_label_vector, label_dict = \
+                compiled_corpus.read_labelled_data(labelled_data_dir_for_project, properties.data_file_extension, \
+                                                       properties.minority_classes, properties.outside_class, \
+                                                       compiled_corpus.get_labelled_corpus_dir(properties, project_path), \
+                                                       properties.n_jobs, vectorize_data.get_parse_cache_file(properties, project_path))
+            measurement.count("labelled_samples", len(labelled_text_vector))
     
-    labelled_data_dir_for_project = os.path.join(project_path, properties.labelled_data_dir)
-    labelled_text_vector, labelled_label_vector, label_dict = \
-        vectorize_data.read_file_labelled_data(labelled_data_dir_for_project, properties.data_file_extension, \
-                                                   properties.minority_classes, properties.outside_class)
-    
-    active_learning_preannotation.check_frequency_of_labels(labelled_label_vector, classes)
+        active_learning_preannotation.check_frequency_of_labels(labelled_label_vector, classes)
 
-    category_with_prefix, category = get_category(properties)
-    print("Performing evaluation for the category " + category)
+        category_with_prefix, category = get_category(properties)
+        print("Performing evaluation for the category " + category)
 
-    seed_set_size = simulation_properties.seed_set_size
-    step_size = simulation_properties.step_size
-    max_size = simulation_properties.max_size
+        seed_set_size = simulation_properties.seed_set_size
+        step_size = simulation_properties.step_size
+        max_size = simulation_properties.max_size
 
-    for fold_nr in range(start_fold, end_fold):
-        print("\n\n")
-        print("Running fold number " + str(fold_nr))
-        print("--------")
+        for fold_nr in range(start_fold, end_fold):
+            print("\n\n")
+            print("Running fold number " + str(fold_nr))
+            print("--------")
 
-        # one test_fold and one train_fold
-        skf = StratifiedKFold(n_folds=2, y = [0 for el in labelled_label_vector], shuffle = True) 
-        # need to input a vector of the same length as labelled_label_vector, so just constuct one only with zeros
+            # one test_fold and one train_fold
+            skf = StratifiedKFold(n_folds=2, y = [0 for el in labelled_label_vector], shuffle = True) 
+            # need to input a vector of the same length as labelled_label_vector, so just constuct one only with zeros
 
-        foldnr_skf = 0
-        for train_index, test_index in skf: 
-              if foldnr_skf > 0:
-                  break # only use the first fold, that is created by the StratifiedKFold class
+            foldnr_skf = 0
+            for train_index, test_index in skf: 
+                  if foldnr_skf > 0:
+                      break # only use the first fold, that is created by the StratifiedKFold class
 
-              random.shuffle(train_index)
-              print("test_index", test_index)
-              print("train_index (pool index)", train_index)
+                  random.shuffle(train_index)
+                  print("test_index", test_index)
+                  print("train_index (pool index)", train_index)
                        
-              x_test_sentences = [ vec for (i, vec) in enumerate(labelled_text_vector) if i in test_index]
-              y_test = [ vec for (i, vec) in enumerate(labelled_label_vector) if i in test_index]
+                  x_test_sentences = [ vec for (i, vec) in enumerate(labelled_text_vector) if i in test_index]
+                  y_test = [ vec for (i, vec) in enumerate(labelled_label_vector) if i in test_index]
      
-              # Random selection of data
-              print("Random selection")
-              print("------")
-              nr_of_samples = seed_set_size
-              while nr_of_samples < len(train_index) and nr_of_samples < max_size:
-                  print("Training with " + str(nr_of_samples) + " samples.")
-                  x_train_sentences = [ vec for (i, vec) in enumerate(labelled_text_vector) if i in train_index[:nr_of_samples]]
-                  y_train = [ vec for (i, vec) in enumerate(labelled_label_vector) if i in train_index[:nr_of_samples]]
-
-                  train_and_evaluate_simulation(x_train_sentences, y_train, x_test_sentences, y_test, label_dict, classes, \
-                                                    properties, word2vecwrapper, project_path, whether_to_use_word2vec = False, \
-                                                    selection_type = "random", fold_nr = fold_nr)
-                  train_and_evaluate_simulation(x_train_sentences, y_train, x_test_sentences, y_test, label_dict, classes, \
-                                                    properties, word2vecwrapper, project_path, whether_to_use_word2vec = True, \
-                                                    selection_type = "random", fold_nr = fold_nr)
-
-                  nr_of_samples = nr_of_samples + step_size
+                  # Random selection of data
+                  print("Random selection")
+                  print("------")
+                  nr_of_samples = seed_set_size
+                  while nr_of_samples < len(train_index) and nr_of_samples < max_size:
+                      print("Training with " + str(nr_of_samples) + " samples.")
+                      x_train_sentences = [ vec for (i, vec) in enumerate(labelled_text_vector) if i in train_index[:nr_of_samples]]
+                      y_train = [ vec for (i, vec) in enumerate(labelled_label_vector) if i in train_index[:nr_of_samples]]
+
+                      train_and_evaluate_simulation(x_train_sentences, y_train, x_test_sentences, y_test, label_dict, classes, \
+                                                        properties, word2vecwrapper, project_path, whether_to_use_word2vec = False, \
+                                                        selection_type = "random", fold_nr = fold_nr)
+                      train_and_evaluate_simulation(x_train_sentences, y_train, x_test_sentences, y_test, label_dict, classes, \
+                                                        properties, word2vecwrapper, project_path, whether_to_use_word2vec = True, \
+                                                        selection_type = "random", fold_nr = fold_nr)
+
+                      nr_of_samples = nr_of_samples + step_size
               
 
-              # Active selection of data
-              run_active_selection(labelled_text_vector, labelled_label_vector, train_index, x_test_sentences, y_test, label_dict, classes, \
-                                       properties, word2vecwrapper, project_path, seed_set_size, step_size, max_size, \
-                                       whether_to_use_word2vec = False, fold_nr = fold_nr)
-              run_active_selection(labelled_text_vector, labelled_label_vector, train_index, x_test_sentences, y_test, label_dict, classes, \
-                                       properties, word2vecwrapper, project_path, seed_set_size, step_size, max_size, \
-                                       whether_to_use_word2vec = True, fold_nr = fold_nr)
+                  # Active selection of data
+                  run_active_selection(labelled_text_vector, labelled_label_vector, train_index, x_test_sentences, y_test, label_dict, classes, \
+                                           properties, word2vecwrapper, project_path, seed_set_size, step_size, max_size, \
+                                           whether_to_use_word2vec = False, fold_nr = fold_nr)
+                  run_active_selection(labelled_text_vector, labelled_label_vector, train_index, x_test_sentences, y_test, label_dict, classes, \
+                                           properties, word2vecwrapper, project_path, seed_set_size, step_size, max_size, \
+                                           whether_to_use_word2vec = True, fold_nr = fold_nr)
 
-              ###
+                  ###
     
 
-              # only use the first fold (could as well do a break here)
-              foldnr_skf = foldnr_skf + 1
+                  # only use the first fold (could as well do a break here)
+                  foldnr_skf = foldnr_skf + 1
+    finally:
+        instrumentation.end_run()
@@ -0,0 +1,190 @@
+import logging
+import os
+import shutil
+import time
+import numpy as np
+
+import compiled_corpus
+
+logger = logging.getLogger(__name__)
+
+
+JOURNAL_SUFFIX = ".consumed"
+
+
+class UnlabelledPool:
+    """
+    UnlabelledPool
+
+    The pool of unlabelled data. Sentences are only appended to the pool, and each sentence keeps its id (the order in which
+    it was appended) for as long as the pool exists. When sentences are selected for labelling, they are not removed from
+    the store, but marked as no longer unlabelled in a bitmap. Removing a batch of selected sentences therefore only costs
+    as much as the size of the batch, and the arrays with the remaining sentences never have to be copied.
+    """
+
+    def __init__(self, text_vector = None):
+        self.sentences = []
+        self.is_unlabelled = np.zeros(0, dtype=bool)
+        self.nr_of_unlabelled = 0
+        if text_vector is not None:
+            self.append(text_vector)
+
+    def __len__(self):
+        return self.nr_of_unlabelled
+
+    def append(self, text_vector):
+        """
+        append
+
+        Appends the sentences in text_vector (in the same format as the text_vector returned by
+        vectorize_data.read_file_unlabelled_data) to the pool.
+
+        returns: the ids of the appended sentences
+        """
+        first_id = len(self.sentences)
+        self.sentences.extend(text_vector)
+        if len(self.sentences) > len(self.is_unlabelled):
+            # The bitmap grows by doubling, so that appending is not O(pool)
+            new_is_unlabelled = np.zeros(max(len(self.sentences), 2 * len(self.is_unlabelled)), dtype=bool)
+            new_is_unlabelled[:first_id] = self.is_unlabelled[:first_id]
+            self.is_unlabelled = new_is_unlabelled
+        self.is_unlabelled[first_id:len(self.sentences)] = True
+        self.nr_of_unlabelled = self.nr_of_unlabelled + len(self.sentences) - first_id
+        return np.arange(first_id, len(self.sentences))
+
+    def remove(self, ids):
+        """
+        remove
+
+        Marks the sentences with the given ids as no longer unlabelled (e.g. since they have been selected for labelling).
+        """
+        ids = np.unique(np.asarray(ids, dtype=int))
+        self.nr_of_unlabelled = self.nr_of_unlabelled - int(np.count_nonzero(self.is_unlabelled[ids]))
+        self.is_unlabelled[ids] = False
+
+    def get_unlabelled_ids(self):
+        """
+        get_unlabelled_ids
+
+        returns: the ids of the sentences that are still unlabelled, in the order in which they were appended
+        """
+        return np.flatnonzero(self.is_unlabelled[:len(self.sentences)])
+
+    def get_sentences(self, ids):
+        """
+        get_sentences
+
+        returns: a list with the sentences with the given ids
+        """
+        return [self.sentences[i] for i in ids]
+
+    def write(self, file_name):
+        """
+        write
+
+        Writes the sentences that are still unlabelled to file_name, in the same csv-format as they are read
+        by vectorize_data.read_file_unlabelled_data
+        """
+        unlabelled_data_file = open(file_name, "w")
+        for i in self.get_unlabelled_ids():
+            for text in self.sentences[i]:
+                unlabelled_data_file.write(text + "\n")
+            unlabelled_data_file.write("\n")
+        unlabelled_data_file.close()
+
+
+def read_unlabelled_pool(file_name, corpus_dir = None):
+    """
+    read_unlabelled_pool
+
+    Reads the unlabelled data in file_name (in the format read by vectorize_data.read_file_unlabelled_data) into an UnlabelledPool,
+    in which the id of each sentence is its position in the file. The sentences with ids in the journal of file_name
+    (see write_to_journal) are marked as no longer unlabelled.
+    If corpus_dir is given, the compiled corpus in corpus_dir is read instead of file_name if it is up to date (see compiled_corpus).
+    """
+    pool = UnlabelledPool(compiled_corpus.iterate_unlabelled_data(file_name, None, corpus_dir))
+    pool.remove(read_consumed_ids(file_name))
+    return pool
+
+
+###########################################
+# The journal of consumed unlabelled data
+###########################################
+
+# The file with unlabelled data is never rewritten when samples are selected from it. Instead, the ids (the positions in the file)
+# of the selected samples are appended to a journal next to it, with one line for each round. The history of the pool can therefore
+# be replayed from the file and the journal, and the disk I/O of a round only depends on the number of selected samples.
+# compact removes the consumed samples from the file, which is only needed when the file has become much larger than the pool.
+
+def get_journal_file_name(file_name):
+    return file_name + JOURNAL_SUFFIX
+
+
+def read_consumed_ids(file_name):
+    """
+    read_consumed_ids
+
+    returns: a sorted numpy array with the ids of the samples in file_name that are recorded as consumed in its journal
+    """
+    journal_file_name = get_journal_file_name(file_name)
+    consumed_ids = []
+    if os.path.exists(journal_file_name):
+        journal_file = open(journal_file_name)
+        for line in journal_file:
+            if not line.endswith("\n"): # a line that was not completely written, e.g. if the program was interrupted
+                break
+            time_stamp, description, ids = line.rstrip("\n").split("\t")
+            consumed_ids.extend([int(i) for i in ids.split()])
+        journal_file.close()
+    return np.unique(np.array(consumed_ids, dtype=int))
+
+
+def write_to_journal(file_name, ids, description):
+    """
+    write_to_journal
+
+    Appends the ids of samples in file_name that have been consumed (e.g. selected for labelling) to the journal of file_name.
+    description: a string (without tabs) that describes why the samples were consumed, e.g. the name of the file in which
+    they are to be labelled
+    """
+    journal_file = open(get_journal_file_name(file_name), "a")
+    journal_file.write(time.strftime("%Y%m%d_%H%M%S") + "\t" + description + "\t" + " ".join([str(i) for i in ids]) + "\n")
+    journal_file.flush()
+    os.fsync(journal_file.fileno())
+    journal_file.close()
+
+
+def get_ids_for_positions(positions, consumed_ids):
+    """
+    get_ids_for_positions
+
+    returns: the ids of the samples at the given positions among the samples that are not consumed
+    (e.g. as read by vectorize_data.iterate_unlabelled_data with skip_ids = consumed_ids)
+    """
+    consumed_ids = np.unique(np.asarray(consumed_ids, dtype=int))
+    positions = np.asarray(positions, dtype=int)
+    # consumed_ids[i] - i is the number of samples that are not consumed before consumed_ids[i]
+    return positions + np.searchsorted(consumed_ids - np.arange(len(consumed_ids)), positions, side="right")
+
+
+def compact(file_name):
+    """
+    compact
+
+    Rewrites file_name without the samples that have been consumed, and starts a new, empty, journal.
+    The old file and its journal are kept, with a time stamp added to their names.
+    """
+    if not os.path.exists(get_journal_file_name(file_name)):
+        logger.info("No samples have been consumed from " + file_name + ", there is nothing to compact.")
+        return
+
+    pool = read_unlabelled_pool(file_name)
+    logger.info("Will compact " + file_name + ", " + str(len(pool)) + " of the " + str(len(pool.sentences)) + " samples are kept.")
+    pool.write(file_name + ".tmp")
+
+    root, extension = os.path.splitext(file_name)
+    old_file_name = root + time.strftime("_%Y%m%d_%H%M%S") + extension
+    shutil.move(file_name, old_file_name)
+    shutil.move(get_journal_file_name(file_name), get_journal_file_name(old_file_name))
+    shutil.move(file_name + ".tmp", file_name)
+    logger.info("The old file and its journal are saved as " + old_file_name + " and " + get_journal_file_name(old_file_name))
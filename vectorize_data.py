@@ -1,5 +1,6 @@
 from sklearn.feature_extraction.text import CountVectorizer
 import numpy as np
+import scipy.sparse as sp
 from sklearn.utils import shuffle
 from sklearn import preprocessing
 import gensim
@@ -7,20 +8,28 @@ import glob
 import os
 import gc
 import argparse
-import time
+import logging
+import joblib
 from joblib import Parallel, delayed
-from sklearn.cluster import DBSCAN
 from sklearn.neighbors.nearest_centroid import NearestCentroid
-from sklearn.metrics.pairwise import euclidean_distances
+from sklearn.neighbors import KDTree
 
 import active_learning_preannotation
+import feature_cache as feature_cache_module
+import compiled_corpus
+import word2vec_subset
+import word2vec_clustering
+import instrumentation
+from logging_setup import MessageCounter
+
+logger = logging.getLogger(__name__)
 
 
 #######################################
 # To read data from conll-format files
 ######################################
 
-def read_file_labelled_data(file_path, data_file_extension, minority_classes, outside_class):
+def read_file_labelled_data(file_path, data_file_extension, minority_classes, outside_class, n_jobs = 1, parse_cache_file = None):
     """
     read_file_labelled_data reads all files in the folder given by file_path with the file extensions data_file_extension.
     These files are to be in csv-format with one token per line and labelled in BIO-format (see the example project).
@@ -40,72 +49,149 @@ def read_file_labelled_data(file_path, data_file_extension, minority_classes, ou
     Ex:
     {'O': 2, 'B-speculation': 0, 'I-speculation': 1}
 
+    params: n_jobs: the number of processes to use for parsing the files
+    params: parse_cache_file: If not None, a file in which the parsed content of each file is saved, so that files that
+    have not changed (the same size and modification time) are not parsed again the next time the data is read.
     """
-    # First, read file, to get text and labels, grouped into sentences
-    text_vector = []
-    label_vector = []
-    current_text = []
-    current_label = []
-
     glob_for_files = os.path.join(file_path, "*" + data_file_extension)
-    files = glob.glob(glob_for_files)
+    # The files are read in sorted order, so that the order of the samples does not depend on the file system
+    files = sorted(glob.glob(glob_for_files))
 
     if len(files) == 0:
-        print("No labelled data with extension " + data_file_extension + " found in file_path " + str(file_path))
+        logger.error("No labelled data with extension " + data_file_extension + " found in file_path " + str(file_path))
         exit(1)
-    print("Reading labelled data from " + glob_for_files + ". Resulting in "+  str(len(files)) + " files.")
-
-
+    logger.info("Reading labelled data from " + glob_for_files + ". Resulting in "+  str(len(files)) + " files.")
+
+    # Files that have not changed since they were last read are not parsed again
+    parse_cache = {}
+    if parse_cache_file is not None and os.path.exists(parse_cache_file):
+        parse_cache = joblib.load(parse_cache_file)
+    file_versions = [(os.path.getsize(file_name), os.stat(file_name).st_mtime_ns) for file_name in files]
+    files_to_parse = [file_name for file_name, file_version in zip(files, file_versions) \
+                          if file_name not in parse_cache or parse_cache[file_name][0] != file_version]
+
+    if n_jobs == 1 or len(files_to_parse) < 2:
+        parsed = [parse_labelled_file(file_name) for file_name in files_to_parse]
+    else:
+        parsed = Parallel(n_jobs=n_jobs)(delayed(parse_labelled_file)(file_name) for file_name in files_to_parse)
+    omitted_lines = MessageCounter(logger)
+    for file_text_vector, file_label_vector, counts in parsed:
+        omitted_lines.add(counts)
+    omitted_lines.report("Reading labelled data", logging.WARNING)
+    parsed = [(file_text_vector, file_label_vector) for file_text_vector, file_label_vector, counts in parsed]
+    new_parse_cache = {}
+    parsed_by_file = dict(zip(files_to_parse, parsed))
+    for file_name, file_version in zip(files, file_versions):
+        if file_name in parsed_by_file:
+            new_parse_cache[file_name] = (file_version, parsed_by_file[file_name])
+        else:
+            new_parse_cache[file_name] = parse_cache[file_name]
+    if parse_cache_file is not None and (len(files_to_parse) > 0 or len(new_parse_cache) != len(parse_cache)):
+        joblib.dump(new_parse_cache, parse_cache_file)
+    if len(files_to_parse) < len(files):
+        logger.info("Used the already parsed version of " + str(len(files) - len(files_to_parse)) + " files that have not changed.")
+
+    # Merge the files in sorted order, with the labels that are not among the minority_classes replaced by the outside_class
+    minority_classes_set = set(minority_classes)
+    text_vector = []
+    label_vector = []
     for file_name in files:
-        f = open(file_name)
-        print("Opened the file " + file_name)
-        previous_line = "first_in_" + file_name # only to use for writing out a god error message
-        line_number = 0
-        for line in f:
-            line_number = line_number + 1 # for error printing
-            stripped_line = line.strip()
-            if stripped_line != "": # and '\t' in stripped_line:
-                try:
-                    if '\t' in stripped_line:
-                        sp = stripped_line.split('\t')
-                        word = sp[0]
-                        if word.strip() != "": #omit when there is nothing associated with the label
-                            if len(word) == 1:
-                                word = word + "_" + word  # to cover for a bug in scikit learn's tokenization 
-                            current_text.append(word.lower())
-                            label = sp[1]
-                            if label not in minority_classes:
-                                label = outside_class
-                            current_label.append(label)
-                        else:
-                            print("Will omit the incorrectly formated line of index " + str(line_number) + " Line: **" + stripped_line +  "**")
-                    else:
-                        print("Will omit the incorrectly formated line of index " + str(line_number) + " Line: **" + stripped_line +  "**")
-                except IndexError:
-                    print("Index error")
-                    print("The following line is incorrect", line)
-                    print("The last correct line is", previous_line)
-                    print("The index of the incorrect line is " + str(line_number))
-                    print("Stripped version **" + line.strip() +  "**")
-                    exit(1)
-            else: 
-                if len(current_text) != 0: # end of sentence
-                    text_vector.append(current_text)
-                    label_vector.append(current_label)
-                current_text = []
-                current_label = []
-            previous_line = line
-        if len(current_text) != 0: # the last sentence
-            text_vector.append(current_text)
-            label_vector.append(current_label)
+        file_text_vector, file_label_vector = new_parse_cache[file_name][1]
+        text_vector.extend(file_text_vector)
+        for labels in file_label_vector:
+            label_vector.append([label if label in minority_classes_set else outside_class for label in labels])
 
     class_dict = {}
     for i, c in enumerate(minority_classes[:] + [outside_class]):
         class_dict[c] = i
 
+    return text_vector, label_vector, class_dict
+
+
+def get_parse_cache_file(properties, project_path):
+    """
+    returns: the parse_cache_file to use for read_file_labelled_data in the project, or None if the parse cache is not to be used
+    """
+    if not properties.use_parse_cache:
+        return None
+    return os.path.join(project_path, properties.parse_cache_file)
+
+
+def parse_labelled_file(file_name):
+    """
+    internal function for read_file_labelled_data, which reads file_name with read_labelled_file (possibly in another process)
+
+    returns text_vector, label_vector, counts: as returned by read_labelled_file, and the counts of the omitted lines,
+    which are reported once for all files
+    """
+    omitted_lines = MessageCounter(logger)
+    text_vector, label_vector = read_labelled_file(file_name, omitted_lines)
+    return text_vector, label_vector, omitted_lines.counts
+
+
+def read_labelled_file(file_name, omitted_lines = None):
+    """
+    read_labelled_file reads one of the files with labelled data (see read_file_labelled_data)
+
+    returns text_vector, label_vector: as returned by read_file_labelled_data, but for the samples in file_name, and with
+    the labels as they are given in the file
+
+    params: omitted_lines: a logging_setup.MessageCounter in which the incorrectly formated lines are counted, to be reported
+    by the caller. If None, they are reported for file_name.
+    """
+    text_vector = []
+    label_vector = []
+    current_text = []
+    current_label = []
+
+    f = open(file_name)
+    logger.debug("Opened the file " + file_name)
+    report_omitted_lines = omitted_lines is None
+    if report_omitted_lines:
+        omitted_lines = MessageCounter(logger)
+    previous_line = "first_in_" + file_name # only to use for writing out a god error message
+    line_number = 0
+    for line in f:
+        line_number = line_number + 1 # for error printing
+        stripped_line = line.strip()
+        if stripped_line != "": # and '\t' in stripped_line:
+            try:
+                if '\t' in stripped_line:
+                    columns = stripped_line.split('\t')
+                    word = columns[0]
+                    if word.strip() != "": #omit when there is nothing associated with the label
+                        if len(word) == 1:
+                            word = word + "_" + word  # to cover for a bug in scikit learn's tokenization 
+                        current_text.append(word.lower())
+                        label = columns[1]
+                        current_label.append(label)
+                    else:
+                        omitted_lines.count("Omitted incorrectly formated line", "index " + str(line_number) + " Line: **" + stripped_line +  "**")
+                else:
+                    omitted_lines.count("Omitted incorrectly formated line", "index " + str(line_number) + " Line: **" + stripped_line +  "**")
+            except IndexError:
+                logger.error("Index error")
+                logger.error("The following line is incorrect " + line)
+                logger.error("The last correct line is " + previous_line)
+                logger.error("The index of the incorrect line is " + str(line_number))
+                logger.error("Stripped version **" + line.strip() +  "**")
+                exit(1)
+        else: 
+            if len(current_text) != 0: # end of sentence
+                text_vector.append(current_text)
+                label_vector.append(current_label)
+            current_text = []
+            current_label = []
+        previous_line = line
+    if len(current_text) != 0: # the last sentence
+        text_vector.append(current_text)
+        label_vector.append(current_label)
+
     f.close()
+    if report_omitted_lines:
+        omitted_lines.report(file_name, logging.WARNING)
 
-    return text_vector, label_vector, class_dict
+    return text_vector, label_vector
 
 
 def read_file_unlabelled_data(file_name):
@@ -117,10 +203,26 @@ def read_file_unlabelled_data(file_name):
     Ex:
     [['7_7', 'perhaps', 'there', 'is', 'a_a', 'better', 'way', '._.'], ['2_2', 'Why', 'are', 'you, 'doing','doing', 'it', '._.']]
 
+    """
+    return list(iterate_unlabelled_data(file_name))
+
+
+def iterate_unlabelled_data(file_name, skip_ids = None):
+    """
+    iterate_unlabelled_data is a generator that reads the samples in file_name one at a time,
+    and yields them in the same format as the elements of the text_vector returned by read_file_unlabelled_data
+    Ex:
+    ['7_7', 'perhaps', 'there', 'is', 'a_a', 'better', 'way', '._.']
+
+    If skip_ids is given, the samples with these positions in the file are not yielded (see unlabelled_pool.read_consumed_ids)
     """
     # Read file, to get text, grouped into sentences
-    text_vector = []
     current_text = []
+    if skip_ids is None:
+        skip_ids = set()
+    else:
+        skip_ids = set(skip_ids)
+    sample_id = 0
 
     f = open(file_name)
     for line in f:
@@ -131,14 +233,31 @@ def read_file_unlabelled_data(file_name):
             current_text.append(word.lower())
         else:
             if len(current_text) != 0: # end of sentence
-                text_vector.append(current_text)
+                if sample_id not in skip_ids:
+                    yield current_text
+                sample_id = sample_id + 1
             current_text = []
-    if len(current_text) != 0: # the last sentence
-        text_vector.append(current_text)
+    if len(current_text) != 0 and sample_id not in skip_ids: # the last sentence
+        yield current_text
 
     f.close()
 
-    return text_vector
+
+def read_file_unlabelled_data_in_chunks(file_name, chunk_size, skip_ids = None, corpus_dir = None):
+    """
+    read_file_unlabelled_data_in_chunks is a generator that reads the samples in file_name and yields them in lists of
+    (at most) chunk_size samples, so that the entire file never has to be kept in memory.
+    The samples with positions in skip_ids are not read (see iterate_unlabelled_data).
+    If corpus_dir is given, the samples are read from the compiled corpus in corpus_dir if it is up to date (see compiled_corpus).
+    """
+    chunk = []
+    for text in compiled_corpus.iterate_unlabelled_data(file_name, skip_ids, corpus_dir):
+        chunk.append(text)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if len(chunk) != 0:
+        yield chunk
 
 
 ########################
@@ -150,13 +269,34 @@ class Word2vecWrapper:
     Word2vecWrapper 
 
     A class for storing the information regarding the distributional semantics space
+
+    If subset_dir is given, the vectors are read from the vectors exported there (see word2vec_subset), and the
+    full model is only loaded for words that were not in the project when the vectors were exported.
+
+    The vectors are clustered with clustering_engine (see word2vec_clustering), and if clustering_cache_dir is given,
+    the clustering is saved there and only computed again when the vocabulary, the model or the clustering settings change.
     """
 
-    def __init__(self, model_path, semantic_vector_length):
+    def __init__(self, model_path, semantic_vector_length, subset_dir = None, \
+                     clustering_engine = word2vec_clustering.DBSCAN_ENGINE, nr_of_kmeans_clusters = None, clustering_cache_dir = None):
         self.word2vec_model = None
         self.model_path = model_path
         self.semantic_vector_length = semantic_vector_length
         self._vocabulary_list = None
+        self.subset_dir = subset_dir
+        self.vector_subset = None
+        self.clustering_engine = clustering_engine
+        self.nr_of_kmeans_clusters = nr_of_kmeans_clusters
+        self.clustering_cache_dir = clustering_cache_dir
+
+        # Counts the words for which no cluster is found, reported by load_clustering and when the data has been vectorized
+        self.message_counter = MessageCounter(logger)
+
+        # The vectors that have been looked up, as rows in a matrix, where row 0 is the zero vector used for words
+        # that are not in the model (see get_vectors)
+        self.vector_rows = {}
+        self.vector_matrix = None
+        self.nr_of_vector_rows = 1
 
         if semantic_vector_length is not None:
             self.default_vector = [0] * self.semantic_vector_length
@@ -169,9 +309,18 @@ class Word2vecWrapper:
         load the semantic space in the memory
         """
         if self.word2vec_model == None:
-            print("Loading word2vec model, this might take a while ....")
+            logger.info("Loading word2vec model, this might take a while ....")
             self.word2vec_model = gensim.models.Word2Vec.load_word2vec_format(self.model_path, binary=True)
-            print("Loaded word2vec model")
+            logger.info("Loaded word2vec model")
+
+    def load_subset(self):
+        """
+        load the exported vectors (with memory mapping), if subset_dir is given
+        """
+        if self.vector_subset is None and self.subset_dir is not None:
+            self.vector_subset = word2vec_subset.load_subset(self.subset_dir, self.model_path, self.semantic_vector_length)
+            if self.vector_subset is None:
+                self.subset_dir = None # not to try again
 
     def get_semantic_vector_length(self):
         return self.semantic_vector_length
@@ -181,22 +330,56 @@ class Word2vecWrapper:
             word = word[0] # To cover for a bug in scikit learn, one char tokens have been transformed to longer. These are here transformed back
         
         #print("word, in word2vec wrapper", word)
+        self.load_subset()
+        if self.vector_subset is not None and word in self.vector_subset:
+            raw_vec = self.vector_subset.get_vector(word)
+            if raw_vec is None:
+                return self.default_vector
+            return raw_vec
+
         try:
             self.load()
             raw_vec = self.word2vec_model[word]
             if len(raw_vec) != self.semantic_vector_length:
-                print("The true semantic vector has length " + str(len(raw_vec)))
-                print("while the configuration file states that is should have length " + str(self.semantic_vector_length))
+                logger.error("The true semantic vector has length " + str(len(raw_vec)))
+                logger.error("while the configuration file states that is should have length " + str(self.semantic_vector_length))
                 exit(1)
             return raw_vec
         except KeyError:
             return self.default_vector
 
+    def get_vectors(self, words):
+        """
+        Returns the vectors for words (as given by get_vector) as a numpy.ndarray with one row per word.
+
+        Each word is only looked up with get_vector the first time it is asked for. Its vector is then stored as a row in a matrix
+        (and words that are not in the model are given the zero row), so that the vectors for words that have already been looked up
+        are returned with one indexing operation.
+        """
+        if self.vector_matrix is None:
+            self.vector_matrix = np.zeros((64, self.semantic_vector_length), dtype=np.float64)
+
+        new_words = [word for word in set(words) if word not in self.vector_rows]
+        for word in new_words:
+            vector = self.get_vector(word)
+            if vector is self.default_vector:
+                self.vector_rows[word] = 0
+                continue
+            if self.nr_of_vector_rows == len(self.vector_matrix):
+                self.vector_matrix = np.concatenate([self.vector_matrix, np.zeros_like(self.vector_matrix)])
+            self.vector_matrix[self.nr_of_vector_rows] = vector
+            self.vector_rows[word] = self.nr_of_vector_rows
+            self.nr_of_vector_rows = self.nr_of_vector_rows + 1
+
+        rows = np.array([self.vector_rows[word] for word in words], dtype=np.int64)
+        return self.vector_matrix[rows]
+
     def end(self):
         """
         remove the semantic space from the memory
         """
         self.word2vec_model = None
+        self.vector_subset = None
         gc.collect()
 
     def get_similar_word(self, word):
@@ -215,40 +398,39 @@ class Word2vecWrapper:
                     self._vocabulary_list.append(el[0])
                 else:
                     self._vocabulary_list.append(el)
-            print(self._vocabulary_list)
             
     def load_clustering(self):
-        print("Clustering vectors, this might take a while ....")
+        logger.info("Clustering vectors, this might take a while ....")
         if self._vocabulary_list is None:
             raise Exception("set_vocabulary is not yet run")
         
-        X_vectors = []
-        cluster_words = []
-        for word in self._vocabulary_list:
-            vector = self.get_vector(word)
-            if not all([el1 == el2 for el1, el2 in zip(vector, self.default_vector)]):
-                norm_vector = preprocessing.normalize(np.reshape(vector, newshape = (1, self.semantic_vector_length)), norm='l2') # normalize the vector (l2 = eucledian)  
-                list_vector = norm_vector[0]
-                X_vectors.append(list_vector)
-                cluster_words.append(word)
-
-        # Compute DBSCAN
-        X = np.matrix(X_vectors)
+        vectors = self.get_vectors(self._vocabulary_list)
+        in_model = np.any(vectors != 0, axis=1) # words that are not in the model have the zero vector
+        cluster_words = [word for word, found in zip(self._vocabulary_list, in_model) if found]
+        X_vectors = preprocessing.normalize(vectors[in_model], norm='l2') # normalize the vectors (l2 = eucledian)
+
+        labels = None
+        if self.clustering_cache_dir is not None:
+            clustering_key = word2vec_clustering.get_clustering_key(self._vocabulary_list, self.model_path, self.semantic_vector_length, \
+                                                                    self.clustering_engine, self.nr_of_kmeans_clusters)
+            labels = word2vec_clustering.load_clustering(self.clustering_cache_dir, clustering_key, cluster_words)
+        if labels is None:
+            labels = word2vec_clustering.cluster_vectors(X_vectors, self.clustering_engine, self.nr_of_kmeans_clusters)
+            if self.clustering_cache_dir is not None:
+                word2vec_clustering.save_clustering(self.clustering_cache_dir, clustering_key, cluster_words, labels)
+
         self.cluster_word_dict = {}
         self.cluster_dict = {}
         self.cluster_vector_dict = {}
-        db = DBSCAN(eps=0.8, min_samples=1).fit(X)
-        #core_samples_mask = np.zeros_like(db.labels_, dtype=bool)
-        #core_samples_mask[db.core_sample_indices_] = True
-        labels = db.labels_
 
         clusters_no_outliers_y  = []
         clusters_no_outliers_terms  = []
         clusters_no_outliers_X  = []
         for label, term, vector in zip(labels, cluster_words, X_vectors):
             self.cluster_word_dict[term] = label
-            print(label, term)
-            if label != -1:
+            if label == -1:
+                self.message_counter.count("Not found cluster for training data word", term)
+            else:
                 clusters_no_outliers_y.append(label)
                 clusters_no_outliers_terms.append(term)
                 clusters_no_outliers_X.append(vector)
@@ -260,7 +442,6 @@ class Word2vecWrapper:
                 if label not in self.cluster_vector_dict:
                     self.cluster_vector_dict[label] = []
                 self.cluster_vector_dict[label].append(vector)
-        print("labels", set(labels))
         #print("self.cluster_word_dict", self.cluster_word_dict)
 
         self.nr_of_clusters = len(set(labels)) 
@@ -268,41 +449,69 @@ class Word2vecWrapper:
 
         self.nearest_centroid_clf = NearestCentroid()
         self.nearest_centroid_clf.fit(clusters_no_outliers_X, clusters_no_outliers_y)
-        print("Clustered vectors")
+        self.cluster_trees = {} # built by get_clusters for the clusters that are needed
+        self.word_cluster_cache = {}
+        logger.info("Clustered " + str(len(cluster_words)) + " vectors into " + str(self.nr_of_clusters) + " clusters")
+        self.message_counter.report("Clustering")
         
     def get_cluster(self, word):
-        if len(word) == 3 and word[1] == '_':
-            word = word[0]
+        return self.get_clusters([word])[0].tolist()
 
+    def get_clusters(self, words):
+        """
+        Returns the cluster features for words as a numpy.ndarray with one row per word, with a 1 in the column of the cluster
+        of the word, or only zeros if the word has no cluster.
+
+        A word in the clustered vocabulary has the cluster it was given by load_clustering. Other words that are in the model are
+        given the cluster with the nearest centroid, if the distance to the nearest vector in that cluster is at most 1.2.
+        The words that have not been asked for before are looked up together: their vectors are normalised as one matrix,
+        the distances to all centroids are computed with one matrix product, and the nearest vectors in each cluster are
+        found with a KD-tree over the vectors of the cluster. The cluster of each word is remembered until load_clustering
+        is run again.
+        """
         if self.nearest_centroid_clf is None:
             raise Exception("load_clustering is not yet run")
 
-        if word in self.cluster_word_dict:
-            if self.cluster_word_dict[word] == -1:
-                print("Not found cluster for training data word", word)
-            feature_vector = self.get_features(self.cluster_word_dict[word])
-            #print("In training data", word, feature_vector)
-            return feature_vector
-
-        vector = self.get_vector(word)
-        if not all([el1 == el2 for el1, el2 in zip(vector, self.default_vector)]):
-            norm_vector = preprocessing.normalize(np.reshape(vector, newshape = (1, self.semantic_vector_length)), norm='l2') # normalize the vector (l2 = eucledian)  
-            list_vector = norm_vector[0]
-            cluster = self.nearest_centroid_clf.predict(np.array(list_vector))
-            cluster_vectors = self.cluster_vector_dict[cluster[0]]
-            distances = euclidean_distances(cluster_vectors, [list_vector])    
-            #print("distances", distances)
-            min_distance = min(distances)
-            if min_distance <= 1.2:
-                #if word not in self.cluster_dict[cluster[0]]:
-                print(word + " " + str(self.cluster_dict[cluster[0]]))
-                return self.get_features(cluster[0])
-            else:
-                print("Not found cluster for new word", word)
-                return self.empty_vector[:]
-        else:
-            return self.empty_vector[:]
+        words = [word[0] if len(word) == 3 and word[1] == '_' else word for word in words]
+        new_words = [word for word in set(words) if word not in self.word_cluster_cache]
+        new_words_in_vocabulary = [word for word in new_words if word in self.cluster_word_dict]
+        for word in new_words_in_vocabulary:
+            self.word_cluster_cache[word] = self.cluster_word_dict[word]
+        new_words = [word for word in new_words if word not in self.cluster_word_dict]
+
+        if len(new_words) > 0:
+            vectors = self.get_vectors(new_words)
+            in_model = np.any(vectors != 0, axis=1) # words that are not in the model have the zero vector
+            for word, found in zip(new_words, in_model):
+                if not found:
+                    self.word_cluster_cache[word] = -1
+            new_words = [word for word, found in zip(new_words, in_model) if found]
+            vectors = vectors[in_model]
+
+        if len(new_words) > 0:
+            X = preprocessing.normalize(vectors, norm='l2') # normalize the vectors (l2 = eucledian)
+
+            # The squared euclidean distance to each centroid, except for the squared norm of the vector, which is the same for all centroids
+            centroids = self.nearest_centroid_clf.centroids_
+            centroid_distances = (centroids ** 2).sum(axis=1) - 2 * X.dot(centroids.T)
+            nearest_clusters = self.nearest_centroid_clf.classes_[np.argmin(centroid_distances, axis=1)]
+            for cluster in np.unique(nearest_clusters):
+                rows = np.flatnonzero(nearest_clusters == cluster)
+                if cluster not in self.cluster_trees:
+                    self.cluster_trees[cluster] = KDTree(np.array(self.cluster_vector_dict[cluster]))
+                min_distances, nearest_members = self.cluster_trees[cluster].query(X[rows], k=1)
+                for row, min_distance in zip(rows, min_distances[:, 0]):
+                    if min_distance <= 1.2:
+                        self.word_cluster_cache[new_words[row]] = cluster
+                    else:
+                        self.word_cluster_cache[new_words[row]] = -1
+                        self.message_counter.count("Not found cluster for new word", new_words[row])
 
+        labels = np.array([self.word_cluster_cache[word] for word in words], dtype=np.int64)
+        features = np.zeros((len(words), self.nr_of_clusters), dtype=np.int64)
+        has_cluster = np.flatnonzero(labels != -1)
+        features[has_cluster, labels[has_cluster]] = 1
+        return features
 
     def get_features(self, label):
         if self.empty_vector is None:
@@ -316,141 +525,234 @@ class Word2vecWrapper:
         return vector
  
 
-def get_resulting_x_vector(current_word_vectorizer, context_word_vectorizer, word, word_count, text_concatenated, vectorized_data, vectorized_data_context, index_in_sentence, sentence_length, use_word2vec, word2vecwrapper, number_of_previous_words, number_of_following_words, use_current_word_as_feature, len_context, use_clustering):
+def get_window_selection(type_index, nr_of_types, window_rows, valid):
     """
-    get_resulting_x_vector
+    get_window_selection
 
-    internal function for the model constructing the feature vector
+    internal function for the module. Returns a sparse selection matrix with one row per token and one column per distinct token,
+    with a 1 in row t and the column of the token at window_rows[t], for all tokens t for which valid[t] is True.
+    Multiplying it with a matrix with one row per distinct token gathers the rows for one window position for the entire corpus.
     """
-    start_time = time.time()
+    rows = np.nonzero(valid)[0]
+    return sp.csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, type_index[window_rows[rows]])), \
+                             shape=(len(type_index), nr_of_types))
 
-    #assert(text_concatenated[word_count] == word)
 
-    #print("----------")
-    #if word in current_word_vectorizer.vocabulary_:
-    #    assert(current_word_vectorizer.vocabulary_[word] == list(vectorized_data[word_count].toarray()[0]).index(1)) 
+def get_feature_matrix(text_vector, current_word_vectorizer, context_word_vectorizer, use_word2vec, word2vecwrapper, \
+                           number_of_previous_words, number_of_following_words, use_current_word_as_feature, use_clustering, \
+                           use_vocabulary_mask = True):
+    """
+    get_feature_matrix
 
-    #if word in context_word_vectorizer.vocabulary_:
-        #assert(context_word_vectorizer.vocabulary_[word] == list(vectorized_data_context[word_count].toarray()[0]).index(1)) 
-        #print("context_word_vectorizer.vocabulary[word]", context_word_vectorizer.vocabulary_[word])
-        #print("list(vectorized_data_context[word_count].toarray()[0]).index(1)", list(vectorized_data_context[word_count].toarray()[0]).index(1))
+    Constructs the features for all tokens in text_vector as one scipy.sparse.csr_matrix, with one row per token.
 
-    vectorized_long_format = vectorized_data[word_count].toarray()[0]
+    Each distinct token is vectorized once, and the blocks for the current word and for each position in the context window
+    are then gathered for the entire corpus at once, using masks for the sentence boundaries (which also give the
+    start and end indicator columns). The columns are the following, in this order:
+    - if use_current_word_as_feature: the current word, its word2vec vector (if use_word2vec) and its cluster (if use_clustering)
+    - for each of the number_of_previous_words previous words, and thereafter for each of the number_of_following_words following words:
+      the context word and [start, end] indicators, its word2vec vector and [start, end] indicators (if use_word2vec),
+      and its cluster (if use_clustering)
 
-    if use_current_word_as_feature:
-        resulting_vector = vectorized_long_format
-        #print("word", word)
-        #print("Feature vector length without context", len(resulting_vector))
+    returns feature_matrix: a scipy.sparse.csr_matrix with the features of the tokens of all samples, one sample after the other
 
-        #print("resulting_vector", resulting_vector)
-        if use_word2vec:
-            word2vecvector = word2vecwrapper.get_vector(word)
-            resulting_vector = np.concatenate((resulting_vector, word2vecvector))
+    returns sentence_offsets: a numpy.ndarray with len(text_vector) + 1 elements, where the rows of sample i
+    are feature_matrix[sentence_offsets[i]:sentence_offsets[i + 1]]
 
+    If the vectorizers are stable_vocabulary.StableCountVectorizer, the columns for terms that are not included in the
+    vocabulary are set to zero (see apply_vocabulary_mask), unless use_vocabulary_mask is False.
+    """
+    text_concatenated = np.concatenate(text_vector)
+    sentence_lengths = np.array([len(text) for text in text_vector])
+    sentence_offsets = np.concatenate([[0], np.cumsum(sentence_lengths)])
+    nr_of_tokens = len(text_concatenated)
+
+    token_rows = np.arange(0, nr_of_tokens)
+    sentence_starts = np.repeat(sentence_offsets[:-1], sentence_lengths)
+    sentence_ends = np.repeat(sentence_offsets[1:], sentence_lengths)
+
+    # Vectorize each distinct token only once
+    types, type_index = np.unique(text_concatenated, return_inverse=True)
+    current_types = current_word_vectorizer.transform(types).tocsr()
+    context_types = context_word_vectorizer.transform(types).tocsr()
+    if use_word2vec:
+        word2vec_types = sp.csr_matrix(word2vecwrapper.get_vectors(types))
+    if use_clustering:
+        cluster_types = sp.csr_matrix(word2vecwrapper.get_clusters(types))
+
+    blocks = []
+    if use_current_word_as_feature:
+        current_selection = get_window_selection(type_index, len(types), token_rows, np.ones(nr_of_tokens, dtype=bool))
+        blocks.append(current_selection.dot(current_types))
+        if use_word2vec:
+            blocks.append(current_selection.dot(word2vec_types))
         if use_clustering:
-            clustervector = word2vecwrapper.get_cluster(word)
-            resulting_vector = np.concatenate((resulting_vector, clustervector))
-        
-        #print("resulting_vector, after", resulting_vector)    
-        #print("")
-    #print("Feature vector length without context with word2vec", len(resulting_vector))
-    # Before current word
-
-    not_start_end = [0, 0]
-    start = [1, 0]
-    end = [0, 1]
-    for i in range(1, number_of_previous_words + 1):
-        previous_word = None
-
-        if index_in_sentence - i >= 0:
-            previous_word = text_concatenated[word_count-i]
-        #print("previous_word", previous_word)
-    
-        if previous_word:
-            previous_long_vector = np.concatenate((vectorized_data_context[word_count-i].toarray()[0], not_start_end))
+            blocks.append(current_selection.dot(cluster_types))
+
+    # Before current word (positive offsets) and after current word (negative offsets)
+    offsets = list(range(1, number_of_previous_words + 1)) + [-i for i in range(1, number_of_following_words + 1)]
+    for offset in offsets:
+        window_rows = token_rows - offset
+        valid = (window_rows >= sentence_starts) & (window_rows < sentence_ends)
+        indicators = np.zeros((nr_of_tokens, 2), dtype=np.int64)
+        if offset > 0:
+            indicators[~valid, 0] = 1 # start
         else:
-            previous_long_vector = [0] * len_context + start
+            indicators[~valid, 1] = 1 # end
+        indicators = sp.csr_matrix(indicators)
 
-        resulting_vector = np.concatenate((resulting_vector, previous_long_vector))
-        #print("Feature vector length with previous context", len(resulting_vector))
-    
+        window_selection = get_window_selection(type_index, len(types), window_rows, valid)
+        blocks.append(window_selection.dot(context_types))
+        blocks.append(indicators)
         if use_word2vec:
-            if previous_word:
-                previous_vector = np.concatenate((word2vecwrapper.get_vector(previous_word), not_start_end))
-            else:
-                previous_vector = [0] * word2vecwrapper.get_semantic_vector_length() + start
-
-            resulting_vector = np.concatenate((resulting_vector, previous_vector))
-            #print("Feature vector length with word2vec info, previous context", len(resulting_vector))
-        
-        if use_clustering:    
-            if previous_word:
-                previous_vector_cluster = word2vecwrapper.get_cluster(previous_word)
-            else:
-                previous_vector_cluster = word2vecwrapper.empty_vector
+            blocks.append(window_selection.dot(word2vec_types))
+            blocks.append(indicators)
+        if use_clustering:
+            blocks.append(window_selection.dot(cluster_types))
 
-            resulting_vector = np.concatenate((resulting_vector, previous_vector_cluster))
+    feature_matrix = sp.hstack(blocks, format="csr")
+    if use_vocabulary_mask:
+        feature_matrix = apply_vocabulary_mask(feature_matrix, current_word_vectorizer, context_word_vectorizer, use_word2vec, \
+                                                   word2vecwrapper, number_of_previous_words, number_of_following_words, \
+                                                   use_current_word_as_feature, use_clustering)
+    logger.debug("Length final feature vector " + str(feature_matrix.shape[1]))
+    return feature_matrix, sentence_offsets
 
-    # To ensure that these are not reused
-    previous_vector = "Empty"
-    previous_long_vector = "Empty"
-    previous_vector_cluster = "Empty"
 
-    # After current word
-    for i in range(1, number_of_following_words + 1):
-        next_word = None
-        if index_in_sentence + i < sentence_length:
-            next_word = text_concatenated[word_count+i]
-        #print("next_word", next_word)
-    
-        if next_word:
-            next_long_vector = np.concatenate((vectorized_data_context[word_count+i].toarray()[0], not_start_end)) 
-        else:
-            next_long_vector = [0] * len_context + end
+def apply_vocabulary_mask(feature_matrix, current_word_vectorizer, context_word_vectorizer, use_word2vec, word2vecwrapper, \
+                              number_of_previous_words, number_of_following_words, use_current_word_as_feature, use_clustering):
+    """
+    apply_vocabulary_mask
 
-        resulting_vector = np.concatenate((resulting_vector, next_long_vector))
-        #print("Feature vector length also with context after", len(resulting_vector))
+    If the vectorizers are stable_vocabulary.StableCountVectorizer, returns a copy of feature_matrix in which the columns
+    for terms that are not included in the vocabulary (i.e., not in the column_mask of the vectorizers) are set to zero.
+    The mask is constructed with the same blocks, in the same order, as in get_feature_matrix.
+    Otherwise, feature_matrix is returned as it is.
+    """
+    if not hasattr(current_word_vectorizer, "column_mask"):
+        return feature_matrix
 
+    if use_word2vec:
+        word2vec_mask = np.ones(word2vecwrapper.get_semantic_vector_length(), dtype=bool)
+    if use_clustering:
+        cluster_mask = np.ones(word2vecwrapper.nr_of_clusters, dtype=bool)
+    indicator_mask = np.ones(2, dtype=bool)
 
+    masks = []
+    if use_current_word_as_feature:
+        masks.append(current_word_vectorizer.column_mask)
         if use_word2vec:
-            if next_word:
-                next_vector = np.concatenate((word2vecwrapper.get_vector(next_word), not_start_end))
-            else:
-                next_vector = [0] * word2vecwrapper.get_semantic_vector_length() + end
+            masks.append(word2vec_mask)
+        if use_clustering:
+            masks.append(cluster_mask)
+    for i in range(number_of_previous_words + number_of_following_words):
+        masks.append(context_word_vectorizer.column_mask)
+        masks.append(indicator_mask)
+        if use_word2vec:
+            masks.append(word2vec_mask)
+            masks.append(indicator_mask)
+        if use_clustering:
+            masks.append(cluster_mask)
+    feature_mask = np.concatenate(masks)
 
-            resulting_vector = np.concatenate((resulting_vector, next_vector))
-            
-        if use_clustering:    
-            if next_word:
-                next_vector_cluster = word2vecwrapper.get_cluster(next_word)
-            else:
-                next_vector_cluster = word2vecwrapper.empty_vector
+    feature_matrix = feature_matrix.copy()
+    feature_matrix.data[~feature_mask[feature_matrix.indices]] = 0
+    feature_matrix.eliminate_zeros()
+    return feature_matrix
+
+
+def get_feature_matrix_with_cache(feature_cache, text_vector, current_word_vectorizer, context_word_vectorizer, use_word2vec, \
+                                      word2vecwrapper, number_of_previous_words, number_of_following_words, use_current_word_as_feature, \
+                                      use_clustering):
+    """
+    get_feature_matrix_with_cache
 
-            resulting_vector = np.concatenate((resulting_vector, next_vector_cluster))
+    The same as get_feature_matrix, but the features for samples that are stored in feature_cache (a feature_cache.FeatureCache)
+    are read from the cache, and only the other samples are vectorized (and then stored in the cache).
 
-    ### 
-    #print(word)
-    if word_count == 0 or word_count == len(text_concatenated) - 1:
-        print("Length final feature vector", len(resulting_vector))
+    returns feature_matrix, sentence_offsets: see get_feature_matrix
+    returns keys: the keys of the samples in the cache
+    """
+    feature_cache.set_fingerprint(feature_cache_module.get_fingerprint(current_word_vectorizer, context_word_vectorizer, use_word2vec, \
+                                                                           word2vecwrapper, number_of_previous_words, number_of_following_words, \
+                                                                           use_current_word_as_feature, use_clustering))
+    keys = [feature_cache_module.get_key(text) for text in text_vector]
+    cached_matrix, missing = feature_cache.get_feature_matrix(keys)
+    logger.info("Features read from cache for " + str(len(keys) - len(missing)) + " of " + str(len(keys)) + " samples")
+
+    if len(missing) == 0:
+        cached_matrix = apply_vocabulary_mask(cached_matrix, current_word_vectorizer, context_word_vectorizer, use_word2vec, \
+                                                  word2vecwrapper, number_of_previous_words, number_of_following_words, \
+                                                  use_current_word_as_feature, use_clustering)
+        sentence_lengths = np.array([len(text) for text in text_vector])
+        return cached_matrix, np.concatenate([[0], np.cumsum(sentence_lengths)]), keys
+
+    # Vectorize each missing sample only once, even if it occurs several times
+    missing_keys = []
+    missing_keys_set = set()
+    missing_texts = []
+    for i in missing:
+        if keys[i] not in missing_keys_set:
+            missing_keys_set.add(keys[i])
+            missing_keys.append(keys[i])
+            missing_texts.append(text_vector[i])
+    # The features are stored without the vocabulary mask, since the mask might change while the columns stay the same
+    missing_matrix, missing_offsets = get_feature_matrix(missing_texts, current_word_vectorizer, context_word_vectorizer, use_word2vec, \
+                                                             word2vecwrapper, number_of_previous_words, number_of_following_words, \
+                                                             use_current_word_as_feature, use_clustering, use_vocabulary_mask = False)
+    feature_cache.store(missing_keys, missing_matrix, missing_offsets)
+
+    # All samples are now stored, so read all of them in the order of text_vector
+    feature_matrix, _ = feature_cache.get_feature_matrix(keys)
+    feature_matrix = apply_vocabulary_mask(feature_matrix, current_word_vectorizer, context_word_vectorizer, use_word2vec, \
+                                               word2vecwrapper, number_of_previous_words, number_of_following_words, \
+                                               use_current_word_as_feature, use_clustering)
+    sentence_lengths = np.array([len(text) for text in text_vector])
+    return feature_matrix, np.concatenate([[0], np.cumsum(sentence_lengths)]), keys
+
+
+def split_feature_matrix(feature_matrix, sentence_offsets, use_sparse_features):
+    """
+    split_feature_matrix
+
+    Splits a feature matrix with one row per token into a numpy.ndarray with one element per sample, which is the format
+    that the models in classify_and_select expect. The elements are scipy.sparse.csr_matrix if use_sparse_features
+    is True, and dense numpy.ndarray otherwise.
+    """
+    if not use_sparse_features:
+        return np.array([feature_matrix[start:end].toarray() for start, end in zip(sentence_offsets[:-1], sentence_offsets[1:])])
 
-    return resulting_vector
+    result = np.empty(len(sentence_offsets) - 1, dtype=object)
+    for i, (start, end) in enumerate(zip(sentence_offsets[:-1], sentence_offsets[1:])):
+        result[i] = feature_matrix[start:end]
+    return result
 
 
 def vectorize_unlabelled(text_vector_unlabelled, current_word_vectorizer, context_word_vectorizer, \
                              use_word2vec, number_of_previous_words, number_of_following_words, \
-                             use_current_word_as_feature, word2vecwrapper, use_clustering):
+                             use_current_word_as_feature, word2vecwrapper, use_clustering, use_sparse_features = False, \
+                             feature_cache = None, retain = True):
     """
     vectorize_unlabelled
     internal function for the module for vectorizing unlabelled data
+
+    If feature_cache (a feature_cache.FeatureCache) is given, the features of samples that have been vectorized before
+    with the same vectorizers are read from it, and samples that are no longer in text_vector_unlabelled are evicted from it.
+    If retain is False, no samples are evicted, e.g. when text_vector_unlabelled is only a part of the pool of unlabelled data.
     """
 
 
     #original
-    result_X_unlabelled_np = do_vectorize_unlabelled(text_vector_unlabelled,\
+    result_X_unlabelled_np, keys = do_vectorize_unlabelled(text_vector_unlabelled,\
                                                                current_word_vectorizer, context_word_vectorizer, \
                                                                 use_word2vec, number_of_previous_words,\
                                                                 number_of_following_words, \
-                                                                use_current_word_as_feature, word2vecwrapper, use_clustering)  
+                                                                use_current_word_as_feature, word2vecwrapper, use_clustering, \
+                                                                use_sparse_features, feature_cache)  
+    if feature_cache is not None and retain:
+        feature_cache.retain(keys)
+    if use_clustering:
+        word2vecwrapper.message_counter.report("Vectorizing unlabelled data")
 
     """                                                            
     if use_word2vec:
@@ -470,57 +772,78 @@ def vectorize_unlabelled(text_vector_unlabelled, current_word_vectorizer, contex
 
     """
     text_vector_unlabelled_np = np.array([np.array(ti) for ti in text_vector_unlabelled])
-    print("Vectorized finnished")
+    logger.info("Vectorized finnished")
     
     return result_X_unlabelled_np, text_vector_unlabelled_np
 
 def do_vectorize_unlabelled(text_vector_unlabelled, current_word_vectorizer, context_word_vectorizer, \
                              use_word2vec, number_of_previous_words, number_of_following_words, \
-                             use_current_word_as_feature, word2vecwrapper, use_clustering):
+                             use_current_word_as_feature, word2vecwrapper, use_clustering, use_sparse_features = False, \
+                             feature_cache = None):
 
     #Unlabelled data
-    #print(text_vector_unlabelled)
-    text_concatenated_unlabelled = np.concatenate(text_vector_unlabelled)
-    vectorized_data_unlabelled = current_word_vectorizer.transform(text_concatenated_unlabelled)
-
-    vectorized_data_unlabelled_context = context_word_vectorizer.transform(text_concatenated_unlabelled)
-
-    context_example = vectorized_data_unlabelled_context[0].toarray()[0] # only to get out length of context features
-    len_context = len(context_example)
-
-    #vectorized_data_test_vocabulary = None
-
-    result_X_unlabelled = []
-    current_sentence_X = []
-
-
-    word_count = 0
-    for text in text_vector_unlabelled:
-        for i, t in zip(range(0, len(text)), text):
-            resulting_vector = get_resulting_x_vector(current_word_vectorizer, context_word_vectorizer, \
-                                                          t, word_count, text_concatenated_unlabelled, \
-                                                          vectorized_data_unlabelled, vectorized_data_unlabelled_context, \
-                                                          i, len(text), use_word2vec, word2vecwrapper, \
-                                                          number_of_previous_words, number_of_following_words, \
-                                                          use_current_word_as_feature, len_context, use_clustering)
-            current_sentence_X.append(resulting_vector)
-            word_count = word_count + 1
-
-        if len(current_sentence_X) != 0:
-            result_X_unlabelled.append(current_sentence_X)
-            current_sentence_X = []
+    if feature_cache is None:
+        feature_matrix, sentence_offsets = get_feature_matrix(text_vector_unlabelled, current_word_vectorizer, context_word_vectorizer, \
+                                                                  use_word2vec, word2vecwrapper, number_of_previous_words, \
+                                                                  number_of_following_words, use_current_word_as_feature, use_clustering)
+        keys = None
+    else:
+        feature_matrix, sentence_offsets, keys = get_feature_matrix_with_cache(feature_cache, text_vector_unlabelled, \
+                                                                                   current_word_vectorizer, context_word_vectorizer, \
+                                                                                   use_word2vec, word2vecwrapper, number_of_previous_words, \
+                                                                                   number_of_following_words, use_current_word_as_feature, \
+                                                                                   use_clustering)
+    result_X_unlabelled_np = split_feature_matrix(feature_matrix, sentence_offsets, use_sparse_features)
+
+    return result_X_unlabelled_np, keys
+
+
+def vectorize_unlabelled_in_chunks(file_name, chunk_size, current_word_vectorizer, context_word_vectorizer, \
+                                       use_word2vec, number_of_previous_words, number_of_following_words, \
+                                       use_current_word_as_feature, word2vecwrapper, use_clustering, use_sparse_features = False, \
+                                       feature_cache = None, skip_ids = None, corpus_dir = None):
+    """
+    vectorize_unlabelled_in_chunks
 
+    A generator that reads and vectorizes the unlabelled data in file_name in chunks of chunk_size samples,
+    so that the memory needed depends on the chunk size and not on the size of the pool of unlabelled data.
+    The vectorizers are to be the ones returned by vectorize_labelled_data.
 
-    #print("Read unlabelled data, len: ", len(result_X_unlabelled), len(text_vector_unlabelled))
-    result_X_unlabelled_np = np.array([np.array(xi) for xi in result_X_unlabelled])
+    yields (start_index, result_X_unlabelled_np, text_vector_unlabelled_np) for each chunk, where start_index is the index
+    of the first sample in the chunk among the samples that are read from the file, and the other two are the same as returned by
+    vectorize_unlabelled for the chunk. The samples with positions in skip_ids are not read (see iterate_unlabelled_data),
+    and corpus_dir is used as in read_file_unlabelled_data_in_chunks.
 
-    return result_X_unlabelled_np
+    If feature_cache is given, it is used as in vectorize_unlabelled. Samples that are not in the file are evicted from it
+    when all chunks have been read.
+    """
+    start_index = 0
+    all_keys = []
+    for text_vector_chunk in read_file_unlabelled_data_in_chunks(file_name, chunk_size, skip_ids, corpus_dir):
+        with instrumentation.phase("vectorize") as measurement:
+            result_X_chunk_np, keys = do_vectorize_unlabelled(text_vector_chunk, current_word_vectorizer, context_word_vectorizer, \
+                                                                  use_word2vec, number_of_previous_words, number_of_following_words, \
+                                                                  use_current_word_as_feature, word2vecwrapper, use_clustering, use_sparse_features, \
+                                                                  feature_cache)
+            measurement.count("samples", len(text_vector_chunk))
+        if feature_cache is not None:
+            all_keys.extend(keys)
+        text_vector_chunk_np = np.array([np.array(ti) for ti in text_vector_chunk])
+        logger.debug("Vectorized unlabelled samples " + str(start_index) + " to " + str(start_index + len(text_vector_chunk)))
+        yield start_index, result_X_chunk_np, text_vector_chunk_np
+        start_index = start_index + len(text_vector_chunk)
+
+    if feature_cache is not None:
+        feature_cache.retain(all_keys)
+    if use_clustering:
+        word2vecwrapper.message_counter.report("Vectorizing unlabelled data")
 
 
 
 def vectorize_data(text_vector_labelled, text_vector_unlabelled, label_vector_labelled, class_dict, use_word2vec,\
                        number_of_previous_words, number_of_following_words, use_current_word_as_feature,\
-                       min_df_current, min_df_context, word2vecwrapper, current_word_vocabulary, context_word_vocabulary, use_clustering):
+                       min_df_current, min_df_context, word2vecwrapper, current_word_vocabulary, context_word_vocabulary, use_clustering, \
+                       use_sparse_features = False, feature_cache = None, stable_vocabulary = None):
 
     """
     vectorize_data
@@ -562,118 +885,181 @@ def vectorize_data(text_vector_labelled, text_vector_unlabelled, label_vector_la
     params: context_word_vocabulary: If there is an external list to use to be decide whether a token should be included in the context
     vocabulary, this is a string with the search path to this vocabulary. Otherwise set to Fasle
 
+    params: use_clustering: Whether to use the clusters of the word2vec vectors as features
+
+    params: use_sparse_features: If True, the features of each sample are returned as a scipy.sparse.csr_matrix instead of as a dense
+    numpy.ndarray. The features for all tokens are then constructed as one sparse matrix, and are never turned into dense vectors.
+
+    params: feature_cache: A feature_cache.FeatureCache in which the features of the unlabelled samples are stored between rounds,
+    or None if no cache is to be used.
+
+    params: stable_vocabulary: A stable_vocabulary.StableVocabulary, if the columns of the features are to stay the same between rounds
+    (the tokens in the unlabelled data should then already have been added to it), or None if the vectorizers are to be fitted
+    on the labelled data.
+
     """
 
     if len(text_vector_unlabelled) <= 0:
-        print("There is no more unlabelled data available. System will exit")
+        logger.error("There is no more unlabelled data available. System will exit")
         exit(1)
 
-    # Vectorize
-    text_concatenated_labelled = np.concatenate(text_vector_labelled)
+    result_X_labelled_np, result_y_labelled_np, text_vector_labelled_np, current_word_vectorizer, context_word_vectorizer = \
+        vectorize_labelled_data(text_vector_labelled, label_vector_labelled, class_dict, use_word2vec, \
+                                    number_of_previous_words, number_of_following_words, use_current_word_as_feature, \
+                                    min_df_current, min_df_context, word2vecwrapper, current_word_vocabulary, context_word_vocabulary, \
+                                    use_clustering, use_sparse_features, stable_vocabulary)
+
+    #Unlabelled
+    result_X_unlabelled_np, text_vector_unlabelled_np = vectorize_unlabelled(text_vector_unlabelled, current_word_vectorizer, context_word_vectorizer, \
+                             use_word2vec, number_of_previous_words, number_of_following_words, use_current_word_as_feature, word2vecwrapper, use_clustering, \
+                             use_sparse_features, feature_cache)
 
-    vocabulary_to_use = None
+    return result_X_labelled_np, result_X_unlabelled_np, result_y_labelled_np, text_vector_labelled_np, text_vector_unlabelled_np, \
+        current_word_vectorizer, context_word_vectorizer
 
-    # If an external vocabulary has been given, find out which of the words included in the corpus that is included in the vocabulary
-    
-    if current_word_vocabulary:
-        temp_word_vectorizer = CountVectorizer(binary = True)
-        temp_word_vectorizer.fit_transform(text_concatenated_labelled)
-        vocabulary = set()
-        f = open(current_word_vocabulary, encoding='utf-8', errors='ignore')
-        for line in f:
-            vocabulary.add(line.strip())
-        vocabulary_to_use = []
-        for word in temp_word_vectorizer.get_feature_names():
-            if word in vocabulary or word.split("_")[0] in vocabulary:
-                vocabulary_to_use.append(word)
-        
-    # Create a vectorizer for all words that are included (fit on training data)    
-    # (min_df ignored when vocabulary is not none)
-    current_word_vectorizer = CountVectorizer(binary = True, min_df=min_df_current, vocabulary = vocabulary_to_use)
 
-    # only include features that have occurred min_df_current in the labelled data
-    vectorized_data_labelled = current_word_vectorizer.fit_transform(text_concatenated_labelled)
+def get_stable_vectorizers(stable_vocabulary, text_concatenated_labelled, min_df_current, min_df_context, \
+                               current_word_vocabulary, context_word_vocabulary):
+    """
+    get_stable_vectorizers
 
-    # Clustering
-    if use_clustering:
-        word2vecwrapper.set_vocabulary(current_word_vectorizer.get_feature_names())
-        word2vecwrapper.load_clustering()
+    Appends the tokens in the labelled data to stable_vocabulary, and returns the current_word_vectorizer and
+    context_word_vectorizer to use (as stable_vocabulary.StableCountVectorizer)
+    """
+    stable_vocabulary.add_tokens(text_concatenated_labelled)
+
+    external_vocabulary_current = None
+    if current_word_vocabulary:
+        external_vocabulary_current = read_vocabulary_file(current_word_vocabulary)
+    current_word_vectorizer = stable_vocabulary.get_vectorizer(text_concatenated_labelled, min_df_current, external_vocabulary_current)
 
-    vocabulary_to_use_context = None
-    # Create a vectorizer for all words that are included (fit on training data)
+    external_vocabulary_context = None
     if context_word_vocabulary:
-        temp_word_vectorizer = CountVectorizer(binary = True)
-        temp_word_vectorizer.fit_transform(text_concatenated_labelled)
-        vocabulary = set()
-        f = open(context_word_vocabulary, encoding='utf-8', errors='ignore')
-        for line in f:
-            vocabulary.add(line.strip())
-        vocabulary_to_use_context = []
-        for word in temp_word_vectorizer.get_feature_names():
-            if word in vocabulary or word.split("_")[0] in vocabulary:
-                vocabulary_to_use_context.append(word)
-
-    context_word_vectorizer = CountVectorizer(binary = True, min_df=min_df_context, vocabulary = vocabulary_to_use_context) 
-    # include features that have occurred at least min_df_context in the labelled data
-    vectorized_data_labelled_context = context_word_vectorizer.fit_transform(text_concatenated_labelled)
-    
+        external_vocabulary_context = read_vocabulary_file(context_word_vocabulary)
+    context_word_vectorizer = stable_vocabulary.get_vectorizer(text_concatenated_labelled, min_df_context, external_vocabulary_context)
 
-    context_example = vectorized_data_labelled_context[0].toarray()[0] # only to get out length of context features
-    len_context = len(context_example)
+    return current_word_vectorizer, context_word_vectorizer
 
-    # Then, use the vectorizer to create vectorized data
-    # Labelled
-    result_X_labelled = []
-    current_sentence_X = []
-    result_y_labelled= []
 
-    word_count = 0
-    for label, text in zip(label_vector_labelled, text_vector_labelled):
-        for i, t, l in zip(range(0, len(text)), text, label):
-            resulting_vector = get_resulting_x_vector(current_word_vectorizer, context_word_vectorizer, t, word_count,\
-                                                          text_concatenated_labelled, vectorized_data_labelled, \
-                                                          vectorized_data_labelled_context, i, len(text), \
-                                                          use_word2vec, word2vecwrapper, number_of_previous_words, \
-                                                          number_of_following_words, use_current_word_as_feature, len_context, use_clustering)
-            #print(resulting_vector)
-            current_sentence_X.append(resulting_vector)
-            word_count = word_count + 1
-
-        if len(current_sentence_X) != 0:
-            transformed_y = [class_dict[l] for l in label]
+def read_vocabulary_file(file_name):
+    """
+    read_vocabulary_file
 
-            try:
-                assert(len(current_sentence_X) == len(transformed_y))
-            except AssertionError:
-                print("len(current_sentence_X) != len(transformed_y)")
-                print("current_sentence_X", current_sentence_X, len(current_sentence_X), "transformed_y", transformed_y, len(transformed_y), text)
-                exit(1)
+    Returns the set of words (one per line) in the external vocabulary file_name
+    """
+    vocabulary = set()
+    f = open(file_name, encoding='utf-8', errors='ignore')
+    for line in f:
+        vocabulary.add(line.strip())
+    f.close()
+    return vocabulary
 
-            result_X_labelled.append(current_sentence_X)
-            current_sentence_X = []            
 
-            result_y_labelled.append(transformed_y)
+def vectorize_labelled_data(text_vector_labelled, label_vector_labelled, class_dict, use_word2vec,\
+                                number_of_previous_words, number_of_following_words, use_current_word_as_feature,\
+                                min_df_current, min_df_context, word2vecwrapper, current_word_vocabulary, context_word_vocabulary, use_clustering, \
+                                use_sparse_features = False, stable_vocabulary = None):
+    """
+    vectorize_labelled_data
 
-    print("Read labelled data, len: ", len(result_X_labelled), len(result_y_labelled), len(text_vector_labelled))
+    Fits the vectorizers on the labelled data, and vectorizes the labelled data.
+    The params are the same as for vectorize_data.
 
-    #Unlabelled
-    result_X_unlabelled_np, text_vector_unlabelled_np = vectorize_unlabelled(text_vector_unlabelled, current_word_vectorizer, context_word_vectorizer, \
-                             use_word2vec, number_of_previous_words, number_of_following_words, use_current_word_as_feature, word2vecwrapper, use_clustering)
+    If stable_vocabulary (a stable_vocabulary.StableVocabulary) is given, the tokens in the labelled data are appended to it,
+    and the vectorizers use its columns instead of being refitted, with min_df (or the external vocabularies) applied as a mask.
+
+    returns result_X_labelled_np, result_y_labelled_np, text_vector_labelled_np, current_word_vectorizer, context_word_vectorizer
+    (with the same content as the corresponding values returned by vectorize_data)
+    """
+
+    # Vectorize
+    text_concatenated_labelled = np.concatenate(text_vector_labelled)
+
+    if stable_vocabulary is not None:
+        current_word_vectorizer, context_word_vectorizer = \
+            get_stable_vectorizers(stable_vocabulary, text_concatenated_labelled, min_df_current, min_df_context, \
+                                       current_word_vocabulary, context_word_vocabulary)
+        if use_clustering:
+            # The terms that pass min_df change between rounds, so the clusters are instead computed for a fixed set of terms
+            word2vecwrapper.set_vocabulary(stable_vocabulary.get_clustered_terms())
+            word2vecwrapper.load_clustering()
+    else:
+        vocabulary_to_use = None
+
+        # If an external vocabulary has been given, find out which of the words included in the corpus that is included in the vocabulary
+    
+        if current_word_vocabulary:
+            temp_word_vectorizer = CountVectorizer(binary = True)
+            temp_word_vectorizer.fit_transform(text_concatenated_labelled)
+            vocabulary = read_vocabulary_file(current_word_vocabulary)
+            vocabulary_to_use = []
+            for word in temp_word_vectorizer.get_feature_names():
+                if word in vocabulary or word.split("_")[0] in vocabulary:
+                    vocabulary_to_use.append(word)
+        
+        # Create a vectorizer for all words that are included (fit on training data)    
+        # (min_df ignored when vocabulary is not none)
+        current_word_vectorizer = CountVectorizer(binary = True, min_df=min_df_current, vocabulary = vocabulary_to_use)
+
+        # only include features that have occurred min_df_current in the labelled data
+        current_word_vectorizer.fit(text_concatenated_labelled)
+
+        # Clustering
+        if use_clustering:
+            word2vecwrapper.set_vocabulary(current_word_vectorizer.get_feature_names())
+            word2vecwrapper.load_clustering()
+
+        vocabulary_to_use_context = None
+        # Create a vectorizer for all words that are included (fit on training data)
+        if context_word_vocabulary:
+            temp_word_vectorizer = CountVectorizer(binary = True)
+            temp_word_vectorizer.fit_transform(text_concatenated_labelled)
+            vocabulary = read_vocabulary_file(context_word_vocabulary)
+            vocabulary_to_use_context = []
+            for word in temp_word_vectorizer.get_feature_names():
+                if word in vocabulary or word.split("_")[0] in vocabulary:
+                    vocabulary_to_use_context.append(word)
+
+        context_word_vectorizer = CountVectorizer(binary = True, min_df=min_df_context, vocabulary = vocabulary_to_use_context) 
+        # include features that have occurred at least min_df_context in the labelled data
+        context_word_vectorizer.fit(text_concatenated_labelled)
+
+    # Then, use the vectorizers to create vectorized data
+    # Labelled
+    feature_matrix, sentence_offsets = get_feature_matrix(text_vector_labelled, current_word_vectorizer, context_word_vectorizer, \
+                                                              use_word2vec, word2vecwrapper, number_of_previous_words, \
+                                                              number_of_following_words, use_current_word_as_feature, use_clustering)
+    result_X_labelled_np = split_feature_matrix(feature_matrix, sentence_offsets, use_sparse_features)
+    if use_clustering:
+        word2vecwrapper.message_counter.report("Vectorizing labelled data")
+
+    result_y_labelled = []
+    for label, text in zip(label_vector_labelled, text_vector_labelled):
+        transformed_y = [class_dict[l] for l in label]
+        try:
+            assert(len(text) == len(transformed_y))
+        except AssertionError:
+            logger.error("len(text) != len(transformed_y)")
+            logger.error("transformed_y " + str(transformed_y) + " " + str(len(transformed_y)) + " " + str(text) + " " + str(len(text)))
+            exit(1)
+        result_y_labelled.append(transformed_y)
+
+    logger.info("Read labelled data, len: " + str(len(result_X_labelled_np)) + " " + str(len(result_y_labelled)) + " " + str(len(text_vector_labelled)))
 
-    result_X_labelled_np = np.array([np.array(xi) for xi in result_X_labelled])
     result_y_labelled_np = np.array([np.array(yi) for yi in result_y_labelled])
     text_vector_labelled_np = np.array([np.array(ti) for ti in text_vector_labelled])
-    
 
-    return result_X_labelled_np, result_X_unlabelled_np, result_y_labelled_np, text_vector_labelled_np, text_vector_unlabelled_np, \
-        current_word_vectorizer, context_word_vectorizer
+    return result_X_labelled_np, result_y_labelled_np, text_vector_labelled_np, current_word_vectorizer, context_word_vectorizer
 
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     properties_main, path_slash_format, path_dot_format = active_learning_preannotation.load_properties(parser)
-    word2vecwrapper = Word2vecWrapper(properties_main.model_path, properties_main.semantic_vector_length)
+    word2vecwrapper = Word2vecWrapper(properties_main.model_path, properties_main.semantic_vector_length, \
+                                      word2vec_subset.get_subset_dir(properties_main, path_slash_format), \
+                                      properties_main.clustering_engine, properties_main.nr_of_kmeans_clusters, \
+                                      word2vec_clustering.get_clustering_cache_dir(properties_main, path_slash_format))
     #word2vecwrapper.load()
 
 
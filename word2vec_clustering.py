@@ -0,0 +1,106 @@
+import hashlib
+import json
+import logging
+import os
+import joblib
+import numpy as np
+from sklearn.cluster import DBSCAN
+from sklearn.cluster import MiniBatchKMeans
+
+import word2vec_subset
+
+logger = logging.getLogger(__name__)
+
+
+DBSCAN_ENGINE = "dbscan"
+MINIBATCH_KMEANS_ENGINE = "minibatch_kmeans"
+CLUSTERING_ENGINES = [DBSCAN_ENGINE, MINIBATCH_KMEANS_ENGINE]
+
+#######################################################################################
+# The clustering of the word2vec vectors of the vocabulary, that is used for the cluster
+# features (see Word2vecWrapper.load_clustering). The clustering can be saved in a cache
+# directory, in a file named by a hash of the vocabulary, the version of the model and
+# the clustering settings, so that it is only computed again when one of them changes.
+#######################################################################################
+
+def cluster_vectors(X, clustering_engine, nr_of_kmeans_clusters):
+    """
+    cluster_vectors
+
+    X: a numpy.ndarray with the (l2-normalised) vectors to cluster, one per row
+    clustering_engine: DBSCAN_ENGINE or MINIBATCH_KMEANS_ENGINE
+    nr_of_kmeans_clusters: the number of clusters, for MINIBATCH_KMEANS_ENGINE
+
+    returns: the cluster label of each row in X (0, 1, ..., number of clusters - 1)
+    """
+    if clustering_engine == DBSCAN_ENGINE:
+        # With min_samples = 1, all vectors are core samples, so the clusters are the groups of vectors that are connected
+        # by distances of at most eps. The neighbours are found with a ball tree, without computing the distance between
+        # all pairs of vectors.
+        return DBSCAN(eps=0.8, min_samples=1, algorithm="ball_tree").fit(X).labels_
+    elif clustering_engine == MINIBATCH_KMEANS_ENGINE:
+        if nr_of_kmeans_clusters is None:
+            logger.error("The clustering_engine " + MINIBATCH_KMEANS_ENGINE + " is used, but there is no 'nr_of_kmeans_clusters'")
+            exit(1)
+        kmeans = MiniBatchKMeans(n_clusters=min(nr_of_kmeans_clusters, len(X)), random_state=0).fit(X)
+        # Clusters to which no vector was assigned are removed, so that the labels can be used as column indeces
+        return np.unique(kmeans.labels_, return_inverse=True)[1]
+    else:
+        logger.error("Unknown clustering_engine " + str(clustering_engine) + ", it should be one of " + str(CLUSTERING_ENGINES))
+        exit(1)
+
+
+def get_clustering_key(vocabulary_list, model_path, semantic_vector_length, clustering_engine, nr_of_kmeans_clusters):
+    """
+    returns: what identifies a clustering, i.e. a hash of the vocabulary, the version of the model and the clustering settings
+    """
+    vocabulary_hash = hashlib.sha1("\n".join(sorted(set(vocabulary_list))).encode("utf-8")).hexdigest()
+    if clustering_engine != MINIBATCH_KMEANS_ENGINE:
+        nr_of_kmeans_clusters = None
+    return {"vocabulary": vocabulary_hash, "model": word2vec_subset.get_model_version(model_path), \
+            "semantic_vector_length": semantic_vector_length, "clustering_engine": clustering_engine, \
+            "nr_of_kmeans_clusters": nr_of_kmeans_clusters}
+
+
+def get_clustering_file_name(cache_dir, key):
+    return os.path.join(cache_dir, hashlib.sha1(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest() + ".pkl")
+
+
+def load_clustering(cache_dir, key, words):
+    """
+    load_clustering
+
+    returns: the cluster labels for words saved with save_clustering for key, or None if there is no such clustering
+    """
+    file_name = get_clustering_file_name(cache_dir, key)
+    if not os.path.exists(file_name):
+        return None
+    saved = joblib.load(file_name)
+    if saved["key"] != key or saved["words"] != list(words):
+        return None
+    logger.info("Using the clustering saved in " + file_name)
+    return saved["labels"]
+
+
+def save_clustering(cache_dir, key, words, labels):
+    """
+    save_clustering
+
+    Saves the cluster labels for words in cache_dir, in a file named by a hash of key. The file is first written
+    with a temporary name, which then replaces the file.
+    """
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+    file_name = get_clustering_file_name(cache_dir, key)
+    joblib.dump({"key": key, "words": list(words), "labels": np.asarray(labels)}, file_name + ".tmp")
+    os.replace(file_name + ".tmp", file_name)
+    logger.info("Saved the clustering in " + file_name)
+
+
+def get_clustering_cache_dir(properties, project_path):
+    """
+    returns: the directory in which the clusterings of the project are saved, or None if they are not to be saved
+    """
+    if not properties.use_clustering_cache:
+        return None
+    return os.path.join(project_path, properties.clustering_cache_dir)
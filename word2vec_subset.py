@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+import shutil
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+MANIFEST_FILE_NAME = "manifest.json"
+VECTORS_FILE_NAME = "vectors.npy"
+TOKENS_FILE_NAME = "tokens.json"
+MISSING_TOKENS_FILE_NAME = "missing_tokens.json"
+
+#######################################################################################
+# The vectors in the word2vec model for the vocabulary of a project, exported once, so that
+# the full model does not have to be loaded in each run. The vectors are saved as a float32
+# matrix that is read with memory mapping, with a table that gives the row of each token.
+# The tokens that were looked up but are not in the model are also saved, so that the full
+# model is only loaded for tokens that were not in the project when the subset was exported.
+#######################################################################################
+
+class Word2vecSubset:
+    """
+    Word2vecSubset
+
+    The vectors exported by export_subset. A token is "in" the subset if it was looked up when the subset was exported,
+    also if it was not in the model.
+    """
+
+    def __init__(self, subset_dir):
+        with open(os.path.join(subset_dir, MANIFEST_FILE_NAME)) as manifest_file:
+            self.manifest = json.load(manifest_file)
+        with open(os.path.join(subset_dir, TOKENS_FILE_NAME)) as tokens_file:
+            self.token_index = {token: i for i, token in enumerate(json.load(tokens_file))}
+        with open(os.path.join(subset_dir, MISSING_TOKENS_FILE_NAME)) as missing_tokens_file:
+            self.missing_tokens = set(json.load(missing_tokens_file))
+        self.vectors = np.load(os.path.join(subset_dir, VECTORS_FILE_NAME), mmap_mode="r")
+
+    def __contains__(self, word):
+        return word in self.token_index or word in self.missing_tokens
+
+    def get_vector(self, word):
+        """
+        returns: the vector for word, or None if word is not in the model
+        """
+        if word in self.token_index:
+            return np.array(self.vectors[self.token_index[word]])
+        return None
+
+
+def get_model_version(model_path):
+    return [os.path.abspath(model_path), os.path.getsize(model_path), os.stat(model_path).st_mtime_ns]
+
+
+def export_subset(word2vecwrapper, words, subset_dir):
+    """
+    export_subset
+
+    Saves the vectors in the model of word2vecwrapper for words (in the form used by Word2vecWrapper.get_vector) in subset_dir.
+    The files are first written to a temporary directory, which then replaces subset_dir.
+    """
+    word2vecwrapper.load()
+    tokens = []
+    missing_tokens = []
+    vectors = []
+    for word in sorted(set(words)):
+        try:
+            vectors.append(np.asarray(word2vecwrapper.word2vec_model[word], dtype=np.float32))
+            tokens.append(word)
+        except KeyError:
+            missing_tokens.append(word)
+    vectors = np.array(vectors, dtype=np.float32).reshape(len(tokens), word2vecwrapper.semantic_vector_length)
+
+    temporary_dir = subset_dir + ".tmp"
+    if os.path.exists(temporary_dir):
+        shutil.rmtree(temporary_dir)
+    os.makedirs(temporary_dir)
+    np.save(os.path.join(temporary_dir, VECTORS_FILE_NAME), vectors)
+    with open(os.path.join(temporary_dir, TOKENS_FILE_NAME), "w") as tokens_file:
+        json.dump(tokens, tokens_file)
+    with open(os.path.join(temporary_dir, MISSING_TOKENS_FILE_NAME), "w") as missing_tokens_file:
+        json.dump(missing_tokens, missing_tokens_file)
+    manifest = {"model": get_model_version(word2vecwrapper.model_path), "semantic_vector_length": word2vecwrapper.semantic_vector_length}
+    with open(os.path.join(temporary_dir, MANIFEST_FILE_NAME), "w") as manifest_file:
+        json.dump(manifest, manifest_file)
+
+    if os.path.exists(subset_dir):
+        shutil.rmtree(subset_dir)
+    shutil.move(temporary_dir, subset_dir)
+    logger.info("Exported the vectors for " + str(len(tokens)) + " tokens to " + subset_dir + " (" + str(len(missing_tokens)) + \
+              " tokens are not in the model)")
+
+
+def load_subset(subset_dir, model_path, semantic_vector_length):
+    """
+    load_subset
+
+    returns: the Word2vecSubset in subset_dir, or None if there is no subset in subset_dir, or if it was not exported from the current
+    version of the model in model_path
+    """
+    if not os.path.exists(os.path.join(subset_dir, MANIFEST_FILE_NAME)):
+        logger.info("There are no exported word2vec vectors in " + subset_dir + ", will use the model in " + model_path)
+        return None
+    subset = Word2vecSubset(subset_dir)
+    if not os.path.exists(model_path) or subset.manifest["model"] != get_model_version(model_path):
+        logger.warning("The word2vec vectors in " + subset_dir + " are not exported from the current version of " + model_path + \
+                  ", will use the model instead. Run export_word2vec_subset.py to export the vectors again.")
+        return None
+    if subset.manifest["semantic_vector_length"] != semantic_vector_length:
+        logger.error("The exported semantic vectors have length " + str(subset.manifest["semantic_vector_length"]))
+        logger.error("while the configuration file states that is should have length " + str(semantic_vector_length))
+        exit(1)
+    logger.info("Using the word2vec vectors exported to " + subset_dir)
+    return subset
+
+
+def get_subset_dir(properties, project_path):
+    """
+    returns: the directory with the exported word2vec vectors of the project, or None if they are not to be used
+    """
+    if not properties.use_word2vec_subset:
+        return None
+    return os.path.join(project_path, properties.word2vec_subset_dir)